@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'billiard.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django 3.2 無法非同步串流回應，即時比分（SSE）的路徑在這裡直接處理
+from schedule.live import SSE_PATH, sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        match = SSE_PATH.match(scope['path'])
+        if match:
+            return await sse_application(scope, receive, send, int(match['pk']))
+    return await django_application(scope, receive, send)
@@ -50,6 +50,9 @@ CRONJOBS = [
 ]
 
 MIDDLEWARE = [
+    'schedule.loadtest.DatabaseLockedMiddleware',
+    'schedule.metrics.MetricsMiddleware',
+    'schedule.sqlstats.SqlStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'schedule.profiling.ProfilerMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -92,6 +96,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# 預設使用 local-memory，不需要外部服務；要換成 Redis / Memcached 只需修改這裡
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'billiard',
+    }
+}
+
+# 賽程表階段片段快取使用的 cache alias 與存活時間（秒）
+SCHEDULE_FRAGMENT_CACHE = 'default'
+SCHEDULE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# 即時比分推播（需以 ASGI 部署，見 billiard/asgi.py）
+SCHEDULE_LIVE_UPDATES = False
+
+# 賽事 JSON 快照以 gzip 儲存
+SCHEDULE_SNAPSHOT_GZIP = True
+
+# 背景工作由 manage.py run_jobs 執行；True 時直接在請求中執行（沒有 worker 的開發環境）
+SCHEDULE_JOBS_EAGER = False
+
+# 每個 view 的延遲 / SQL / 模板渲染統計（Prometheus 格式，見 schedule/metrics.py 與 /metrics）
+SCHEDULE_METRICS = False
+
+# 管理員在網址加上 ?profile=1 時，分析結果存放的目錄與保留筆數（見 schedule/profiling.py）；None 表示停用
+SCHEDULE_PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+SCHEDULE_PROFILE_KEEP = 50
+
+# SQL 指紋統計與慢查詢紀錄（見 schedule/sqlstats.py，manage.py top_sql 列出結果）
+SCHEDULE_SQL_STATS = False
+SCHEDULE_SQL_STATS_DIR = os.path.join(BASE_DIR, 'sqlstats')
+SCHEDULE_SQL_STATS_FLUSH_SECONDS = 30
+SCHEDULE_SLOW_SQL_MS = 200
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
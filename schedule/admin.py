@@ -1,10 +1,14 @@
 from django.contrib import admin
 
-from .models import Tournament, Match, Stage, Player, Announcement
+from .models import Tournament, Match, Stage, Player, Announcement, Standing, MatchChange, TournamentSnapshot, Job
 
 # Register your models here.
 admin.site.register(Tournament)
 admin.site.register(Match)
 admin.site.register(Stage)
 admin.site.register(Player)
-admin.site.register(Announcement)
\ No newline at end of file
+admin.site.register(Announcement)
+admin.site.register(Standing)
+admin.site.register(MatchChange)
+admin.site.register(TournamentSnapshot)
+admin.site.register(Job)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ScheduleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schedule'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'SCHEDULE_SQL_STATS', False):
+            from . import sqlstats
+            sqlstats.install()
@@ -0,0 +1,172 @@
+"""
+效能基準測試（manage.py run_benchmarks）。
+
+以合成的賽事（每種賽制 8 ~ 4096 人）量測：
+    create     建立籤表（create_*_bracket）
+    standings  循環賽積分表（get_round_robin_standings，只有循環賽）
+    propagate  裁判登錄一場賽果並推進（MatchDetailView.post）
+    render     第一次開啟賽程表（TournamentDetailView，片段快取為空）
+每一步記錄 wall time（重複數次取最小值）、SQL 查詢數與 peak memory（tracemalloc 另外跑一次，不影響計時）。
+所有資料在同一個交易中建立，量測完回滾，不會留在資料庫。
+
+結果存成 JSON 基準（--save），之後以 --compare 比較，任一指標退步超過門檻時失敗。
+"""
+import math
+import platform
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Match, Player, Tournament
+from .utils import (
+    bulk_create_with_ids, create_double_elimination_bracket, create_mixed_bracket, create_single_elimination_bracket,
+    get_round_robin_standings,
+)
+
+SIZES = (8, 64, 512, 4096)
+TYPES = ("single_elim", "double_elim", "round_robin")
+METRICS = ("seconds", "queries", "peak_kb")
+MIN_SECONDS_DELTA = 0.025  # 小於這個差距的計時變化視為雜訊
+BENCHMARK_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "schedule-benchmark"},
+}
+
+
+class Scenario:
+    """一個賽制 + 人數的量測流程；每次 run() 都從頭建立賽事"""
+
+    def __init__(self, tournament_type, size):
+        self.tournament_type = tournament_type
+        self.size = size
+
+    @property
+    def name(self):
+        return f"{self.tournament_type}/{self.size}"
+
+    def group_shape(self):
+        group_size = 4 if self.size <= 16 else 8
+        return math.ceil(self.size / group_size), group_size
+
+    def prepare(self):
+        num_groups, group_size = self.group_shape()
+        self.tournament = Tournament.objects.create(
+            name="benchmark", type=self.tournament_type, semester="benchmark", player_num=self.size,
+            num_groups=num_groups, group_size=group_size, advance_per_group=min(2, group_size),
+        )
+        self.players = bulk_create_with_ids(Player, [
+            Player(name=f"Bench {i}", normalized_name=f"bench {i}", innings=3) for i in range(self.size)
+        ])
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(f"benchmark-{self.name}"))
+
+    def steps(self):
+        yield "create", self.create
+        if self.tournament_type == "round_robin":
+            yield "standings", lambda: get_round_robin_standings(self.tournament)
+        yield "propagate", self.propagate
+        yield "render", self.render
+
+    def create(self):
+        if self.tournament_type == "single_elim":
+            create_single_elimination_bracket(self.tournament, self.players)
+        elif self.tournament_type == "double_elim":
+            create_double_elimination_bracket(self.tournament, self.players)
+        else:
+            t = self.tournament
+            create_mixed_bracket(t, self.players, t.num_groups, t.group_size, t.advance_per_group)
+
+    def propagate(self):
+        match = Match.objects.filter(tournament=self.tournament, status="ready").order_by('id').first()
+        response = self.client.post(reverse("MatchDetailView", args=[match.id]), {
+            "point1": "3", "point2": "1", "winner": "player1", "table": "", "start_time": "",
+        })
+        assert response.status_code == 302, response.status_code
+
+    def render(self):
+        response = self.client.get(reverse("TournamentDetailView", args=[self.tournament.id]))
+        assert response.status_code == 200, response.status_code
+
+    def run(self, measure_memory=False):
+        """回傳 {步驟: {指標: 值}}；measure_memory 時只量 peak memory"""
+        results = {}
+        # 回滾也會讓 pk 與 Stage.version 從同一個值開始，重複執行時會命中上一次的片段快取：
+        # 改用獨立的 local-memory 快取，每次都從空的快取開始
+        with transaction.atomic(), override_settings(
+            ALLOWED_HOSTS=["testserver"], CACHES=BENCHMARK_CACHES, SCHEDULE_FRAGMENT_CACHE="default",
+        ):
+            caches["default"].clear()
+            self.prepare()
+            for step, func in self.steps():
+                if measure_memory:
+                    tracemalloc.start()
+                    func()
+                    results[step] = {"peak_kb": round(tracemalloc.get_traced_memory()[1] / 1024)}
+                    tracemalloc.stop()
+                else:
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        func()
+                        elapsed = time.perf_counter() - started
+                    results[step] = {"seconds": round(elapsed, 4), "queries": len(queries)}
+            transaction.set_rollback(True)
+        return results
+
+
+def run_benchmarks(types=TYPES, sizes=SIZES, measure_memory=True, repeat=3, report=None):
+    """執行所有情境，回傳可存成 JSON 的基準 {"meta": {...}, "results": {"single_elim/8/create": {...}}}"""
+    results = {}
+    for tournament_type in types:
+        for size in sizes:
+            scenario = Scenario(tournament_type, size)
+            timings = scenario.run()
+            for _ in range(repeat - 1):
+                for step, values in scenario.run().items():
+                    timings[step]["seconds"] = min(timings[step]["seconds"], values["seconds"])
+            if measure_memory:
+                for step, values in scenario.run(measure_memory=True).items():
+                    timings[step].update(values)
+            for step, values in timings.items():
+                key = f"{scenario.name}/{step}"
+                results[key] = values
+                if report:
+                    report(key, values)
+    return {
+        "meta": {
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    回傳退步的項目 [(key, 指標, 基準值, 目前值)]；threshold 為允許的比例（0.25 = 慢 25% 以內）。
+    只比較兩邊都有的項目與指標。
+    """
+    regressions = []
+    for key, values in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        for metric in METRICS:
+            if metric not in values or metric not in before:
+                continue
+            old, new = before[metric], values[metric]
+            if new <= old * (1 + threshold):
+                continue
+            if metric == "seconds" and new - old < MIN_SECONDS_DELTA:
+                continue
+            regressions.append((key, metric, old, new))
+    return regressions
@@ -0,0 +1,639 @@
+"""
+純 Python 的籤表圖，不依賴資料庫。
+
+每場比賽是一個 MatchNode，以整數 id（即在 graph.matches 中的位置）互相連結：
+    source1 / source2   : 這場兩個位置的來源比賽 id
+    outcome1 / outcome2 : 來源比賽的勝者 (WINNER) 或敗者 (LOSER) 進到這個位置
+    targets             : [(下一場 id, 位置), ...]，由 link() 維護
+    bye1 / bye2         : 這個位置輪空（永遠不會有選手），見 resolve_byes()
+    status              : 比賽狀態（PENDING / READY / ...），寫回資料庫前以 update_status() 重算
+
+選手以整數 key 表示（實際使用時是 Player 的 id），圖本身不關心選手資料。
+ORM 只負責讀入與寫回，見 utils.load_bracket_graph / utils.save_bracket_graph。
+"""
+import math
+import random
+from collections import defaultdict
+
+WINNER = 0
+LOSER = 1
+
+# 比賽狀態（Match.status），見 match_status()
+PENDING = "pending"  # 還有位置沒有確定選手
+READY = "ready"  # 兩位選手都已確定，可以開打
+IN_PROGRESS = "in_progress"  # 已開打（裁判按下開始或已有比分）
+DONE = "done"
+WALKOVER = "walkover"  # 輪空，不需要打
+
+
+def match_status(player1, player2, winner, point1='', point2='', bye=False, previous=None):
+    """依比賽目前的選手與賽果推算狀態；previous 為原本的狀態（保留裁判標記的「進行中」）"""
+    if bye:
+        return WALKOVER
+    if winner is not None:
+        return DONE
+    if player1 is None or player2 is None:
+        return PENDING
+    if previous == IN_PROGRESS or point1 != '' or point2 != '':
+        return IN_PROGRESS
+    return READY
+
+
+class BracketError(ValueError):
+    pass
+
+
+class StageNode:
+    __slots__ = ('id', 'name', 'order', 'pk')
+
+    def __init__(self, id, name, order, pk=None):
+        self.id = id
+        self.name = name
+        self.order = order
+        self.pk = pk
+
+
+class MatchNode:
+    __slots__ = (
+        'id', 'stage', 'match_number', 'player1', 'player2', 'winner', 'loser',
+        'point1', 'point2', 'source1', 'source2', 'outcome1', 'outcome2',
+        'round_number', 'is_losers_bracket', 'targets', 'pk', 'bye1', 'bye2', 'status',
+    )
+
+    def __init__(self, id, stage, match_number, player1=None, player2=None,
+                 round_number=None, is_losers_bracket=False, pk=None):
+        self.id = id
+        self.stage = stage
+        self.match_number = match_number
+        self.player1 = player1
+        self.player2 = player2
+        self.winner = None
+        self.loser = None
+        self.point1 = ''
+        self.point2 = ''
+        self.source1 = None
+        self.source2 = None
+        self.outcome1 = WINNER
+        self.outcome2 = WINNER
+        self.round_number = round_number
+        self.is_losers_bracket = is_losers_bracket
+        self.targets = []
+        self.pk = pk
+        self.bye1 = False
+        self.bye2 = False
+        self.status = PENDING
+
+    def get_player(self, slot):
+        return self.player1 if slot == 1 else self.player2
+
+    def set_player(self, slot, player):
+        if slot == 1:
+            self.player1 = player
+        else:
+            self.player2 = player
+
+    def get_source(self, slot):
+        return (self.source1, self.outcome1) if slot == 1 else (self.source2, self.outcome2)
+
+    def set_bye(self, slot, bye):
+        if slot == 1:
+            self.bye1 = bye
+        else:
+            self.bye2 = bye
+
+    def is_bye(self):
+        """有輪空位置的比賽不需要打，另一個位置的選手直接晉級"""
+        return self.bye1 or self.bye2
+
+    def has_result(self):
+        return self.winner is not None or self.loser is not None or self.point1 != '' or self.point2 != ''
+
+    def clear_result(self):
+        self.winner = None
+        self.loser = None
+        self.point1 = ''
+        self.point2 = ''
+
+    def is_ready(self):
+        return self.player1 is not None and self.player2 is not None and self.winner is None
+
+    def update_status(self):
+        self.status = match_status(self.player1, self.player2, self.winner, self.point1, self.point2,
+                                   self.is_bye(), self.status)
+        return self.status
+
+
+class BracketGraph:
+
+    def __init__(self):
+        self.stages = []
+        self.matches = []
+        self._pk_index = {}  # {資料庫 pk: MatchNode}，見 get_by_pk()
+
+    # === 建構 ===
+    def add_stage(self, name, order, pk=None):
+        stage = StageNode(len(self.stages), name, order, pk)
+        self.stages.append(stage)
+        return stage.id
+
+    def add_match(self, stage, match_number, player1=None, player2=None, **kwargs):
+        node = MatchNode(len(self.matches), stage, match_number, player1, player2, **kwargs)
+        self.matches.append(node)
+        return node.id
+
+    def link(self, source, target, slot, outcome=WINNER):
+        """source 比賽的勝者 / 敗者進到 target 比賽的 slot (1 或 2) 位置"""
+        node = self.matches[target]
+        if slot == 1:
+            node.source1, node.outcome1 = source, outcome
+        else:
+            node.source2, node.outcome2 = source, outcome
+        self.matches[source].targets.append((target, slot))
+
+    def routing(self):
+        """{比賽 id: [(下一場 id, 位置, WINNER/LOSER), ...]}"""
+        table = {}
+        for node in self.matches:
+            table[node.id] = [
+                (target, slot, self.matches[target].get_source(slot)[1])
+                for target, slot in node.targets
+            ]
+        return table
+
+    def get_by_pk(self, pk):
+        """以資料庫 pk 找比賽（O(1)）；node.pk 在寫入資料庫後才設定，找不到時重建索引再找一次"""
+        node = self._pk_index.get(pk)
+        if node is None or node.pk != pk:
+            self._pk_index = {node.pk: node for node in self.matches if node.pk is not None}
+            node = self._pk_index.get(pk)
+            if node is None:
+                raise BracketError(f"找不到比賽 {pk}")
+        return node
+
+    def stage_matches(self, stage):
+        return [node for node in self.matches if node.stage == stage]
+
+    # === 賽果 ===
+    def set_result(self, match_id, winner_slot, point1=None, point2=None):
+        """
+        記錄賽果並推進到下一場，回傳有變動的比賽 id。
+        winner_slot: 1 或 2（哪一個位置的選手獲勝）
+        """
+        node = self.matches[match_id]
+        if node.is_bye():
+            raise BracketError(f"比賽 {node.match_number} 為輪空，不需要登錄賽果")
+        if point1 is not None:
+            node.point1 = point1
+        if point2 is not None:
+            node.point2 = point2
+        if winner_slot == 1:
+            node.winner, node.loser = node.player1, node.player2
+        elif winner_slot == 2:
+            node.winner, node.loser = node.player2, node.player1
+        else:
+            raise BracketError(f"winner_slot 只能是 1 或 2（收到 {winner_slot!r}）")
+        return {match_id} | self.advance(match_id)
+
+    def advance(self, match_id):
+        """
+        把這場的勝者 / 敗者填進下一場的對應位置，回傳有變動的比賽 id。
+        下一場的選手因此改變而原本已有賽果時（裁判更正前面的比分），
+        該場賽果已不成立：清除後繼續往下游清除。
+        """
+        changed = set()
+        queue = [match_id]
+        while queue:
+            node = self.matches[queue.pop()]
+            for target, slot in node.targets:
+                next_node = self.matches[target]
+                outcome = next_node.get_source(slot)[1]
+                player = node.winner if outcome == WINNER else node.loser
+                if next_node.get_player(slot) == player:
+                    continue
+                next_node.set_player(slot, player)
+                next_node.status = PENDING  # 選手換了，原本標記的「進行中」不再成立
+                changed.add(target)
+                if next_node.is_bye():
+                    # 輪空比賽：進來的選手直接晉級
+                    next_node.winner = player
+                    queue.append(target)
+                elif next_node.has_result():
+                    next_node.clear_result()
+                    queue.append(target)
+        return changed
+
+    def resolve_byes(self):
+        """
+        標記輪空位置並讓輪空比賽的選手直接晉級（產生籤表後呼叫），回傳有變動的比賽 id。
+
+        沒有選手也沒有來源的位置是輪空；來源比賽永遠產生不出該位置的選手時也是輪空
+        （輪空比賽沒有敗者，兩個位置都輪空的比賽也沒有勝者）。
+        """
+        order = self.topological_order()
+        for match_id in order:
+            node = self.matches[match_id]
+            for slot in (1, 2):
+                source, outcome = node.get_source(slot)
+                if node.get_player(slot) is not None:
+                    bye = False
+                elif source is None:
+                    bye = True
+                else:
+                    source_node = self.matches[source]
+                    bye = source_node.is_bye() if outcome == LOSER else source_node.bye1 and source_node.bye2
+                node.set_bye(slot, bye)
+
+        changed = set()
+        for match_id in order:
+            node = self.matches[match_id]
+            if node.is_bye() and node.winner is None:
+                player = node.player2 if node.bye1 else node.player1
+                if player is not None:
+                    node.winner = player
+                    changed.add(match_id)
+                    changed |= self.advance(match_id)
+        return changed
+
+    # === 檢查 ===
+    def topological_order(self):
+        indegree = [0] * len(self.matches)
+        for node in self.matches:
+            for target, _ in node.targets:
+                indegree[target] += 1
+        queue = [node.id for node in self.matches if indegree[node.id] == 0]
+        order = []
+        while queue:
+            match_id = queue.pop()
+            order.append(match_id)
+            for target, _ in self.matches[match_id].targets:
+                indegree[target] -= 1
+                if indegree[target] == 0:
+                    queue.append(target)
+        if len(order) != len(self.matches):
+            raise BracketError("籤表中有循環的比賽連結")
+        # 依層數排序，同一輪的比賽相鄰
+        depth = self._depths(order)
+        return sorted(order, key=lambda i: (depth[i], i))
+
+    def depths(self):
+        """每場比賽距離第一輪的層數（第一輪為 0），同一層的比賽可以一起寫入資料庫"""
+        return self._depths(self.topological_order())
+
+    def _depths(self, order):
+        depth = [0] * len(self.matches)
+        for match_id in order:
+            node = self.matches[match_id]
+            depth[match_id] = 1 + max(
+                (depth[s] for s in (node.source1, node.source2) if s is not None),
+                default=-1,
+            )
+        return depth
+
+    def validate(self):
+        """檢查圖的一致性，有問題時丟出 BracketError（列出所有問題）"""
+        errors = []
+        for node in self.matches:
+            if not 0 <= node.stage < len(self.stages):
+                errors.append(f"比賽 {node.id} 的階段 {node.stage} 不存在")
+            for slot in (1, 2):
+                source, outcome = node.get_source(slot)
+                if source is None:
+                    continue
+                if not 0 <= source < len(self.matches):
+                    errors.append(f"比賽 {node.id} 位置 {slot} 的來源 {source} 不存在")
+                elif (node.id, slot) not in self.matches[source].targets:
+                    errors.append(f"比賽 {source} 沒有連到比賽 {node.id} 位置 {slot}")
+                if outcome not in (WINNER, LOSER):
+                    errors.append(f"比賽 {node.id} 位置 {slot} 的晉級方式不正確")
+            if node.winner is not None:
+                if node.winner not in (node.player1, node.player2):
+                    errors.append(f"比賽 {node.id} 的勝者不是參賽者")
+                elif node.loser != (node.player2 if node.winner == node.player1 else node.player1):
+                    errors.append(f"比賽 {node.id} 的敗者不正確")
+        try:
+            self.topological_order()
+        except BracketError as e:
+            errors.append(str(e))
+        if errors:
+            raise BracketError("；".join(errors))
+        return True
+
+    # === 序列化 ===
+    def to_dict(self):
+        return {
+            "stages": [[s.name, s.order] for s in self.stages],
+            "matches": [
+                [
+                    n.stage, n.match_number, n.player1, n.player2, n.winner, n.loser,
+                    n.point1, n.point2, n.source1, n.outcome1, n.source2, n.outcome2,
+                    n.round_number, n.is_losers_bracket, n.bye1, n.bye2,
+                ]
+                for n in self.matches
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        graph = cls()
+        for name, order in data["stages"]:
+            graph.add_stage(name, order)
+        links = []
+        for row in data["matches"]:
+            (stage, match_number, p1, p2, winner, loser, point1, point2,
+             source1, outcome1, source2, outcome2, round_number, is_losers_bracket, bye1, bye2) = row
+            match_id = graph.add_match(stage, match_number, p1, p2,
+                                       round_number=round_number, is_losers_bracket=is_losers_bracket)
+            node = graph.matches[match_id]
+            node.winner, node.loser = winner, loser
+            node.bye1, node.bye2 = bye1, bye2
+            node.point1, node.point2 = point1, point2
+            links.append((source1, match_id, 1, outcome1))
+            links.append((source2, match_id, 2, outcome2))
+        for source, target, slot, outcome in links:
+            if source is not None:
+                graph.link(source, target, slot, outcome)
+        return graph
+
+
+# === 籤表產生 ===
+def single_elimination_stage_name(remaining_players):
+    if remaining_players == 2:
+        return "Final"
+    elif remaining_players == 4:
+        return "Semi-final"
+    elif remaining_players == 8:
+        return 'Quarter-final'
+    return f"Last {remaining_players}"
+
+
+def bracket_size(player_count):
+    """容納 player_count 人的籤表大小（2 的次方，至少 2）"""
+    return 2 ** math.ceil(math.log2(max(player_count, 2)))
+
+
+def spread_byes(players, size):
+    """
+    把 players 補滿到 size 個位置，不足的名額（None = 輪空）平均分散到第一輪各場，
+    每場最多一個輪空（位置以位元反轉排列，輪空會分散到上下半區）。
+    players 中原本的 None（名單中的空行）保留在原位置。
+    """
+    players = list(players)
+    byes = size - len(players)
+    if byes <= 0:
+        return players
+    match_count = size // 2
+    bits = max(match_count.bit_length() - 1, 0)
+    order = sorted(range(match_count), key=lambda i: int(format(i, f'0{bits}b')[::-1] or '0', 2))
+    bye_matches = set(order[:byes])
+
+    seeded = []
+    remaining = iter(players)
+    for i in range(match_count):
+        seeded.append(next(remaining, None))
+        seeded.append(None if i in bye_matches else next(remaining, None))
+    return seeded
+
+
+def build_single_elimination(graph, players, start_match_number=1):
+    """
+    單敗籤表：players 依序兩兩對戰，四強以上另加季殿賽（四強賽輸家對決）。
+    人數不是 2 的次方時補上輪空（不建立選手），輪空比賽在 resolve_byes() 中直接晉級。
+    回傳最後一個使用的比賽編號 + 1。
+    """
+    next_power_of_two = bracket_size(len(players))
+    total_rounds = int(math.log2(next_power_of_two))
+    players = spread_byes(players, next_power_of_two)
+
+    stages = [
+        graph.add_stage(single_elimination_stage_name(next_power_of_two // (2 ** i)), i + 1)
+        for i in range(total_rounds)
+    ]
+
+    match_counter = start_match_number
+    current_round = []
+    for i in range(0, len(players), 2):
+        current_round.append(graph.add_match(stages[0], match_counter, players[i], players[i + 1]))
+        match_counter += 1
+
+    semifinal_matches = []
+    for round_index in range(1, total_rounds):
+        next_round = []
+        for i in range(len(current_round) // 2):
+            match_id = graph.add_match(stages[round_index], match_counter)
+            graph.link(current_round[2 * i], match_id, 1)
+            graph.link(current_round[2 * i + 1], match_id, 2)
+            next_round.append(match_id)
+            match_counter += 1
+        if len(current_round) == 2:
+            semifinal_matches = current_round
+        current_round = next_round
+
+    if semifinal_matches:
+        tie_breaker_stage = graph.add_stage("Tie Breaker", total_rounds + 1)
+        match_id = graph.add_match(tie_breaker_stage, match_counter)
+        graph.link(semifinal_matches[0], match_id, 1, LOSER)
+        graph.link(semifinal_matches[1], match_id, 2, LOSER)
+        match_counter += 1
+
+    return match_counter
+
+
+def build_double_elimination(graph, players):
+    """
+    分四組，每組：第一輪 → 敗部第一輪 / 勝部晉級賽 → 敗部晉級賽。
+    每組產生兩位晉級者（勝部晉級賽勝者 + 敗部晉級賽勝者）。
+    人數不足時以輪空補滿，輪空平均分散到各組的第一輪。
+    """
+    group_size = bracket_size(math.ceil(len(players) / 4))
+    players = spread_byes(players, group_size * 4)
+    groups = [players[i:i + group_size] for i in range(0, len(players), group_size)]
+    group_names = ["A", "B", "C", "D"]
+    match_counter = 1
+
+    for g_idx, group_players in enumerate(groups):
+        group_label = group_names[g_idx] if g_idx < len(group_names) else f"Group {g_idx+1}"
+        initial = graph.add_stage(f"Group {group_label} Initial Round", g_idx * 10 + 1)
+        losers_r1 = graph.add_stage(f"Group {group_label} Losers Round 1", g_idx * 10 + 2)
+        winners_q = graph.add_stage(f"Group {group_label} Winners' Qualification", g_idx * 10 + 3)
+        losers_q = graph.add_stage(f"Group {group_label} Losers' Qualification", g_idx * 10 + 4)
+
+        initial_matches = []
+        for i in range(0, len(group_players), 2):
+            p2 = group_players[i + 1] if i + 1 < len(group_players) else None
+            initial_matches.append(graph.add_match(initial, match_counter, group_players[i], p2))
+            match_counter += 1
+
+        losers_r1_matches = []
+        for i in range(0, len(initial_matches), 2):
+            match_id = graph.add_match(losers_r1, match_counter, is_losers_bracket=True)
+            graph.link(initial_matches[i], match_id, 1, LOSER)
+            if i + 1 < len(initial_matches):
+                graph.link(initial_matches[i + 1], match_id, 2, LOSER)
+            match_counter += 1
+            losers_r1_matches.append(match_id)
+
+        winners_q_matches = []
+        for i in range(0, len(initial_matches), 2):
+            match_id = graph.add_match(winners_q, match_counter)
+            graph.link(initial_matches[i], match_id, 1)
+            if i + 1 < len(initial_matches):
+                graph.link(initial_matches[i + 1], match_id, 2)
+            match_counter += 1
+            winners_q_matches.append(match_id)
+
+        # 勝部晉級賽逆序排列（交叉配對）
+        reversed_winners = list(reversed(winners_q_matches))
+        for i, source in enumerate(losers_r1_matches):
+            match_id = graph.add_match(losers_q, match_counter, is_losers_bracket=True)
+            graph.link(source, match_id, 1)
+            if i < len(reversed_winners):
+                graph.link(reversed_winners[i], match_id, 2, LOSER)
+            match_counter += 1
+
+    return match_counter
+
+
+def build_round_robin(graph, players, num_groups, group_size):
+    """
+    分組循環：每組每人互打一次。
+    人數不足 num_groups * group_size 時各組人數平均分配（輪空不產生比賽）。
+    """
+    players = [p for p in players if p is not None][:num_groups * group_size]
+    base, extra = divmod(len(players), num_groups)
+    match_counter = 1
+    start = 0
+    for group_index in range(num_groups):
+        size = base + (group_index < extra)
+        group_players = players[start:start + size]
+        start += size
+        stage = graph.add_stage(f"Group {group_index + 1} Round Robin", group_index + 1)
+        for i in range(len(group_players)):
+            for j in range(i + 1, len(group_players)):
+                graph.add_match(stage, match_counter, group_players[i], group_players[j])
+                match_counter += 1
+    return match_counter
+
+
+# === 積分與模擬 ===
+def point_value(point, w_value=1):
+    """W = w_value（該選手局數），FF = 0，其餘為數字（無法解析時為 0，與 SQL 的 CAST 一致）"""
+    if isinstance(point, (int, float)):
+        return point
+    point = point.strip().upper()
+    if point == 'W':
+        return w_value
+    if point == 'FF':
+        return 0
+    try:
+        return int(point)
+    except ValueError:
+        return 0
+
+
+def result_contribution(p1, p2, point1, point2, w_points=None):
+    """
+    一場比賽對兩位選手積分的貢獻：((選手, 勝場, 得局, 失局), (選手, 勝場, 得局, 失局))
+    選手或比分不完整時回傳 None
+    """
+    if p1 is None or p2 is None or point1 == '' or point2 == '':
+        return None
+    w_points = w_points or {}
+    p1_point = point_value(point1, w_points.get(p1, 1))
+    p2_point = point_value(point2, w_points.get(p2, 1))
+    return (
+        (p1, int(p1_point > p2_point), p1_point, p2_point),
+        (p2, int(p2_point > p1_point), p2_point, p1_point),
+    )
+
+
+def standing_order(row):
+    """比序：勝場 > 得局 > 失局少 > 得局率（reverse=True 排序）"""
+    return row["wins"], row["games_for"], -row["games_against"], row["ratio"]
+
+
+def combine_stages(standings, player_key=lambda player: player):
+    """
+    同一位選手出現在多個階段時（雙敗的初賽、敗部、資格賽都是 Group 階段），
+    每個階段都列出該選手在所有階段的合計並重新排序，與原本逐選手加總的積分表相同。
+    循環賽每位選手只在一組，結果不變。
+    standings: round_robin_standings() 的格式；player_key 取出比對選手用的 key
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for player_list in standings.values():
+        for row in player_list:
+            total = totals[player_key(row["player"])]
+            total[0] += row["wins"]
+            total[1] += row["games_for"]
+            total[2] += row["games_against"]
+    for player_list in standings.values():
+        for row in player_list:
+            wins, gf, ga = totals[player_key(row["player"])]
+            row.update(wins=wins, games_for=gf, games_against=ga, ratio=round(gf / (gf + ga), 3) if gf + ga else 0)
+        player_list.sort(key=standing_order, reverse=True)
+    return standings
+
+
+def round_robin_standings(graph, stage_ids, w_points=None, per_stage=False):
+    """
+    計算指定階段的循環賽積分表。
+    比序：勝場 > 得局 > 失局少 > 得局率
+    w_points: {選手: W 代表的局數（該選手局數）}，未提供時 W 以 1 局計算
+    per_stage: True 時只計算選手在該階段的成績（實體化積分表用），
+               預設為選手在所有 stage_ids 的合計（見 combine_stages()）
+    回傳 {stage_id: [{"player": 選手, "wins", "games_for", "games_against", "ratio"}, ...]}
+    """
+    stage_ids = list(stage_ids)
+    wanted = set(stage_ids)
+    records = defaultdict(lambda: [0, 0, 0])  # (stage, 選手) -> wins, games_for, games_against
+    group_players = defaultdict(set)
+
+    for node in graph.matches:
+        if node.stage not in wanted:
+            continue
+        p1, p2 = node.player1, node.player2
+        if p1 is not None:
+            group_players[node.stage].add(p1)
+        if p2 is not None:
+            group_players[node.stage].add(p2)
+        result = result_contribution(p1, p2, node.point1, node.point2, w_points)
+        if result is None:
+            continue
+        for player, wins, gf, ga in result:
+            record = records[node.stage, player]
+            record[0] += wins
+            record[1] += gf
+            record[2] += ga
+
+    standings = {}
+    for stage_id in stage_ids:
+        player_list = []
+        for p in group_players[stage_id]:
+            wins, gf, ga = records[stage_id, p]
+            ratio = gf / (gf + ga) if (gf + ga) > 0 else 0
+            player_list.append({
+                "player": p,
+                "wins": wins,
+                "games_for": gf,
+                "games_against": ga,
+                "ratio": round(ratio, 3),
+            })
+        player_list.sort(key=standing_order, reverse=True)
+        standings[stage_id] = player_list
+    return standings if per_stage else combine_stages(standings)
+
+
+def simulate(graph, rng=None, race_to=3):
+    """依賽程順序隨機打完所有可進行的比賽，回傳有變動的比賽 id"""
+    rng = rng or random.Random()
+    changed = set()
+    for match_id in graph.topological_order():
+        node = graph.matches[match_id]
+        if not node.is_ready():
+            continue
+        winner_slot = rng.choice((1, 2))
+        loser_point = str(rng.randrange(race_to))
+        if winner_slot == 1:
+            changed |= graph.set_result(match_id, 1, str(race_to), loser_point)
+        else:
+            changed |= graph.set_result(match_id, 2, loser_point, str(race_to))
+    return changed
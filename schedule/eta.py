@@ -0,0 +1,201 @@
+"""
+每場比賽的預估開賽時間（Match.eta）。
+
+預估方式：
+- 兩個位置的來源比賽都有預估結束時間後，這場最早在兩者都結束時開始；
+  已排定開賽時間（自動排程或裁判輸入，代表桌子空出來的時間）時不早於該時間
+- 比賽時間以賽事實際打完的比賽的平均時間估算（Tournament.avg_match_seconds，
+  每場賽果登錄時以 running average 更新），輪空比賽為 0
+- 進行中（Match.status 為 in_progress）的比賽超過平均時間仍未結束時，視為現在才結束；
+  排定的開賽時間已過但還沒開始的比賽不算進行中，以現在時間往後估算
+- 可以開打（ready）但沒有排定開賽時間的比賽（例如第一輪）依序分配到最早空出來的桌子：
+  空桌從現在開始，進行中的比賽佔用的桌子在它預估結束時空出來；
+  桌數為 ScheduleSetting.table_count，沒有排程設定時視為桌子足夠，全部從現在開始
+
+登錄賽果或修改開賽時間時，只沿著受影響比賽（以及等桌子的順序有變動的比賽）的下游重新計算，
+預估時間沒變的比賽不再往下傳。
+"""
+import heapq
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .bracket import IN_PROGRESS, READY
+from .models import Match, ScheduleSetting, Tournament
+
+MAX_TIMED_MATCH = timedelta(hours=4)  # 超過這個時間的紀錄（忘了登錄賽果等）不列入平均
+
+
+def _minute(value):
+    """以分鐘為單位（無條件進位），避免秒數差異讓下游一直重新計算"""
+    if value is None:
+        return None
+    rounded = value.replace(second=0, microsecond=0)
+    return rounded if rounded == value else rounded + timedelta(minutes=1)
+
+
+class EtaState:
+    __slots__ = ('start_time', 'finished_at', 'eta')
+
+    def __init__(self, start_time, finished_at, eta):
+        self.start_time = start_time
+        self.finished_at = finished_at
+        self.eta = eta
+
+
+def record_finished(tournament, graph, winners_before, now=None):
+    """
+    更新比賽的結束時間（finished_at）與賽事的平均比賽時間，回傳 {比賽 id: finished_at}。
+    winners_before: 登錄前每場比賽的勝者（依 graph.matches 順序）
+    """
+    now = now or timezone.now()
+    finished = {}
+    for node in graph.matches:
+        before, after = winners_before[node.id], node.winner
+        if before is None and after is not None and not node.is_bye():
+            finished[node.id] = now
+        elif before is not None and after is None:
+            finished[node.id] = None
+    if not finished:
+        return finished
+
+    Match.objects.bulk_update(
+        [Match(pk=graph.matches[i].pk, finished_at=value) for i, value in finished.items()], ['finished_at']
+    )
+
+    done = [graph.matches[i].pk for i, value in finished.items() if value is not None]
+    durations = [
+        (now - start_time).total_seconds()
+        for start_time in Match.objects.filter(id__in=done, start_time__isnull=False).values_list('start_time', flat=True)
+        if timedelta(0) < now - start_time <= MAX_TIMED_MATCH
+    ]
+    if durations:
+        count = tournament.timed_matches
+        average = tournament.avg_match_seconds
+        for seconds in durations:
+            count += 1
+            average += (seconds - average) / count
+        Tournament.objects.filter(id=tournament.pk).update(avg_match_seconds=average, timed_matches=count)
+        tournament.avg_match_seconds, tournament.timed_matches = average, count
+    return finished
+
+
+def project_etas(tournament, graph, seeds, now=None):
+    """
+    重新計算 seeds（graph 中的比賽 id）、等桌子的比賽及其下游比賽的預估開賽時間，
+    寫回有變動的比賽，回傳 eta 有變動的比賽 pk。
+    """
+    now = now or timezone.now()
+    average = timedelta(seconds=tournament.avg_match_seconds)
+
+    def affected(match_ids):
+        """match_ids 的所有下游 + 它們的來源"""
+        downstream = set()
+        stack = list(match_ids)
+        while stack:
+            match_id = stack.pop()
+            if match_id in downstream:
+                continue
+            downstream.add(match_id)
+            stack.extend(target for target, _ in graph.matches[match_id].targets)
+        needed = set(downstream)
+        for match_id in downstream:
+            node = graph.matches[match_id]
+            needed.update(s for s in (node.source1, node.source2) if s is not None)
+        return needed
+
+    states = {}
+
+    def load(match_ids):
+        missing = {graph.matches[i].pk: i for i in match_ids if i not in states}
+        if not missing:
+            return
+        for pk, start_time, finished_at, eta in Match.objects.filter(id__in=missing).values_list(
+            'id', 'start_time', 'finished_at', 'eta'
+        ):
+            states[missing[pk]] = EtaState(start_time, finished_at, eta)
+
+    # 等桌子的比賽與佔用桌子的比賽（決定空桌的順序）
+    ready = [node.id for node in graph.matches if node.winner is None and node.status == READY]
+    playing = [node.id for node in graph.matches if node.winner is None and node.status == IN_PROGRESS]
+    load(affected(seeds) | set(ready) | set(playing))
+    depth = graph.depths()
+
+    def duration(node):
+        return timedelta(0) if node.is_bye() else average
+
+    def end_time(match_id):
+        node, state = graph.matches[match_id], states[match_id]
+        if node.winner is not None:
+            return state.finished_at or now
+        if node.status == IN_PROGRESS:
+            return max((state.start_time or now) + duration(node), now)
+        if state.eta is None:
+            return None
+        return state.eta + duration(node)
+
+    slots = {}
+    waiting = sorted((i for i in ready if states[i].start_time is None), key=lambda i: (depth[i], i))
+    if waiting:
+        tables = ScheduleSetting.objects.filter(tournament_id=tournament.pk).values_list(
+            'table_count', flat=True
+        ).first()
+        if tables:
+            free = sorted(end_time(i) for i in playing)[:tables]
+            free += [now] * (tables - len(free))
+            heapq.heapify(free)
+        for match_id in waiting:
+            begin = heapq.heappop(free) if tables else now
+            slots[match_id] = _minute(max(begin, now))
+            if tables:
+                heapq.heappush(free, slots[match_id] + duration(graph.matches[match_id]))
+
+    # 等桌子的順序有變動的比賽也要往下游更新
+    seeds = set(seeds) | {i for i, eta in slots.items() if eta != states[i].eta}
+    load(affected(seeds))
+
+    def project(match_id):
+        node, state = graph.matches[match_id], states[match_id]
+        if node.winner is not None:
+            return state.eta
+        if node.status == IN_PROGRESS:
+            return state.start_time or _minute(now)
+        if match_id in slots:
+            return slots[match_id]
+        candidates = []
+        for source in (node.source1, node.source2):
+            if source is None:
+                continue
+            end = end_time(source)
+            if end is None:
+                return None
+            candidates.append(end)
+        if state.start_time is not None:
+            candidates.append(state.start_time)
+        if not candidates:
+            return None
+        return _minute(max(candidates + [now]))
+
+    changed = []
+    queue = [(depth[i], i) for i in seeds]
+    heapq.heapify(queue)
+    visited = set()
+    while queue:
+        _, match_id = heapq.heappop(queue)
+        if match_id in visited:
+            continue
+        visited.add(match_id)
+        state = states[match_id]
+        eta = project(match_id)
+        if eta == state.eta and match_id not in seeds:
+            continue
+        if eta != state.eta:
+            state.eta = eta
+            changed.append(match_id)
+        for target, _ in graph.matches[match_id].targets:
+            heapq.heappush(queue, (depth[target], target))
+
+    Match.objects.bulk_update(
+        [Match(pk=graph.matches[i].pk, eta=states[i].eta) for i in changed], ['eta'], batch_size=500
+    )
+    return [graph.matches[i].pk for i in changed]
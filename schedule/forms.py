@@ -15,6 +15,12 @@ class PlayerImportForm(forms.ModelForm):
 
     type = forms.ChoiceField(choices=TYPE_CHOICES, label="賽制")
 
+    reuse_players = forms.BooleanField(
+        label="沿用既有選手",
+        required=False,
+        help_text="名稱相同（不分大小寫、全形半形、空白）的選手沿用既有資料，不另外新增",
+    )
+
     class Meta:
         model = Tournament
         fields = [
@@ -40,6 +46,9 @@ class PlayerImportForm(forms.ModelForm):
             for field in required_fields:
                 if not cleaned_data.get(field):
                     self.add_error(field, f"當賽制為循環賽時，『{self.fields[field].label}』為必填欄位。")
+            group_size, advance = cleaned_data.get('group_size'), cleaned_data.get('advance_per_group')
+            if group_size and advance and advance > group_size:
+                self.add_error('advance_per_group', "各組晉級人數不能大於各組人數。")
         else:
             # 非循環賽時可清空以避免誤存
             cleaned_data['num_groups'] = None
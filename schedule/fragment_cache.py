@@ -0,0 +1,46 @@
+"""
+賽程表每個階段區塊的 HTML 片段快取。
+
+key 由階段 id + Stage.version 組成，比賽有變動時只需讓該階段的 version +1
+（見 utils.touch_stages），其他階段的快取不受影響。
+使用的快取後端由 settings.SCHEDULE_FRAGMENT_CACHE 指定（預設 local-memory）。
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import get_language
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def get_fragment_cache():
+    return caches[getattr(settings, 'SCHEDULE_FRAGMENT_CACHE', 'default')]
+
+
+def get_fragment_timeout():
+    return getattr(settings, 'SCHEDULE_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def make_key(stage, vary_on=()):
+    parts = [str(stage.pk), str(stage.version), get_language() or '']
+    parts += [str(value) for value in vary_on]
+    return "stage-fragment:" + ":".join(parts)
+
+
+def record(hit):
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def get_stats():
+    with _lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 3) if total else 0}
+
+
+def reset_stats():
+    with _lock:
+        _stats["hits"] = _stats["misses"] = 0
@@ -0,0 +1,165 @@
+"""
+以資料庫為佇列的背景工作。
+
+enqueue() 只寫入一筆 Job 就回傳，由 manage.py run_jobs 的 worker 取出執行：
+- 去重複：同一賽事同一種工作只會有一筆排隊或執行中（unique_active_job 條件式唯一限制）
+- 賽事鎖：同一賽事同時只執行一個工作，其他工作等它結束才會被取出
+- 取工作以單一的 UPDATE ... WHERE status='queued' AND 賽事沒有執行中的工作 搶占，
+  多個 worker 也不會重複執行，或同時執行同一賽事的兩個工作
+
+settings.SCHEDULE_JOBS_EAGER = True 時 enqueue() 直接在目前的請求中執行（開發 / 測試用）。
+"""
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .models import Job, Match, Tournament
+from .standings import rebuild_standings
+from .utils import advance_from_double_elim_and_create_single_elim, advance_from_round_robin_and_create_single_elim
+
+logger = logging.getLogger(__name__)
+
+
+class JobError(ValueError):
+    """工作目前無法執行（例如比賽還沒打完）；只記錄訊息，不記錄 traceback"""
+
+
+def knockout_exists(tournament):
+    """賽事是否已有第二階段（單敗）的比賽，判斷方式同賽程表的分類"""
+    return tournament.stages.exclude(name__contains='Round').exclude(name__contains='Qualification').exists()
+
+
+MAX_LISTED_MATCHES = 10  # 錯誤訊息中最多列出幾場未完成的比賽
+
+
+def blocking_matches(tournament):
+    """
+    擋住晉級的未完成比賽。
+    循環賽依積分表的規則（見 utils._standing_side_queryset）：兩位選手都確定且雙方都有比分就已計入積分，
+    只登錄比分、沒有點選勝者的比賽也算完成；雙敗以勝者晉級，必須有勝者（或輪空）。
+    """
+    unfinished = Match.objects.filter(tournament=tournament).exclude(status__in=("done", "walkover"))
+    if tournament.type == 'round_robin':
+        unfinished = unfinished.filter(
+            Q(player1__isnull=True) | Q(player2__isnull=True) | Q(point1='') | Q(point2='')
+        )
+    return unfinished.order_by('match_number', 'id')
+
+
+def advance_tournament(tournament):
+    """分組 / 雙敗結束後產生單敗籤表；已產生過時不再重複產生"""
+    if knockout_exists(tournament):
+        return "單敗籤表已存在，未重新產生"
+    # 還沒打完就產生的話，未完成的組別沒有晉級者，而且之後不會再重新產生
+    blocking = list(blocking_matches(tournament).values_list('stage__name', 'match_number'))
+    if blocking:
+        listed = "、".join(f"{stage} 第 {number} 場" for stage, number in blocking[:MAX_LISTED_MATCHES])
+        if len(blocking) > MAX_LISTED_MATCHES:
+            listed += " …"
+        raise JobError(f"還有 {len(blocking)} 場比賽尚未完成（{listed}），全部完成後才能生成單敗籤表")
+    if tournament.type == 'round_robin':
+        advance_from_round_robin_and_create_single_elim(tournament)
+    elif tournament.type == 'double_elim':
+        advance_from_double_elim_and_create_single_elim(tournament)
+    else:
+        raise ValueError("只有循環賽與雙敗才能生成單敗籤表")
+    return "單敗籤表已成功生成"
+
+
+def rebuild_tournament_standings(tournament):
+    return f"積分表已重算（{len(rebuild_standings(tournament))} 筆）"
+
+
+HANDLERS = {
+    "advance": advance_tournament,
+    "rebuild_standings": rebuild_tournament_standings,
+}
+
+
+def enqueue(kind, tournament, user=None):
+    """排入工作並回傳 Job；同一賽事已有相同工作在排隊或執行中時回傳該筆"""
+    if kind not in HANDLERS:
+        raise ValueError(f"未知的工作類型：{kind}")
+    active = Job.objects.filter(tournament=tournament, kind=kind, status__in=Job.ACTIVE_STATUSES)
+    job = active.first()
+    if job is None:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(
+                    kind=kind, tournament=tournament,
+                    created_by=user if user is not None and user.is_authenticated else None,
+                )
+        except IntegrityError:
+            # 另一個請求同時排入了相同的工作
+            job = active.get()
+    if getattr(settings, 'SCHEDULE_JOBS_EAGER', False) and job.status == "queued":
+        run_job(job)
+    return job
+
+
+def claim_next():
+    """取出下一個可執行的工作並標記為執行中；沒有工作時回傳 None"""
+    while True:
+        busy = Job.objects.filter(status="running").values('tournament_id')
+        job = Job.objects.filter(status="queued").exclude(tournament_id__in=busy).order_by('id').first()
+        if job is None:
+            return None
+        # 賽事鎖的條件也放進搶占的 UPDATE（同一個 statement）：另一個 worker 在兩次查詢之間
+        # 取走同賽事的其他工作時，這裡不會再搶到
+        claimed = (
+            Job.objects.filter(id=job.id, status="queued")
+            .exclude(tournament_id__in=Subquery(Job.objects.filter(status="running").values('tournament_id')))
+            .update(status="running", started_at=timezone.now())
+        )
+        if claimed:
+            job.status = "running"
+            return job
+
+
+def run_job(job):
+    """執行一個工作並記錄結果，工作本身在同一個交易中，失敗時不會留下一半的資料"""
+    if job.status == "queued":
+        job.status, job.started_at = "running", timezone.now()
+        Job.objects.filter(id=job.id).update(status=job.status, started_at=job.started_at)
+    try:
+        # 完成狀態與工作內容一起 commit
+        with transaction.atomic():
+            tournament = Tournament.objects.get(id=job.tournament_id)
+            job.result = HANDLERS[job.kind](tournament) or ''
+            _finish(job, "done")
+    except JobError as e:
+        job.result = str(e)
+        _finish(job, "failed")
+    except Exception as e:
+        logger.exception("工作 %s 失敗", job)
+        job.result = f"{e}\n\n{traceback.format_exc()}"
+        _finish(job, "failed")
+    return job
+
+
+def _finish(job, status):
+    job.status, job.finished_at = status, timezone.now()
+    Job.objects.filter(id=job.id).update(status=job.status, result=job.result, finished_at=job.finished_at)
+
+
+def requeue_stale(timeout):
+    """執行超過 timeout（timedelta）仍未結束的工作（worker 中途結束）重新排隊"""
+    return Job.objects.filter(status="running", started_at__lt=timezone.now() - timeout).update(
+        status="queued", started_at=None
+    )
+
+
+def run_pending(limit=None):
+    """依序執行目前可執行的工作，回傳執行的數量"""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
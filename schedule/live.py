@@ -0,0 +1,169 @@
+"""
+即時比分推播（Server-Sent Events，需以 ASGI 部署）。
+
+寫入賽果後（apply_results 的交易 commit 之後）呼叫 publish_match_updates()，
+由 process 內的 broker 直接推給同一個 worker 上所有觀看該賽事的連線；
+每個連線只是一個 asyncio.Queue，一個 worker 可以撐住大量閒置的觀眾連線。
+
+事件 id 為同一個交易中寫入的比賽變動紀錄的版本（MatchChange.version，見 utils.record_match_changes），
+每次 commit 各有自己的版本；修改賽事欄位等沒有比賽變動的版本不會有事件，id 可能跳號。
+斷線重連時瀏覽器會帶上 Last-Event-ID，從 MatchChange 查出之後變動的比賽合併成一個事件補送
+（同增量同步 API TournamentChangesView）；id 比賽事目前的版本還新時送出 reset 事件，請前端重新整理。
+
+Django 3.2 的 ASGI handler 無法非同步串流回應，所以 SSE 路徑由 billiard/asgi.py
+直接交給 sse_application() 處理，其餘請求照常交給 Django。
+"""
+import asyncio
+import json
+import re
+import threading
+from collections import deque
+
+from asgiref.sync import sync_to_async
+
+from .models import Match, Tournament
+from .utils import serialize_matches
+
+SSE_PATH = re.compile(r'^/TournamentEventsView/(?P<pk>\d+)$')
+KEEPALIVE_SECONDS = 15
+
+
+class LiveBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # tournament_id -> {(loop, queue), ...}
+
+    def is_watched(self, tournament_id):
+        """目前有人連線的賽事才需要產生事件（重連時從 MatchChange 補送）"""
+        with self._lock:
+            return bool(self._subscribers.get(tournament_id))
+
+    def publish(self, tournament_id, event_id, event, data):
+        item = (event_id, event, data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(tournament_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def subscribe(self, tournament_id):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(tournament_id, set()).add((loop, queue))
+        return queue
+
+    def unsubscribe(self, tournament_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(tournament_id, set())
+            for item in [s for s in subscribers if s[1] is queue]:
+                subscribers.discard(item)
+            if not subscribers:
+                self._subscribers.pop(tournament_id, None)
+
+    def subscriber_count(self, tournament_id=None):
+        with self._lock:
+            if tournament_id is not None:
+                return len(self._subscribers.get(tournament_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broker = LiveBroker()
+
+
+def publish_match_updates(tournament_id, match_ids, version):
+    """
+    推播比賽更新；應在交易 commit 後呼叫（transaction.on_commit）。
+    version: 同一個交易中 record_match_changes() 寫入的版本，作為事件 id
+    """
+    if not match_ids or version is None or not broker.is_watched(tournament_id):
+        return
+    broker.publish(tournament_id, version, "match", {"matches": serialize_matches(Match.objects.filter(id__in=match_ids))})
+
+
+def missed_events(tournament_id, last_event_id):
+    """重連時補送的事件：last_event_id 之後有變動的比賽（依 MatchChange）合併成一個事件"""
+    version = Tournament.objects.filter(id=tournament_id).values_list('version', flat=True).first()
+    if version is None or last_event_id is None or last_event_id == version:
+        return []
+    if last_event_id > version:
+        return [(version, "reset", {})]
+    changes = list(Match.objects.filter(
+        changes__tournament_id=tournament_id, changes__version__gt=last_event_id
+    ).values_list('id', 'changes__version'))
+    if not changes:
+        return []
+    match_ids = {pk for pk, _ in changes}
+    event_id = max(change_version for _, change_version in changes)
+    return [(event_id, "match", {"matches": serialize_matches(Match.objects.filter(id__in=match_ids))})]
+
+
+def format_event(event_id, event, data):
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+
+def _get_last_event_id(scope):
+    for name, value in scope.get('headers', ()):
+        if name == b'last-event-id':
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    match = re.search(rb'(?:^|&)last_event_id=(\d+)', scope.get('query_string', b''))
+    return int(match.group(1)) if match else None
+
+
+async def sse_application(scope, receive, send, tournament_id):
+    exists = await sync_to_async(Tournament.objects.filter(id=tournament_id).exists)()
+    if not exists:
+        await send({'type': 'http.response.start', 'status': 404, 'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+
+    # 先訂閱再查詢漏掉的變動：期間 commit 的變動一定會在其中之一，重複的由 last_sent 略過
+    queue = broker.subscribe(tournament_id)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+        last_sent = _get_last_event_id(scope)
+        for item in await sync_to_async(missed_events)(tournament_id, last_sent):
+            await send({'type': 'http.response.body', 'body': format_event(*item), 'more_body': True})
+            last_sent = item[0]
+
+        while not disconnected.done():
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=KEEPALIVE_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                item = getter.result()
+                if last_sent is not None and item[0] <= last_sent:
+                    continue
+                body = format_event(*item)
+                last_sent = item[0]
+            else:
+                getter.cancel()
+                if disconnected.done():
+                    break
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broker.unsubscribe(tournament_id, queue)
+        disconnected.cancel()
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,301 @@
+"""
+負載測試（manage.py load_test）。
+
+在合成的賽事上同時模擬：
+    spectators  N 個觀眾輪流開啟賽程表（TournamentDetailView）與賽事列表（TournamentListView）
+    referees    M 個裁判以 MatchDetailView 登錄賽果；可開打的比賽用完後改為更正已完成的比賽
+可在同一個 process 內以 django.test.Client 直接呼叫（預設，使用 settings 中的資料庫），
+或以 --url 對本機已啟動的伺服器送出 HTTP 請求（伺服器需使用同一個資料庫）。
+
+回報每種角色的吞吐量、延遲百分位數、錯誤率、5xx 比例，以及 SQLite "database is locked" 的比例，
+作為活動前決定 worker 數量的依據。合成的賽事、選手與裁判帳號結束後會刪除。
+
+鎖定由伺服器端的 DatabaseLockedMiddleware 以 X-Database-Locked 標頭回報（不從錯誤頁內容推測，
+DEBUG=False 時錯誤頁不含例外訊息）；伺服器沒有啟用這個 middleware 時，鎖定只會算在 5xx 裡。
+"""
+import http.cookiejar
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connections, transaction
+from django.test import Client
+from django.urls import reverse
+
+from .models import Match, Player, Tournament
+from .utils import (
+    bulk_create_with_ids, create_double_elimination_bracket, create_mixed_bracket, create_single_elimination_bracket,
+)
+
+# 一般 SQLite 檔案為 database is locked；shared cache（例如測試用的記憶體資料庫）為 database table is locked
+LOCKED_MESSAGES = ("database is locked", "database table is locked")
+LOCKED_HEADER = "X-Database-Locked"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def is_locked_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCKED_MESSAGES)
+
+
+def _mark_locked(sender, request=None, **kwargs):
+    # 每一層 middleware 把例外轉成 500 回應時都會送出 got_request_exception，此時 sys.exc_info() 為該例外
+    if request is not None and is_locked_error(sys.exc_info()[1]):
+        request.database_locked = True
+
+
+class DatabaseLockedMiddleware:
+    """請求因資料庫鎖定而失敗時，在回應加上 X-Database-Locked: 1（放在 MIDDLEWARE 最前面）"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        got_request_exception.connect(_mark_locked, dispatch_uid="schedule.loadtest.locked")
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, 'database_locked', False):
+            response[LOCKED_HEADER] = "1"
+        return response
+
+
+class RoleStats:
+    """一個 worker 的結果（各 worker 各自累加，結束後再合併，不需要鎖）"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.server_errors = 0
+        self.locked = 0
+        self.statuses = Counter()
+
+    def add(self, seconds, status, locked=False):
+        self.latencies.append(seconds)
+        self.statuses[status] += 1
+        if status == 'exception' or status >= 400:
+            self.errors += 1
+        if status != 'exception' and status >= 500:
+            self.server_errors += 1
+        if locked:
+            self.locked += 1
+
+    def merge(self, other):
+        self.latencies += other.latencies
+        self.errors += other.errors
+        self.server_errors += other.server_errors
+        self.locked += other.locked
+        self.statuses.update(other.statuses)
+
+    def summary(self, duration):
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+        result = {
+            "requests": count,
+            "throughput": count / duration if duration else 0.0,
+            "error_rate": self.errors / count if count else 0.0,
+            "server_error_rate": self.server_errors / count if count else 0.0,
+            "locked_rate": self.locked / count if count else 0.0,
+            "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+            "statuses": dict(self.statuses),
+        }
+        for p in PERCENTILES:
+            result[f"p{p}_ms"] = ordered[min(count - 1, count * p // 100)] * 1000 if ordered else 0.0
+        return result
+
+
+# === 送出請求 ===
+# 兩種 transport 的 request() 都回傳 (狀態碼或 'exception', 是否因資料庫鎖定而失敗)
+class InProcessTransport:
+    """以 django.test.Client 在同一個 process 內呼叫 view（每個 worker 一個 Client 與資料庫連線）"""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def login(self, user, password):
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            response = self.client.post(path, data)
+        else:
+            response = self.client.get(path)
+        return response.status_code, response.has_header(LOCKED_HEADER)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # 登錄賽果後的 302 直接算成功，不再載入賽程表
+
+
+class HttpTransport:
+    """對已啟動的伺服器送出 HTTP 請求（帶 cookie，POST 時附上 CSRF token）"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def cookie(self, name):
+        for cookie in self.cookies:
+            if cookie.name == name:
+                return cookie.value
+        return ''
+
+    def csrf_token(self):
+        return self.cookie('csrftoken')
+
+    def login(self, user, password):
+        self.request('GET', reverse('Login'))
+        self.request('POST', reverse('Login'), {"username": user.username, "password": password})
+        if not self.cookie('sessionid'):
+            raise RuntimeError(f"無法以 {user.username} 登入 {self.base_url}")
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        headers = {}
+        if method == 'POST':
+            if not self.csrf_token():
+                self.request('GET', reverse('Login'))  # 取得 csrftoken cookie
+            body = urllib.parse.urlencode(dict(data or {}, csrfmiddlewaretoken=self.csrf_token())).encode()
+            headers = {'Referer': url, 'X-CSRFToken': self.csrf_token()}
+        try:
+            with self.opener.open(urllib.request.Request(url, body, headers, method=method), timeout=self.timeout) as r:
+                r.read()
+                return r.status, False
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get(LOCKED_HEADER) == "1"
+        except (urllib.error.URLError, OSError):
+            return 'exception', False
+
+
+# === 合成賽事 ===
+class LoadTest:
+
+    def __init__(self, spectators, referees, duration, players=256, tournament_type="single_elim",
+                 think_ms=0, base_url=None):
+        self.spectators = spectators
+        self.referees = referees
+        self.duration = duration
+        self.players = players
+        self.tournament_type = tournament_type
+        self.think = think_ms / 1000
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._queue = []
+
+    def make_transport(self):
+        return HttpTransport(self.base_url) if self.base_url else InProcessTransport()
+
+    @transaction.atomic
+    def setup(self):
+        group_size = 4 if self.players <= 16 else 8
+        num_groups = -(-self.players // group_size)
+        self.tournament = Tournament.objects.create(
+            name="load test", type=self.tournament_type, semester="load test", player_num=self.players,
+            num_groups=num_groups, group_size=group_size, advance_per_group=min(2, group_size),
+        )
+        self.player_objs = bulk_create_with_ids(Player, [
+            Player(name=f"Load {i}", normalized_name=f"load {i}", innings=3) for i in range(self.players)
+        ])
+        t = self.tournament
+        if self.tournament_type == "single_elim":
+            create_single_elimination_bracket(t, self.player_objs)
+        elif self.tournament_type == "double_elim":
+            create_double_elimination_bracket(t, self.player_objs)
+        else:
+            create_mixed_bracket(t, self.player_objs, t.num_groups, t.group_size, t.advance_per_group)
+
+        self.password = secrets.token_urlsafe(16)
+        self.user = User.objects.create_user(f"loadtest-{secrets.token_hex(4)}", password=self.password)
+
+    def cleanup(self):
+        self.tournament.delete()
+        Player.objects.filter(id__in=[p.pk for p in self.player_objs]).delete()
+        self.user.delete()
+
+    def next_match(self):
+        """下一場要登錄的比賽：可開打的比賽，用完後隨機更正一場已完成的比賽"""
+        with self._lock:
+            if not self._queue:
+                self._queue = list(Match.objects.filter(tournament=self.tournament, status="ready")
+                                   .values_list('id', flat=True))
+                random.shuffle(self._queue)
+            if self._queue:
+                return self._queue.pop()
+        done = list(Match.objects.filter(tournament=self.tournament, status="done").values_list('id', flat=True)[:200])
+        return random.choice(done) if done else None
+
+    # === worker ===
+    def spectator(self, stats, deadline):
+        transport = self.make_transport()
+        paths = [reverse("TournamentDetailView", args=[self.tournament.id]), reverse("TournamentListView")]
+        i = 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            status, locked = transport.request('GET', paths[i % len(paths)])
+            stats.add(time.perf_counter() - started, status, locked)
+            i += 1
+            if self.think:
+                time.sleep(self.think)
+
+    def referee(self, stats, deadline):
+        transport = self.make_transport()
+        transport.login(self.user, self.password)
+        while time.monotonic() < deadline:
+            match_id = self.next_match()
+            if match_id is None:
+                time.sleep(0.05)
+                continue
+            winner = random.choice(("player1", "player2"))
+            data = {
+                "point1": "3" if winner == "player1" else "1", "point2": "1" if winner == "player1" else "3",
+                "winner": winner, "table": "", "start_time": "",
+            }
+            started = time.perf_counter()
+            status, locked = transport.request('POST', reverse("MatchDetailView", args=[match_id]), data)
+            stats.add(time.perf_counter() - started, status, locked)
+            if self.think:
+                time.sleep(self.think)
+
+    def _run_worker(self, target, stats, deadline):
+        try:
+            target(stats, deadline)
+        finally:
+            connections.close_all()
+
+    def run(self):
+        """回傳 {"spectators": summary, "referees": summary, "total": summary, "duration": 秒}"""
+        self.setup()
+        try:
+            workers = [(self.spectator, RoleStats()) for _ in range(self.spectators)]
+            workers += [(self.referee, RoleStats()) for _ in range(self.referees)]
+            started = time.monotonic()
+            deadline = started + self.duration
+            threads = [threading.Thread(target=self._run_worker, args=(target, stats, deadline))
+                       for target, stats in workers]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - started
+        finally:
+            self.cleanup()
+
+        spectators, referees, total = RoleStats(), RoleStats(), RoleStats()
+        for target, stats in workers:
+            (spectators if target == self.spectator else referees).merge(stats)
+            total.merge(stats)
+        return {
+            "duration": elapsed,
+            "spectators": spectators.summary(elapsed),
+            "referees": referees.summary(elapsed),
+            "total": total.summary(elapsed),
+        }
@@ -0,0 +1,88 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from schedule.models import Match, MatchChange, Player, Standing, Tournament
+from schedule.utils import bulk_create_with_ids, create_single_elimination_bracket
+
+# 全表掃描的判斷方式（依資料庫）；SQLite 的 "SCAN x USING ... INDEX" 是依索引順序掃完整張表，同樣算全表掃描
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(?P<table>\w+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+}
+
+
+def hot_queries(tournament):
+    """各頁面與寫入路徑實際使用的查詢（依賽事 / 階段 / 來源比賽篩選）"""
+    stage = tournament.stages.order_by('order').first()
+    match = Match.objects.filter(tournament=tournament).order_by('id').first()
+    name = Player.objects.filter(id=match.player1_id).values_list('name', flat=True).first()
+    return [
+        ("賽程表：賽事的階段", tournament.stages.order_by('order')),
+        ("賽程表：整個賽事的比賽", Match.objects.filter(tournament=tournament)
+            .select_related('stage', 'player1', 'player2', 'winner', 'source_match1', 'source_match2')
+            .order_by('id')),
+        ("賽程表：選手名稱搜尋", Match.objects.filter(tournament=tournament)
+            .filter(Q(player1__name__icontains=name) | Q(player2__name__icontains=name))
+            .order_by('id')),
+        ("階段的比賽", stage.matches.all().order_by('id')),
+        ("籤表圖：以 source_match1 找下一場", Match.objects.filter(source_match1=match)),
+        ("籤表圖：以 source_match2 找下一場", Match.objects.filter(source_match2=match)),
+        ("裁判看板：可以開打的比賽", Match.objects.filter(tournament=tournament, status__in=("ready", "in_progress"))
+            .select_related('stage', 'player1', 'player2')),
+        ("階段內可以開打的比賽", Match.objects.filter(stage=stage, status="ready")),
+        ("增量同步：版本之後的變動", Match.objects.filter(
+            changes__tournament=tournament, changes__version__gt=tournament.version - 1).distinct()),
+        ("積分表", Standing.objects.filter(tournament=tournament).order_by('stage')),
+        ("變動紀錄", MatchChange.objects.filter(tournament=tournament, version__gt=0)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "以合成的大型賽事檢查熱門查詢的執行計畫（EXPLAIN），有全表掃描時失敗；資料最後會回滾"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=1024, help="合成賽事的選手人數")
+        parser.add_argument("--verbose-plans", action="store_true", help="列出每個查詢完整的執行計畫")
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"不支援的資料庫：{connection.vendor}")
+
+        failures = []
+        with transaction.atomic():
+            tournament = self.build_tournament(options["players"])
+            for name, queryset in hot_queries(tournament):
+                plan = queryset.explain()
+                scans = [line for line in plan.splitlines() if pattern.search(line)]
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"✗ {name}"))
+                    for line in scans:
+                        self.stdout.write(f"    {line.strip()}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✓ {name}"))
+                if options["verbose_plans"]:
+                    for line in plan.splitlines():
+                        self.stdout.write(f"      {line}")
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} 個查詢使用全表掃描：{', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("所有熱門查詢都有使用索引"))
+
+    def build_tournament(self, player_num):
+        if player_num < 2:
+            raise CommandError("--players 至少為 2")
+        tournament = Tournament.objects.create(
+            name="EXPLAIN", type="single_elim", semester="audit", player_num=player_num
+        )
+        players = bulk_create_with_ids(Player, [
+            Player(name=f"Audit {i}", normalized_name=f"audit {i}", innings=3) for i in range(player_num)
+        ])
+        create_single_elimination_bracket(tournament, players)
+        self.stdout.write(f"合成賽事：{player_num} 位選手，{Match.objects.filter(tournament=tournament).count()} 場比賽")
+        return tournament
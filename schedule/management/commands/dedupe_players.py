@@ -0,0 +1,116 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Min, Q, Value, When
+
+from schedule.models import Match, Player, Stage, Standing, Tournament
+from schedule.names import normalize_name
+from schedule.standings import rebuild_standings
+from schedule.utils import record_match_changes, touch_stages, touch_tournaments
+
+PLAYER_FIELDS = ("player1", "player2", "winner", "loser")
+
+
+class Command(BaseCommand):
+    help = "合併正規化名稱相同的重複選手：比賽改指向最早建立的一筆，再刪除其餘選手（同一賽事中的同名選手不合併）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="每個交易合併幾組重複選手")
+        parser.add_argument("--dry-run", action="store_true", help="只列出會合併的選手，不寫入")
+        parser.add_argument("--skip-normalize", action="store_true", help="不重新計算所有選手的正規化名稱")
+
+    def handle(self, *args, **options):
+        if not options["skip_normalize"]:
+            self.normalize_all()
+
+        groups = list(
+            Player.objects.exclude(normalized_name__in=['', '-'])
+            .values('normalized_name').annotate(n=Count('id'), keeper=Min('id')).filter(n__gt=1)
+            .values_list('normalized_name', 'keeper')
+        )
+        self.stdout.write(f"重複的選手名稱：{len(groups)} 組")
+
+        merged = skipped = 0
+        batch_size = options["batch_size"]
+        for start in range(0, len(groups), batch_size):
+            batch = dict(groups[start:start + batch_size])
+            members = defaultdict(list)
+            for pk, key in Player.objects.filter(normalized_name__in=batch).values_list('id', 'normalized_name'):
+                members[key].append(pk)
+
+            # 同一賽事中有兩位以上同名選手時不能合併（會變成自己對自己、積分表重疊），只列出來
+            for key, tournament_ids in sorted(self.find_collisions(members).items()):
+                self.stdout.write(self.style.WARNING(
+                    f"  略過 {key}：賽事 {', '.join(map(str, tournament_ids))} 中有多位同名選手 {sorted(members[key])}"
+                ))
+                del members[key]
+                skipped += 1
+
+            mapping = {pk: batch[key] for key, pks in members.items() for pk in pks if pk != batch[key]}
+            if options["dry_run"]:
+                for pk, keeper in sorted(mapping.items()):
+                    self.stdout.write(f"  {pk} -> {keeper}")
+            else:
+                self.merge(mapping)
+            merged += len(mapping)
+
+        verb = "將合併" if options["dry_run"] else "已合併"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {merged} 位重複選手"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"{skipped} 組因同一賽事中有多位同名選手而略過，請手動確認"))
+
+    def find_collisions(self, members):
+        """members: {正規化名稱: [選手 id]}；回傳 {正規化名稱: [有兩位以上該名稱選手參賽的賽事 id]}"""
+        key_of = {pk: key for key, pks in members.items() for pk in pks}
+        entrants = defaultdict(set)  # (名稱, 賽事) -> 選手
+        for field in ("player1", "player2"):
+            rows = Match.objects.filter(**{f"{field}_id__in": key_of}).values_list('tournament_id', f"{field}_id")
+            for tournament_id, pk in rows.distinct():
+                entrants[key_of[pk], tournament_id].add(pk)
+        collisions = defaultdict(list)
+        for (key, tournament_id), pks in entrants.items():
+            if len(pks) > 1:
+                collisions[key].append(tournament_id)
+        return {key: sorted(ids) for key, ids in collisions.items()}
+
+    def normalize_all(self, chunk_size=2000):
+        batch = []
+        for player in Player.objects.only('id', 'name', 'normalized_name').iterator(chunk_size=chunk_size):
+            key = normalize_name(player.name)
+            if key != player.normalized_name:
+                player.normalized_name = key
+                batch.append(player)
+        Player.objects.bulk_update(batch, ['normalized_name'], batch_size=chunk_size)
+
+    @transaction.atomic
+    def merge(self, mapping):
+        """mapping: {重複選手 id: 保留的選手 id}；每個欄位一個 UPDATE"""
+        duplicates = list(mapping)
+        condition = Q()
+        for field in PLAYER_FIELDS:
+            condition |= Q(**{f"{field}_id__in": duplicates})
+        affected = list(Match.objects.filter(condition).values_list('id', 'stage_id', 'tournament_id'))
+
+        for field in PLAYER_FIELDS:
+            column = f"{field}_id"
+            Match.objects.filter(**{f"{column}__in": duplicates}).update(**{column: Case(
+                *[When(**{column: pk}, then=Value(keeper)) for pk, keeper in mapping.items()],
+                output_field=IntegerField(),
+            )})
+
+        # 積分表以選手為 key，受影響的賽事整個重算
+        tournaments = list(Tournament.objects.filter(standings__player_id__in=duplicates).distinct())
+        Standing.objects.filter(player_id__in=duplicates).delete()
+        for tournament in tournaments:
+            rebuild_standings(tournament)
+
+        Player.objects.filter(id__in=duplicates).delete()
+
+        changes = defaultdict(list)
+        for match_id, _, tournament_id in affected:
+            changes[tournament_id].append(match_id)
+        touch_tournaments(Tournament.objects.filter(id__in=changes))
+        touch_stages(Stage.objects.filter(id__in={stage_id for _, stage_id, _ in affected}))
+        for tournament_id, match_ids in changes.items():
+            record_match_changes(tournament_id, match_ids)
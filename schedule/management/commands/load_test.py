@@ -0,0 +1,70 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from schedule.benchmarks import TYPES
+from schedule.loadtest import PERCENTILES, LoadTest
+
+
+class Command(BaseCommand):
+    help = "模擬 N 個觀眾瀏覽賽程表、M 個裁判登錄賽果，回報吞吐量、延遲百分位數與錯誤 / 資料庫鎖定比例"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--spectators", type=int, default=20, help="同時瀏覽的觀眾數")
+        parser.add_argument("--referees", type=int, default=4, help="同時登錄賽果的裁判數")
+        parser.add_argument("--duration", type=float, default=30, help="測試秒數")
+        parser.add_argument("--players", type=int, default=256, help="合成賽事的選手人數")
+        parser.add_argument("--type", choices=TYPES, default="single_elim", help="合成賽事的賽制")
+        parser.add_argument("--think-ms", type=int, default=0, help="每個請求之間的等待（毫秒）")
+        parser.add_argument("--url", help="對已啟動的伺服器測試，例如 http://127.0.0.1:8000（預設在同一個 process 內）")
+        parser.add_argument("--json", metavar="PATH", help="把結果另存成 JSON")
+
+    def handle(self, *args, **options):
+        if options["spectators"] < 0 or options["referees"] < 0 or options["spectators"] + options["referees"] == 0:
+            raise CommandError("--spectators / --referees 至少要有一個大於 0")
+        if options["players"] < 2:
+            raise CommandError("--players 至少為 2")
+
+        load_test = LoadTest(
+            options["spectators"], options["referees"], options["duration"], options["players"],
+            options["type"], options["think_ms"], options["url"],
+        )
+        target = options["url"] or "in-process"
+        self.stdout.write(
+            f"{target}：{options['spectators']} 觀眾 / {options['referees']} 裁判，{options['duration']:g} 秒 …"
+        )
+        if options["url"]:
+            result = load_test.run()
+        else:
+            # 錯誤已統計在結果中，不逐筆印出 django.request 的 traceback
+            request_logger = logging.getLogger("django.request")
+            level = request_logger.level
+            request_logger.setLevel(logging.CRITICAL)
+            try:
+                with override_settings(ALLOWED_HOSTS=["testserver"]):
+                    result = load_test.run()
+            finally:
+                request_logger.setLevel(level)
+
+        header = f"{'':<12}{'req':>8}{'req/s':>9}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+        header += f"{'max':>9}{'error':>8}{'5xx':>8}{'locked':>8}"
+        self.stdout.write(header + "   (ms)")
+        for role in ("spectators", "referees", "total"):
+            s = result[role]
+            line = f"{role:<12}{s['requests']:>8}{s['throughput']:>9.1f}"
+            line += "".join(f"{s[f'p{p}_ms']:>9.1f}" for p in PERCENTILES)
+            line += f"{s['max_ms']:>9.1f}{s['error_rate']:>8.1%}{s['server_error_rate']:>8.1%}{s['locked_rate']:>8.1%}"
+            self.stdout.write(line)
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+
+        if result["total"]["locked_rate"]:
+            self.stdout.write(self.style.WARNING("有請求遇到 database is locked：減少 worker 數或改用其他資料庫"))
+        elif result["total"]["server_error_rate"] and options["url"]:
+            self.stdout.write(self.style.WARNING(
+                "有 5xx 回應但沒有鎖定標頭：確認伺服器的 MIDDLEWARE 有 schedule.loadtest.DatabaseLockedMiddleware"
+            ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from schedule.models import Standing, Tournament
+from schedule.standings import rebuild_standings
+
+
+class Command(BaseCommand):
+    help = "依所有比賽結果完整重算循環賽積分表（Standing）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tournament_ids", nargs="*", type=int, help="只重算指定的賽事（預設全部）")
+        parser.add_argument("--missing", action="store_true", help="只重算還沒有積分表的賽事（升級後補齊用）")
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.filter(stages__name__icontains="group").distinct()
+        if options["tournament_ids"]:
+            tournaments = tournaments.filter(id__in=options["tournament_ids"])
+        if options["missing"]:
+            tournaments = tournaments.exclude(id__in=Standing.objects.values('tournament_id'))
+
+        for tournament in tournaments:
+            rows = rebuild_standings(tournament)
+            self.stdout.write(f"{tournament}: {len(rows)} 筆")
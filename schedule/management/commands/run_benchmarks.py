@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from schedule.benchmarks import SIZES, TYPES, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "以合成賽事量測建立籤表、積分表、登錄賽果與賽程表的時間 / 查詢數 / 記憶體，可存成或比較 JSON 基準"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--types", nargs="+", choices=TYPES, default=list(TYPES), help="賽制")
+        parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="選手人數")
+        parser.add_argument("--save", metavar="PATH", help="把結果存成基準 JSON")
+        parser.add_argument("--compare", metavar="PATH", help="與基準 JSON 比較，有退步時失敗")
+        parser.add_argument("--threshold", type=float, default=0.25, help="允許退步的比例（預設 0.25）")
+        parser.add_argument("--repeat", type=int, default=3, help="每個情境重複幾次，時間取最小值")
+        parser.add_argument("--no-memory", action="store_true", help="不量測 peak memory（省下量測記憶體的那一次執行）")
+
+    def handle(self, *args, **options):
+        if any(size < 2 for size in options["sizes"]):
+            raise CommandError("--sizes 至少為 2")
+        if options["repeat"] < 1:
+            raise CommandError("--repeat 至少為 1")
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"無法讀取基準 {options['compare']}：{e}")
+
+        def report(key, values):
+            self.stdout.write(f"{key:<32} " + "  ".join(f"{metric}={value}" for metric, value in values.items()))
+
+        current = run_benchmarks(
+            options["types"], options["sizes"], not options["no_memory"], options["repeat"], report
+        )
+
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as f:
+                json.dump(current, f, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"已存成基準：{options['save']}"))
+
+        if baseline is not None:
+            regressions = compare(baseline, current, options["threshold"])
+            for key, metric, old, new in regressions:
+                self.stdout.write(self.style.ERROR(f"✗ {key} {metric}: {old} → {new}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} 項指標退步超過 {options['threshold']:.0%}")
+            self.stdout.write(self.style.SUCCESS(f"與基準 {options['compare']} 相比沒有退步"))
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from schedule.jobs import requeue_stale, run_pending
+
+
+class Command(BaseCommand):
+    help = "執行背景工作佇列（產生單敗籤表等），預設持續執行"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="執行完目前排隊的工作就結束")
+        parser.add_argument("--interval", type=float, default=1.0, help="沒有工作時幾秒檢查一次")
+        parser.add_argument("--stale-after", type=int, default=600,
+                            help="執行超過幾秒仍未結束的工作視為中斷，重新排隊")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+        while True:
+            requeued = requeue_stale(stale_after)
+            if requeued:
+                self.stdout.write(f"重新排隊 {requeued} 個中斷的工作")
+            count = run_pending()
+            if count:
+                self.stdout.write(f"完成 {count} 個工作")
+            if options["once"]:
+                break
+            if not count:
+                time.sleep(options["interval"])
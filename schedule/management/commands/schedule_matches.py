@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from schedule.models import ScheduleSetting, Tournament
+from schedule.propagation import parse_start_time
+from schedule.utils import apply_schedule
+
+
+def parse_clock(value):
+    parsed = parse_time(value)
+    if parsed is None:
+        raise CommandError(f"時間格式不正確：{value}（例如 09:00）")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "自動排定賽事中尚未開始的比賽的桌次與開賽時間（參數會存成該賽事的排程設定）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tournament_id", type=int)
+        parser.add_argument("--tables", type=int, help="可用桌數")
+        parser.add_argument("--minutes-per-inning", type=int, help="每局平均分鐘數")
+        parser.add_argument("--default-innings", type=int, help="選手未定時估算用的局數")
+        parser.add_argument("--start", help="第一場最早的開始時間，例如 2025-10-01T19:00")
+        parser.add_argument("--open", help="場地每天開門時間，例如 09:00")
+        parser.add_argument("--close", help="場地每天關門時間，例如 22:00（早於開門時間表示營業到隔天）")
+        parser.add_argument("--no-auto", action="store_true", help="登錄賽果時不自動重新排程")
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.get(id=options["tournament_id"])
+        except Tournament.DoesNotExist:
+            raise CommandError(f"找不到賽事 {options['tournament_id']}")
+
+        setting = ScheduleSetting.objects.filter(tournament=tournament).first()
+        if setting is None:
+            if not options["tables"]:
+                raise CommandError("第一次排程必須指定 --tables")
+            setting = ScheduleSetting(tournament=tournament, start_time=timezone.now())
+
+        if options["tables"]:
+            setting.table_count = options["tables"]
+        if options["minutes_per_inning"]:
+            setting.minutes_per_inning = options["minutes_per_inning"]
+        if options["default_innings"]:
+            setting.default_innings = options["default_innings"]
+        if options["start"]:
+            try:
+                setting.start_time = parse_start_time(options["start"])
+            except ValueError as e:
+                raise CommandError(str(e))
+        if options["open"]:
+            setting.open_time = parse_clock(options["open"])
+        if options["close"]:
+            setting.close_time = parse_clock(options["close"])
+        if setting.open_time is not None and setting.open_time == setting.close_time:
+            raise CommandError("開門與關門時間不能相同（營業到隔天時關門時間可以早於開門時間，例如 --open 18:00 --close 02:00）")
+        setting.auto_reschedule = not options["no_auto"]
+        setting.save()
+
+        changed = apply_schedule(tournament, setting)
+        self.stdout.write(self.style.SUCCESS(f"{tournament}: 更新 {len(changed)} 場比賽的桌次 / 開賽時間"))
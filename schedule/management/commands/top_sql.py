@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from schedule.sqlstats import load_all, percentile, request_reset, stats_dir
+
+SORT_KEYS = {
+    "total": lambda s: s["seconds"],
+    "count": lambda s: s["count"],
+    "p95": lambda s: percentile(s["samples"], 0.95),
+    "mean": lambda s: s["seconds"] / s["count"],
+}
+
+
+class Command(BaseCommand):
+    help = "列出 SQL 指紋統計中最耗時的查詢（需開啟 SCHEDULE_SQL_STATS）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="列出幾筆")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total", help="排序依據（預設總時間）")
+        parser.add_argument("--callers", type=int, default=3, help="每筆列出幾個最常見的呼叫位置")
+        parser.add_argument("--reset", action="store_true", help="列出後清除統計（執行中的 process 下次寫檔時也會清空記憶體中的統計）")
+
+    def handle(self, *args, **options):
+        stats = load_all()
+        if not stats:
+            self.stdout.write(f"沒有統計資料（{stats_dir()}）")
+            return
+
+        ranked = sorted(stats.items(), key=lambda item: SORT_KEYS[options["sort"]](item[1]), reverse=True)
+        for fp, s in ranked[:options["limit"]]:
+            p95 = percentile(s["samples"], 0.95)
+            self.stdout.write(self.style.SUCCESS(
+                f"[{fp}] count={s['count']}  total={s['seconds'] * 1000:.1f}ms  "
+                f"mean={s['seconds'] / s['count'] * 1000:.2f}ms  p95={p95 * 1000:.2f}ms"
+            ))
+            self.stdout.write(f"    {s['sql']}")
+            callers = sorted(s["callers"].items(), key=lambda item: item[1], reverse=True)
+            for caller, count in callers[:options["callers"]]:
+                self.stdout.write(f"    {count:>6} × {caller}")
+
+        if options["reset"]:
+            self.stdout.write(f"已清除 {request_reset()} 個統計檔案")
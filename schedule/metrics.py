@@ -0,0 +1,194 @@
+"""
+每個 view（URL name）的請求延遲、SQL 查詢數與時間、模板渲染時間與回應大小，
+以 Prometheus 文字格式輸出（views.MetricsView，僅限管理員）。
+
+settings.SCHEDULE_METRICS = False（預設）時 MetricsMiddleware 在啟動時就移除自己
+（MiddlewareNotUsed），請求完全不經過這裡。
+
+統計存在 process 內：每個執行緒累加在自己的分片，不需要鎖；只有輸出時才合併所有分片，
+多執行緒的 WSGI server 下也不會互相覆蓋。多個 process 時各自統計，由 Prometheus 加總。
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_local = threading.local()
+_shards = []  # 每個執行緒的 {view: ViewStats}
+_shards_lock = threading.Lock()  # 只在執行緒第一次記錄時使用
+_template_timer_installed = False
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'query_seconds', 'render_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # 最後一格為 +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = 0
+
+    def observe(self, seconds, queries, query_seconds, render_seconds, response_bytes):
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.query_seconds += query_seconds
+        self.render_seconds += render_seconds
+        self.response_bytes += response_bytes
+
+    def merge(self, other):
+        for i, value in enumerate(other.buckets):
+            self.buckets[i] += value
+        for field in self.__slots__[1:]:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+def _shard():
+    shard = getattr(_local, 'stats', None)
+    if shard is None:
+        shard = _local.stats = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def record(view, seconds, queries=0, query_seconds=0.0, render_seconds=0.0, response_bytes=0):
+    shard = _shard()
+    stats = shard.get(view)
+    if stats is None:
+        stats = shard[view] = ViewStats()
+    stats.observe(seconds, queries, query_seconds, render_seconds, response_bytes)
+
+
+def collect():
+    """合併所有執行緒的統計，回傳 {view: ViewStats}"""
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        for view, stats in list(shard.items()):
+            merged.setdefault(view, ViewStats()).merge(stats)
+    return merged
+
+
+def reset():
+    with _shards_lock:
+        for shard in _shards:
+            shard.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(stats=None):
+    stats = collect() if stats is None else stats
+    views = sorted(stats)
+    lines = [
+        "# HELP schedule_request_duration_seconds Request latency per view.",
+        "# TYPE schedule_request_duration_seconds histogram",
+    ]
+    for view in views:
+        s, label = stats[view], _label(view)
+        cumulative = 0
+        for bound, value in zip(BUCKETS + ('+Inf',), s.buckets):
+            cumulative += value
+            lines.append(f'schedule_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'schedule_request_duration_seconds_sum{{view="{label}"}} {s.seconds:.6f}')
+        lines.append(f'schedule_request_duration_seconds_count{{view="{label}"}} {s.count}')
+
+    counters = (
+        ("schedule_db_queries_total", "SQL queries executed per view.", 'queries', "{}"),
+        ("schedule_db_query_seconds_total", "Time spent in SQL per view.", 'query_seconds', "{:.6f}"),
+        ("schedule_template_render_seconds_total", "Template render time per view.", 'render_seconds', "{:.6f}"),
+        ("schedule_response_bytes_total", "Response body size per view.", 'response_bytes', "{}"),
+    )
+    for name, help_text, field, fmt in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for view in views:
+            lines.append(f'{name}{{view="{_label(view)}"}} {fmt.format(getattr(stats[view], field))}')
+    return "\n".join(lines) + "\n"
+
+
+class QueryTimer:
+    """connection.execute_wrapper：累加這個請求的 SQL 查詢數與時間"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def install_template_timer():
+    """
+    包住 Template.render，把最外層模板的渲染時間累加到目前執行緒
+    （{% include %} 等巢狀渲染已包含在外層的時間內，不重複計算）。
+    """
+    global _template_timer_installed
+    if _template_timer_installed:
+        return
+    original = Template.render
+
+    @functools.wraps(original)
+    def render(self, context):
+        if getattr(_local, 'rendering', False):
+            return original(self, context)
+        _local.rendering = True
+        started = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            _local.rendering = False
+            _local.render_seconds = getattr(_local, 'render_seconds', 0.0) + time.perf_counter() - started
+
+    Template.render = render
+    _template_timer_installed = True
+
+
+def is_enabled():
+    return getattr(settings, 'SCHEDULE_METRICS', False)
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        _local.render_seconds = 0.0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or '<unnamed>') if match is not None else '<unresolved>'
+        size = 0 if response.streaming else len(response.content)
+        record(view, seconds, timer.count, timer.seconds, _local.render_seconds, size)
+        return response
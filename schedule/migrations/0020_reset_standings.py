@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def reset_standings(apps, schema_editor):
+    # W 改以選手局數計算：清空後執行 manage.py rebuild_standings --missing 重算；
+    # 重算前頁面以 SQL 即時計算（read_standings 不寫入），登錄賽果時由 update_standings 重算該賽事
+    Standing = apps.get_model('schedule', 'Standing')
+    Standing.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0019_standing'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_standings, migrations.RunPython.noop),
+    ]
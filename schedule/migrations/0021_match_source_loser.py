@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+def fill_source_loser(apps, schema_editor):
+    # 舊資料依階段名稱判斷：季殿賽、敗部第一輪兩個位置都是敗者；敗部晉級賽第二個位置是勝部的敗者
+    Match = apps.get_model('schedule', 'Match')
+    has_source1 = Match.objects.filter(source_match1__isnull=False)
+    has_source2 = Match.objects.filter(source_match2__isnull=False)
+    has_source1.filter(stage__name__contains='Tie').update(source_match1_loser=True)
+    has_source1.filter(stage__name__contains='Losers Round').update(source_match1_loser=True)
+    has_source2.filter(stage__name__contains='Tie').update(source_match2_loser=True)
+    has_source2.filter(stage__name__contains='Losers').update(source_match2_loser=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0020_reset_standings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='source_match1_loser',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='source_match2_loser',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_source_loser, migrations.RunPython.noop),
+    ]
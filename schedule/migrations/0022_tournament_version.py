@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0021_match_source_loser'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0022_tournament_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stage',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
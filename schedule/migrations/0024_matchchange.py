@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0023_stage_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='schedule.match')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_changes', to='schedule.tournament')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='matchchange',
+            index=models.Index(fields=['tournament', 'version'], name='matchchange_tournament_ver'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0024_matchchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TournamentSnapshot',
+            fields=[
+                ('tournament', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='schedule.tournament')),
+                ('version', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('compressed', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:21
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# 複製自 schedule.names（遷移不引用現行程式碼，之後修改 normalize_name 不影響此遷移）
+_WHITESPACE = re.compile(r'\s+')
+_SPACE_NEAR_WIDE = re.compile(r' (?=[^\x00-\x7f])|(?<=[^\x00-\x7f]) ')
+
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFKC', name or '').casefold()
+    name = _WHITESPACE.sub(' ', name).strip()
+    return _SPACE_NEAR_WIDE.sub('', name)[:100]
+
+
+def fill_normalized_name(apps, schema_editor):
+    Player = apps.get_model('schedule', 'Player')
+    batch = []
+    for player in Player.objects.only('id', 'name').iterator(chunk_size=2000):
+        player.normalized_name = normalize_name(player.name)
+        batch.append(player)
+        if len(batch) >= 2000:
+            Player.objects.bulk_update(batch, ['normalized_name'])
+            batch = []
+    Player.objects.bulk_update(batch, ['normalized_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0025_tournamentsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='normalized_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_normalized_name, migrations.RunPython.noop),
+    ]
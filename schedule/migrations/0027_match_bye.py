@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0026_player_normalized_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='player1_bye',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='player2_bye',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0028_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleSetting',
+            fields=[
+                ('tournament', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule_setting', serialize=False, to='schedule.tournament')),
+                ('table_count', models.PositiveIntegerField()),
+                ('minutes_per_inning', models.PositiveIntegerField(default=10)),
+                ('default_innings', models.PositiveIntegerField(default=3)),
+                ('start_time', models.DateTimeField()),
+                ('open_time', models.TimeField(blank=True, null=True)),
+                ('close_time', models.TimeField(blank=True, null=True)),
+                ('auto_reschedule', models.BooleanField(default=True)),
+            ],
+        ),
+    ]
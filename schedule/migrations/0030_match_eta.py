@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0029_schedulesetting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='eta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='avg_match_seconds',
+            field=models.FloatField(default=1800),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='timed_matches',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
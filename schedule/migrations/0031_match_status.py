@@ -0,0 +1,72 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# 複製自 schedule.bracket（遷移不引用現行程式碼，之後修改 match_status 不影響此遷移）
+def match_status(player1, player2, winner, point1='', point2='', bye=False):
+    if bye:
+        return 'walkover'
+    if winner is not None:
+        return 'done'
+    if player1 is None or player2 is None:
+        return 'pending'
+    if point1 != '' or point2 != '':
+        return 'in_progress'
+    return 'ready'
+
+
+def fill_tournament_and_status(apps, schema_editor):
+    Match = apps.get_model('schedule', 'Match')
+    Stage = apps.get_model('schedule', 'Stage')
+    Match.objects.update(tournament_id=models.Subquery(
+        Stage.objects.filter(id=models.OuterRef('stage_id')).values('tournament_id')[:1]
+    ))
+
+    batch = []
+    rows = Match.objects.only(
+        'id', 'player1_id', 'player2_id', 'winner_id', 'point1', 'point2', 'player1_bye', 'player2_bye',
+    )
+    for match in rows.iterator(chunk_size=2000):
+        match.status = match_status(match.player1_id, match.player2_id, match.winner_id, match.point1,
+                                    match.point2, match.player1_bye or match.player2_bye)
+        batch.append(match)
+        if len(batch) >= 2000:
+            Match.objects.bulk_update(batch, ['status'])
+            batch = []
+    Match.objects.bulk_update(batch, ['status'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0030_match_eta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='tournament',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='schedule.tournament'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('in_progress', 'In progress'), ('done', 'Done'), ('walkover', 'Walkover')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(fill_tournament_and_status, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='match',
+            name='tournament',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='schedule.tournament'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'status'], name='match_tournament_status'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['stage', 'status'], name='match_stage_status'),
+        ),
+    ]
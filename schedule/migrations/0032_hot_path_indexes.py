@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0031_match_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='match',
+            name='stage',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='schedule.stage'),
+        ),
+        migrations.AlterField(
+            model_name='match',
+            name='tournament',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='schedule.tournament'),
+        ),
+        migrations.AlterField(
+            model_name='stage',
+            name='tournament',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='schedule.tournament'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['tournament', 'id'], name='match_tournament_id'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['stage', 'id'], name='match_stage_id'),
+        ),
+        migrations.AddIndex(
+            model_name='stage',
+            index=models.Index(fields=['tournament', 'order'], name='stage_tournament_order'),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.utils import timezone
 
 from datetime import timedelta
 
+from .bracket import match_status
+from .names import normalize_name
+
 class Tournament(models.Model):
     TYPE_CHOICES = [
         ("single_elim", "Single Elimination"),
@@ -20,15 +23,59 @@ class Tournament(models.Model):
     group_size = models.IntegerField(null=True, blank=True)
     advance_per_group = models.IntegerField(null=True, blank=True)
 
+    # 變動標記：比賽 / 階段 / 選手有任何變動時 +1（見 utils.touch_tournament），供 ETag / Last-Modified 使用
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    # 實際比賽時間的 running average（估算預估開賽時間用，見 eta.py）
+    avg_match_seconds = models.FloatField(default=30 * 60)
+    timed_matches = models.PositiveIntegerField(default=0)  # 列入平均的比賽數
+
+    # 顯示在賽程表 / 快照中的欄位，修改時要讓 ETag 與快取失效
+    RENDERED_FIELDS = ('name', 'type', 'semester', 'player_num', 'num_groups', 'group_size', 'advance_per_group')
+
+    def save(self, *args, **kwargs):
+        """
+        後台等直接修改賽事時，顯示的欄位有變動就把變動標記 +1（與 utils.touch_tournament 相同）。
+        變動標記一律以 F() 在資料庫中遞增：整筆存檔時不寫入 version / updated_at，
+        以免讀出後其他請求已遞增的版本被舊值蓋回去。
+        """
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('version', 'updated_at')
+            ]
+            update_fields = kwargs['update_fields']
+        fields = [name for name in self.RENDERED_FIELDS if name in update_fields]
+        current = Tournament.objects.filter(pk=self.pk).values(*fields).first() if fields else None
+        super().save(*args, **kwargs)
+
+        if current is not None and any(current[name] != getattr(self, name) for name in fields):
+            Tournament.objects.filter(pk=self.pk).update(
+                version=models.F('version') + 1, updated_at=timezone.now()
+            )
+            self.stages.update(version=models.F('version') + 1)
+            self.version, self.updated_at = Tournament.objects.values_list('version', 'updated_at').get(pk=self.pk)
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
 
 
 class Stage(models.Model):
-    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="stages")
+    # 索引見 Meta（tournament + order），不另建單欄索引
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="stages", db_index=False)
     name = models.CharField(max_length=100)  # e.g. "Winners Bracket R1", "Losers Bracket", "Group A"
     order = models.PositiveIntegerField()  # 用來排序階段
+    version = models.PositiveIntegerField(default=0)  # 階段內比賽有變動時 +1，作為頁面片段快取的 key
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "order"], name="stage_tournament_order"),
+        ]
 
     def __str__(self):
         return f"{self.tournament.name} - {self.name}"
@@ -36,15 +83,35 @@ class Stage(models.Model):
 
 class Player(models.Model):
     name = models.CharField(max_length=100)
+    # 比對同一位選手用的正規化名稱（見 names.normalize_name），save() 時自動更新
+    normalized_name = models.CharField(max_length=100, default='', db_index=True, editable=False)
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
     innings = models.IntegerField() #局數
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
 
 class Match(models.Model):
-    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, related_name="matches")
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("in_progress", "In progress"),
+        ("done", "Done"),
+        ("walkover", "Walkover"),
+    ]
+
+    # stage / tournament 的索引見 Meta（複合索引的第一欄），不另建單欄索引
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, related_name="matches", db_index=False)
+    # 與 stage.tournament 相同（冗餘欄位），讓「某賽事某狀態的比賽」只需一個索引查詢
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="matches", db_index=False)
     player1 = models.ForeignKey(Player, null=True, blank=True, on_delete=models.SET_NULL, related_name="match_player1")
     player2 = models.ForeignKey(Player, null=True, blank=True, on_delete=models.SET_NULL, related_name="match_player2")
     winner = models.ForeignKey(Player, null=True, blank=True, on_delete=models.SET_NULL, related_name="match_winner")
@@ -56,6 +123,12 @@ class Match(models.Model):
     # 單/雙淘汰用：前一場的勝者 → 當作本場參賽者
     source_match1 = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL, related_name="next_match_as_p1")
     source_match2 = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL, related_name="next_match_as_p2")
+    # 晉級方式：True = 來源比賽的敗者進到此位置（敗部、季殿賽），False = 勝者
+    source_match1_loser = models.BooleanField(default=False)
+    source_match2_loser = models.BooleanField(default=False)
+    # 輪空：該位置永遠不會有選手，另一位置的選手直接晉級（產生籤表時決定）
+    player1_bye = models.BooleanField(default=False)
+    player2_bye = models.BooleanField(default=False)
 
     # match number
     match_number = models.IntegerField()
@@ -70,24 +143,156 @@ class Match(models.Model):
     round_number = models.PositiveIntegerField(null=True, blank=True)
 
     start_time = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)  # 登錄賽果的時間
+    eta = models.DateTimeField(null=True, blank=True)  # 預估開賽時間（見 eta.py）
+
+    # 比賽狀態：寫入時依選手與賽果維護（見 bracket.match_status），「進行中」由裁判標記
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "status"], name="match_tournament_status"),
+            models.Index(fields=["stage", "status"], name="match_stage_status"),
+            # 依 id 排序的整個賽事 / 單一階段的比賽（賽程表、籤表圖、快照）
+            models.Index(fields=["tournament", "id"], name="match_tournament_id"),
+            models.Index(fields=["stage", "id"], name="match_stage_id"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.tournament_id is None and self.stage_id is not None:
+            self.tournament_id = Stage.objects.values_list('tournament_id', flat=True).get(id=self.stage_id)
+        self.status = match_status(self.player1_id, self.player2_id, self.winner_id, self.point1, self.point2,
+                                   self.is_bye, self.status)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'status'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Match {self.id} ({self.stage.name})"
 
+    @property
+    def is_bye(self):
+        return self.player1_bye or self.player2_bye
+
     def get_player1_display(self):
         if self.player1:
             return self.player1.name
+        elif self.player1_bye:
+            return "BYE"
         elif self.source_match1:
-            return f"Winner of Match #{self.source_match1.match_number}"
+            outcome = "Loser" if self.source_match1_loser else "Winner"
+            return f"{outcome} of Match #{self.source_match1.match_number}"
         return "-"
 
     def get_player2_display(self):
         if self.player2:
             return self.player2.name
+        elif self.player2_bye:
+            return "BYE"
         elif self.source_match2:
-            return f"Winner of Match #{self.source_match2.match_number}"
+            outcome = "Loser" if self.source_match2_loser else "Winner"
+            return f"{outcome} of Match #{self.source_match2.match_number}"
         return '-'
 
+class Standing(models.Model):
+    """循環賽積分表（依比賽結果增量更新，可用 rebuild_standings 指令重算）"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="standings")
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, related_name="standings")  # 所屬組別
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name="standings")
+
+    wins = models.IntegerField(default=0)  # 勝場
+    games_for = models.IntegerField(default=0)  # 得局
+    games_against = models.IntegerField(default=0)  # 失局
+    ratio = models.FloatField(default=0)  # 得局率
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["stage", "player"], name="unique_standing_stage_player"),
+        ]
+        indexes = [
+            models.Index(fields=["tournament", "stage"], name="standing_tournament_stage"),
+        ]
+
+    def __str__(self):
+        return f"{self.stage.name} - {self.player.name}"
+
+
+class MatchChange(models.Model):
+    """比賽變動紀錄：version 為變動後的賽事版本（Tournament.version），供增量同步 API 使用"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="match_changes")
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name="changes")
+    version = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["tournament", "version"], name="matchchange_tournament_ver"),
+        ]
+
+    def __str__(self):
+        return f"{self.match} @ {self.version}"
+
+
+class TournamentSnapshot(models.Model):
+    """賽事的 JSON 快照（預先序列化，可 gzip 壓縮）；version 與賽事不同時重新產生"""
+    tournament = models.OneToOneField(Tournament, on_delete=models.CASCADE, primary_key=True, related_name="snapshot")
+    version = models.PositiveIntegerField()  # 產生時的 Tournament.version
+    data = models.BinaryField()
+    compressed = models.BooleanField(default=False)  # data 是否為 gzip
+
+    def __str__(self):
+        return f"{self.tournament} @ {self.version}"
+
+
+class Job(models.Model):
+    """背景工作（由 manage.py run_jobs 執行，見 jobs.py）；同一賽事同一種工作同時只會有一筆排隊或執行中"""
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    ACTIVE_STATUSES = ("queued", "running")
+
+    kind = models.CharField(max_length=50)
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    result = models.TextField(blank=True, default='')  # 完成訊息或錯誤訊息
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tournament", "kind"], condition=models.Q(status__in=("queued", "running")),
+                name="unique_active_job",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "id"], name="job_status_id"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class ScheduleSetting(models.Model):
+    """自動排程的參數（見 scheduler.py）；auto_reschedule 時每次登錄賽果後重新排尚未開始的比賽"""
+    tournament = models.OneToOneField(Tournament, on_delete=models.CASCADE, primary_key=True, related_name="schedule_setting")
+    table_count = models.PositiveIntegerField()  # 可用桌數
+    minutes_per_inning = models.PositiveIntegerField(default=10)  # 每局平均分鐘數
+    default_innings = models.PositiveIntegerField(default=3)  # 選手未定時以此局數估算
+    start_time = models.DateTimeField()  # 第一場比賽最早的開始時間
+    open_time = models.TimeField(null=True, blank=True)  # 場地每天開門時間
+    close_time = models.TimeField(null=True, blank=True)  # 場地每天關門時間
+    auto_reschedule = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.tournament} ({self.table_count} 桌)"
+
+
 class Announcement(models.Model):
     title = models.CharField(max_length=200)
     content = models.CharField(max_length=100000)
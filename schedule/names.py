@@ -0,0 +1,19 @@
+"""
+選手名稱正規化：作為跨賽事比對同一位選手的 key（Player.normalized_name）。
+
+- NFKC：全形英數、全形空白轉半形，相容字元統一
+- 不分大小寫（casefold）
+- 連續空白合併為一個，中文字旁的空白移除（「王 小明」與「王小明」視為同一人）
+"""
+import re
+import unicodedata
+
+MAX_LENGTH = 100  # Player.normalized_name 的長度（NFKC 可能讓字串變長）
+_WHITESPACE = re.compile(r'\s+')
+_SPACE_NEAR_WIDE = re.compile(r' (?=[^\x00-\x7f])|(?<=[^\x00-\x7f]) ')
+
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFKC', name or '').casefold()
+    name = _WHITESPACE.sub(' ', name).strip()
+    return _SPACE_NEAR_WIDE.sub('', name)[:MAX_LENGTH]
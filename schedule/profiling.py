@@ -0,0 +1,131 @@
+"""
+管理員的臨時效能分析：任何網址加上 ?profile=1（GET 或 POST 都可以），
+該請求就在 cProfile 下執行，並記錄所有 SQL。結果存到 settings.SCHEDULE_PROFILE_DIR：
+    <時間>-<view>.prof      cProfile 原始資料（可用 snakeviz / pstats 開啟）
+    <時間>-<view>.txt       依累計時間排序的前幾名函式
+    <時間>-<view>.sql.json  請求資訊與每個 SQL 的時間
+最多保留 SCHEDULE_PROFILE_KEEP 筆，清單與下載見 views.ProfileListView。
+
+SCHEDULE_PROFILE_DIR 為 None 時 ProfilerMiddleware 在啟動時就移除自己；
+一般請求只多檢查一次 QUERY_STRING。
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+PROFILE_PARAM = "profile"
+SUFFIXES = {"prof": ".prof", "txt": ".txt", "sql": ".sql.json"}
+NAME_RE = re.compile(r'^\d{8}-\d{6}-\d{6}-[\w-]+$')
+TOP_FUNCTIONS = 40
+
+
+def profile_dir():
+    directory = getattr(settings, 'SCHEDULE_PROFILE_DIR', None)
+    return Path(directory) if directory else None
+
+
+def wants_profile(request):
+    return (
+        PROFILE_PARAM in request.META.get('QUERY_STRING', '')
+        and request.GET.get(PROFILE_PARAM) not in (None, '', '0')
+        and request.user.is_staff
+    )
+
+
+def save_profile(request, profiler, queries, now=None):
+    """把一次請求的分析結果寫成三個檔案，回傳名稱（不含副檔名）"""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    now = now or timezone.localtime()
+    match = getattr(request, 'resolver_match', None)
+    view = re.sub(r'[^\w-]', '_', match.view_name) if match is not None and match.view_name else 'unresolved'
+    name = f"{now:%Y%m%d-%H%M%S-%f}-{view}"
+
+    profiler.dump_stats(directory / f"{name}.prof")
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    (directory / f"{name}.txt").write_text(summary.getvalue(), encoding='utf-8')
+
+    document = {
+        "path": request.get_full_path(),
+        "method": request.method,
+        "user": request.user.get_username(),
+        "created": now.isoformat(),
+        "query_count": len(queries),
+        "query_seconds": round(sum(float(q['time']) for q in queries), 6),
+        "queries": [{"sql": q['sql'], "time": float(q['time'])} for q in queries],
+    }
+    (directory / f"{name}.sql.json").write_text(
+        json.dumps(document, ensure_ascii=False, indent=2), encoding='utf-8'
+    )
+
+    prune(getattr(settings, 'SCHEDULE_PROFILE_KEEP', 50))
+    return name
+
+
+def list_profiles():
+    """由新到舊的分析紀錄 [{"name", "view", "created", "size"}]"""
+    directory = profile_dir()
+    if directory is None or not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.prof"), reverse=True):
+        name = path.stem
+        if not NAME_RE.match(name):
+            continue
+        profiles.append({
+            "name": name,
+            "view": name.split('-', 3)[3],
+            "created": datetime.strptime(name[:22], "%Y%m%d-%H%M%S-%f"),
+            "size": path.stat().st_size,
+        })
+    return profiles
+
+
+def prune(keep):
+    for profile in list_profiles()[keep:]:
+        for suffix in SUFFIXES.values():
+            (profile_dir() / f"{profile['name']}{suffix}").unlink(missing_ok=True)
+
+
+def profile_file(name, kind):
+    """下載用：名稱與種類合法且檔案存在時回傳路徑，否則 None"""
+    directory = profile_dir()
+    if directory is None or kind not in SUFFIXES or not NAME_RE.match(name):
+        return None
+    path = directory / f"{name}{SUFFIXES[kind]}"
+    return path if path.is_file() else None
+
+
+class ProfilerMiddleware:
+    """需放在 AuthenticationMiddleware 之後（只允許管理員）"""
+
+    def __init__(self, get_response):
+        if profile_dir() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        with CaptureQueriesContext(connection) as queries:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        response['X-Profile'] = save_profile(request, profiler, queries.captured_queries)
+        return response
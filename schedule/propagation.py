@@ -0,0 +1,135 @@
+"""
+賽果推進：把裁判輸入的賽果寫入，並依晉級路由（source_match1/2 + source_match*_loser）
+更新所有受影響的下游比賽。
+
+整個賽事一次讀成 BracketGraph，在記憶體中推進（包含更正時清除失效的下游賽果），
+最後在同一個交易中以 bulk_update 寫回，並增量更新積分表。
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bracket import IN_PROGRESS, BracketError
+from .eta import project_etas, record_finished
+from .live import publish_match_updates
+from .models import Match, ScheduleSetting, Stage
+from .standings import node_state, update_standings
+from .utils import (
+    load_bracket_graph, record_match_changes, schedule_tournament, touch_stages, touch_tournament,
+    update_bracket_matches,
+)
+
+
+def parse_start_time(value):
+    """datetime-local 欄位的字串轉為 aware datetime，空字串回傳 None"""
+    if not value:
+        return None
+    start_time = parse_datetime(value)
+    if start_time is None:
+        raise ValueError(f"開賽時間格式不正確：{value}")
+    if timezone.is_naive(start_time):
+        start_time = timezone.make_aware(start_time)
+    return start_time
+
+
+@transaction.atomic
+def apply_results(tournament, results, graph=None):
+    """
+    寫入多場比賽的賽果並推進到下游，回傳有變動的比賽 id（資料庫 pk）。
+
+    results: [{"match": pk, "point1": "3", "point2": "1", "winner": "player1",
+               "table": 2, "start_time": datetime, "started": True}, ...]
+    除 "match" 外的欄位都可省略（省略 = 不修改）；winner 為 "player1" / "player2"；
+    started 為 True 時把比賽標記為進行中（裁判按下開始）。
+    """
+    graph = graph or load_bracket_graph(tournament)
+    # 推進前的狀態（積分表增量更新用）
+    before = [node_state(graph, node) for node in graph.matches]
+    winners_before = [node.winner for node in graph.matches]
+    changed = set()
+
+    for result in results:
+        try:
+            node = graph.get_by_pk(result["match"])
+        except BracketError:
+            raise ValueError(f"比賽 {result['match']} 不屬於此賽事")
+
+        if result.get("started"):
+            node.status = IN_PROGRESS
+        if "point1" in result:
+            node.point1 = result["point1"]
+        if "point2" in result:
+            node.point2 = result["point2"]
+
+        winner = result.get("winner")
+        if winner in ("player1", "player2"):
+            changed |= graph.set_result(node.id, 1 if winner == "player1" else 2)
+        else:
+            changed.add(node.id)
+            changed |= graph.advance(node.id)
+
+    update_bracket_matches(graph, changed)
+
+    # 桌次與開賽時間只更新有輸入的比賽
+    for field in ("table", "start_time"):
+        objs = [Match(pk=r["match"], **{field: r[field]}) for r in results if field in r]
+        if objs:
+            Match.objects.bulk_update(objs, [field])
+
+    update_standings(tournament, [(before[i], node_state(graph, graph.matches[i])) for i in changed])
+
+    # 有自動排程時，依目前時間重新排尚未開始的比賽
+    setting = ScheduleSetting.objects.filter(tournament_id=tournament.pk, auto_reschedule=True).first()
+    if setting is not None:
+        rescheduled = set(schedule_tournament(tournament, setting, graph=graph))
+        changed |= {node.id for node in graph.matches if node.pk in rescheduled}
+
+    # 結束時間、平均比賽時間，以及沿著下游更新預估開賽時間
+    record_finished(tournament, graph, winners_before)
+    eta_changed = set(project_etas(tournament, graph, changed))
+    changed |= {node.id for node in graph.matches if node.pk in eta_changed}
+
+    changed_pks = [graph.matches[i].pk for i in sorted(changed)]
+    touch_tournament(tournament.pk)
+    version = record_match_changes(tournament.pk, changed_pks)
+    # 只讓有變動的比賽（本場 + 被推進的下游比賽 + 重新排程的比賽）所在的階段快取失效
+    touch_stages(Stage.objects.filter(id__in={graph.stages[graph.matches[i].stage].pk for i in changed}))
+    # commit 後才推播，觀眾不會看到被回滾的賽果
+    transaction.on_commit(lambda: publish_match_updates(tournament.pk, changed_pks, version))
+    return changed_pks
+
+
+def clean_result(raw, match):
+    """
+    檢查一筆輸入的賽果，回傳可交給 apply_results() 的 dict，格式錯誤時丟出 ValueError。
+    raw: {"point1", "point2", "winner", "table", "start_time"}（值皆為字串，空字串 = 不修改）
+    match: 該場比賽（需要 player1_id / player2_id / player1_bye / player2_bye）
+    """
+    if match.player1_bye or match.player2_bye:
+        raise ValueError("輪空的比賽不需要登錄賽果")
+    result = {"match": match.pk}
+    for field in ("point1", "point2"):
+        point = str(raw.get(field) or '').strip()
+        if not point:
+            continue
+        if not (point.isdigit() or point.upper() in ('W', 'FF')) or len(point) > 3:
+            raise ValueError(f"{field} 只能是數字、W 或 FF")
+        result[field] = point
+
+    winner = raw.get("winner") or ''
+    if winner:
+        if winner not in ("player1", "player2"):
+            raise ValueError("winner 只能是 player1 或 player2")
+        if getattr(match, f"{winner}_id") is None:
+            raise ValueError(f"{winner} 尚未確定，無法設為勝者")
+        result["winner"] = winner
+
+    table = str(raw.get("table") or '').strip()
+    if table:
+        if not table.isdigit():
+            raise ValueError("桌次必須是數字")
+        result["table"] = int(table)
+
+    if raw.get("start_time"):
+        result["start_time"] = parse_start_time(raw["start_time"])
+    return result
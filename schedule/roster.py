@@ -0,0 +1,129 @@
+"""
+選手名單（CSV）匯入。
+
+上傳檔逐行解碼，不會整份讀進記憶體；所有列在同一輪中檢查，
+錯誤一次全部回報（RosterError.errors），沒有錯誤才建立選手。
+"""
+import codecs
+import csv
+
+from .models import Player
+from .names import normalize_name
+from .utils import bulk_create_with_ids
+
+NAME_MAX_LENGTH = Player._meta.get_field('name').max_length
+DEFAULT_INNINGS = 999
+
+
+class RosterError(ValueError):
+    """名單格式有誤；errors 為 [(行號, 訊息), ...]"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("\n".join(f"第 {line} 行：{message}" if line else message for line, message in errors))
+
+
+class _LineDecoder:
+    """
+    逐行解碼上傳檔（一次只讀一行，不會整份讀進記憶體）。
+    TextIOWrapper 會一次預先解碼一大段，出錯時無從得知是哪一行；
+    這裡每次只解碼一行，解碼失敗時 line 即為出錯的行號。
+    """
+
+    def __init__(self, uploaded_file, encoding):
+        self.uploaded_file = uploaded_file
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.line = 0
+
+    def __iter__(self):
+        for self.line, raw in enumerate(self.uploaded_file, start=1):
+            yield self.decoder.decode(raw)
+        tail = self.decoder.decode(b'', final=True)  # 檔案結尾不完整的字元在這裡丟出錯誤
+        if tail:
+            yield tail
+
+
+def read_roster(uploaded_file, expected_count, encoding="utf-8-sig"):
+    """
+    讀取名單，回傳 list：每個元素為 (名稱, 局數)，空行為 None（輪空）。
+    名單不足 expected_count 人時不補空位，由產生籤表時以輪空補滿；
+    超過 expected_count 的空行（檔案結尾的空行等）忽略，只有多出的選手算錯誤。
+    CSV 每行：名稱[,局數]，局數省略時為 999。
+    """
+    entries = []
+    errors = []
+    line = 0
+    extra = 0  # 超過參賽人數的選手
+    lines = _LineDecoder(uploaded_file, encoding)
+    try:
+        for line, row in enumerate(csv.reader(lines), start=1):
+            name = row[0].strip() if row else ''
+            if line > expected_count:
+                extra += bool(name)  # 只計算人數，超過的部分最後一起回報
+                continue
+            if not name:
+                entries.append(None)
+                continue
+            if len(name) > NAME_MAX_LENGTH:
+                errors.append((line, f"名稱超過 {NAME_MAX_LENGTH} 個字"))
+                continue
+            innings = row[1].strip() if len(row) > 1 else ''
+            if innings and not innings.isdigit():
+                errors.append((line, f"局數必須是正整數：{innings}"))
+                continue
+            entries.append((name, int(innings) if innings else DEFAULT_INNINGS))
+    except UnicodeDecodeError:
+        errors.append((lines.line, f"檔案不是 {encoding} 編碼"))
+    except csv.Error as e:
+        errors.append((line + 1, f"CSV 格式錯誤：{e}"))
+
+    if extra:
+        errors.append((None, f"名單比參賽人數 {expected_count} 多了 {extra} 名選手"))
+    if errors:
+        raise RosterError(errors)
+    return entries
+
+
+def check_player_count(entries, num_groups=None):
+    """名單至少要有 2 名選手，分組時每組至少 2 名；不足時丟出 RosterError（建立任何資料之前檢查）"""
+    count = sum(entry is not None for entry in entries)
+    if count < 2:
+        raise RosterError([(None, f"名單至少需要 2 名選手（目前 {count} 名）")])
+    if num_groups and count < num_groups * 2:
+        raise RosterError([(None, f"每組至少需要 2 名選手（目前 {count} 名，分 {num_groups} 組）")])
+
+
+def create_players(entries, reuse=False):
+    """
+    依名單寫入所有選手（需在交易中），回傳與 entries 順序相同的 Player list；
+    空行（None）不建立選手，對應位置為 None（輪空）。
+
+    reuse=True 時以正規化名稱（Player.normalized_name 索引）比對既有選手並直接沿用，
+    只新增找不到的選手；沿用的選手保留原本的局數。
+    """
+    keys = [normalize_name(entry[0]) if entry else None for entry in entries]
+    existing = {}
+    if reuse:
+        duplicates = {}
+        for line, key in enumerate(keys, start=1):
+            if key is not None:
+                duplicates.setdefault(key, []).append(line)
+        errors = [
+            (lines[0], f"與第 {', '.join(map(str, lines[1:]))} 行是同一位選手")
+            for lines in duplicates.values() if len(lines) > 1
+        ]
+        if errors:
+            raise RosterError(errors)
+        # 同名的歷史資料取最早建立的一筆
+        for player in Player.objects.filter(normalized_name__in=duplicates).order_by('-id'):
+            existing[player.normalized_name] = player
+
+    players = [existing.get(key) for key in keys]
+    new = [
+        (i, Player(name=entry[0], normalized_name=key, innings=entry[1]))
+        for i, (entry, key) in enumerate(zip(entries, keys))
+        if entry is not None and players[i] is None
+    ]
+    for (i, _), player in zip(new, bulk_create_with_ids(Player, [player for _, player in new])):
+        players[i] = player
+    return players
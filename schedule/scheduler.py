@@ -0,0 +1,151 @@
+"""
+桌次與開賽時間的自動排程（不依賴資料庫）。
+
+以 BracketGraph 的晉級關係為相依圖做 list scheduling：
+- 一場比賽最早在所有來源比賽（source1 / source2）結束、兩位選手都有空時才能開始
+- 有空桌時，從已可開始的比賽中優先排「後面還有最多輪要打」的比賽（關鍵路徑）
+- 比賽不跨越場地的營業時間，排不下時移到隔天開門
+待排的比賽與空桌各用一個 heap，整體 O(n log n)，數千場比賽只需幾毫秒。
+
+已開始（fixed）的比賽保留原本的桌次與時間，只重新排尚未開始的比賽，
+賽果提早或延後時以目前時間重新排程即可（見 utils.schedule_tournament）。
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+
+class VenueWindow:
+    """
+    每天的營業時間（open_time / close_time 為當地時間的 datetime.time），None 表示不限制。
+    close_time 早於 open_time 表示營業到隔天（例如 18:00–02:00）；兩者相同視為設定錯誤。
+    tz: 營業時間所在的時區（預設為目前時區），傳入的時間不論時區都換算到這裡比較。
+    """
+
+    def __init__(self, open_time=None, close_time=None, tz=None):
+        if open_time is not None and open_time == close_time:
+            raise ValueError("開門與關門時間不能相同")
+        self.open_time = open_time
+        self.close_time = close_time
+        self.tz = tz or timezone.get_current_timezone()
+
+    def opening(self, day):
+        """day（當地日期）開門的那一段營業時間：(開門, 關門)"""
+        day_open = timezone.make_aware(datetime.combine(day, self.open_time), self.tz)
+        close_day = day if self.close_time > self.open_time else day + timedelta(days=1)
+        return day_open, timezone.make_aware(datetime.combine(close_day, self.close_time), self.tz)
+
+    def fit(self, begin, duration):
+        """回傳 >= begin、整場比賽都在營業時間內的最早開始時間（當地時間）"""
+        if self.open_time is None or self.close_time is None:
+            return begin
+        begin = timezone.localtime(begin, self.tz)
+        # 跨夜營業時，begin 可能落在前一天開門的那一段
+        day = begin.date() - timedelta(days=1)
+        while True:
+            day_open, day_close = self.opening(day)
+            day += timedelta(days=1)
+            if day_close <= begin:
+                continue
+            start = max(begin, day_open)
+            # 比整段營業時間還長的比賽只能從開門開始
+            if start + duration <= day_close or start == day_open:
+                return start
+
+
+def critical_path(graph, durations):
+    """每場比賽到最後一場的最長剩餘時間（含本場），作為排序的優先度"""
+    remaining = [timedelta(0)] * len(graph.matches)
+    for match_id in reversed(graph.topological_order()):
+        node = graph.matches[match_id]
+        remaining[match_id] = durations[match_id] + max(
+            (remaining[target] for target, _ in node.targets), default=timedelta(0)
+        )
+    return remaining
+
+
+def list_schedule(graph, table_count, durations, start, window=None, fixed=None, players=None):
+    """
+    排定所有未固定比賽的桌次與開始時間。
+
+    durations: {match_id: timedelta}，每場比賽預估的時間
+    fixed: {match_id: (桌次, 開始, 結束)}，已開始或已結束的比賽（不會被重新排）
+    players: {match_id: (選手, ...)}，已確定的選手，同一位選手不會同時排兩場
+    回傳 {match_id: (桌次, 開始時間)}（桌次從 1 開始）
+    """
+    if table_count < 1:
+        raise ValueError("桌數至少為 1")
+    window = window or VenueWindow()
+    fixed = fixed or {}
+    players = players or {}
+    priority = critical_path(graph, durations)
+
+    finish = {match_id: end for match_id, (_, _, end) in fixed.items()}
+    player_free = {}
+    tables = []
+    busy_until = {}
+    for table, begin, end in fixed.values():
+        if 1 <= table <= table_count and end > start:
+            busy_until[table] = max(busy_until.get(table, start), end)
+    for match_id, (_, _, end) in fixed.items():
+        for player in players.get(match_id, ()):
+            player_free[player] = max(player_free.get(player, start), end)
+    for table in range(1, table_count + 1):
+        heapq.heappush(tables, (busy_until.get(table, start), table))
+
+    waiting = [0] * len(graph.matches)  # 還沒排定的來源比賽數
+    release = [start] * len(graph.matches)
+    for node in graph.matches:
+        if node.id in fixed:
+            continue
+        for source in (node.source1, node.source2):
+            if source is None:
+                continue
+            if source in fixed:
+                release[node.id] = max(release[node.id], finish[source])
+            else:
+                waiting[node.id] += 1
+
+    def player_release(match_id):
+        return max([release[match_id]] + [player_free.get(p, start) for p in players.get(match_id, ())])
+
+    pending = []  # (可開始時間, 比賽 id)：來源都已排定，但時間還沒到
+    ready = []  # (-優先度, 場次, 比賽 id)：桌子空出來時就可以開始
+    for node in graph.matches:
+        if node.id not in fixed and waiting[node.id] == 0:
+            heapq.heappush(pending, (player_release(node.id), node.id))
+
+    result = {}
+    while pending or ready:
+        free_at, table = heapq.heappop(tables)
+        if not ready:
+            free_at = max(free_at, pending[0][0])
+        while pending and pending[0][0] <= free_at:
+            _, match_id = heapq.heappop(pending)
+            heapq.heappush(ready, (-priority[match_id], graph.matches[match_id].match_number, match_id))
+
+        _, _, match_id = heapq.heappop(ready)
+        # 選手可能在放進 ready 之後才被排到別桌：時間還沒到就放回 pending
+        available = player_release(match_id)
+        if available > free_at:
+            heapq.heappush(pending, (available, match_id))
+            heapq.heappush(tables, (free_at, table))
+            continue
+
+        begin = window.fit(free_at, durations[match_id])
+        end = begin + durations[match_id]
+        result[match_id] = (table, begin)
+        finish[match_id] = end
+        heapq.heappush(tables, (end, table))
+        for player in players.get(match_id, ()):
+            player_free[player] = end
+
+        for target, _ in graph.matches[match_id].targets:
+            if target in fixed:
+                continue
+            release[target] = max(release[target], end)
+            waiting[target] -= 1
+            if waiting[target] == 0:
+                heapq.heappush(pending, (player_release(target), target))
+    return result
@@ -0,0 +1,52 @@
+"""
+單筆 save / delete（後台編輯、修改選手名稱等）時更新賽事與階段的變動標記。
+bulk_create / bulk_update 不會觸發 signal，這些路徑直接呼叫 utils.touch_tournament。
+同時寫入比賽變動紀錄（MatchChange），增量同步 API 才看得到這些修改。
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Match, Player, Stage, Tournament
+from .utils import record_match_changes, touch_stages, touch_tournament, touch_tournaments
+
+
+@receiver([post_save, post_delete], sender=Stage)
+def stage_changed(sender, instance, **kwargs):
+    touch_tournament(instance.tournament_id)
+
+
+@receiver([post_save, post_delete], sender=Match)
+def match_changed(sender, instance, **kwargs):
+    touch_tournaments(Tournament.objects.filter(stages__id=instance.stage_id))
+    if kwargs.get("signal") is post_save:
+        tournament_id = Stage.objects.filter(id=instance.stage_id).values_list('tournament_id', flat=True).first()
+        record_match_changes(tournament_id, [instance.pk])
+    # 本場所在階段 + 以本場為來源的下游比賽所在階段
+    touch_stages(Stage.objects.filter(
+        Q(id=instance.stage_id)
+        | Q(matches__source_match1_id=instance.pk)
+        | Q(matches__source_match2_id=instance.pk)
+    ))
+
+
+@receiver(post_save, sender=Player)
+def player_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+    touch_tournaments(Tournament.objects.filter(
+        Q(stages__matches__player1_id=instance.pk) | Q(stages__matches__player2_id=instance.pk)
+    ))
+    touch_stages(Stage.objects.filter(
+        Q(matches__player1_id=instance.pk) | Q(matches__player2_id=instance.pk)
+    ))
+    # 改名會影響該選手所有比賽的顯示
+    matches = defaultdict(list)
+    for match_id, tournament_id in Match.objects.filter(
+        Q(player1_id=instance.pk) | Q(player2_id=instance.pk)
+    ).values_list('id', 'tournament_id'):
+        matches[tournament_id].append(match_id)
+    for tournament_id, match_ids in matches.items():
+        record_match_changes(tournament_id, match_ids)
@@ -0,0 +1,118 @@
+"""
+賽事的精簡 JSON 快照（給計分板、手機等程式讀取）。
+
+文件中選手、階段、比賽都以陣列索引互相參照，選手名稱只出現一次：
+{
+  "id", "name", "type", "semester", "version",
+  "players": [[id, 名稱, 局數], ...],
+  "stages": [[id, 名稱, order], ...],
+  "match_fields": matches 每一列的欄位名稱,
+  "matches": [[id, 階段索引, 場次, 選手1索引, 選手2索引, 勝者索引, 比分1, 比分2,
+               來源1比賽索引, 來源2比賽索引, 來源1取敗者, 來源2取敗者, 桌次, 開賽時間,
+               位置1輪空, 位置2輪空, 預估開賽時間], ...],
+  "standings": {階段索引: [[選手索引, 勝場, 得局, 失局, 得局率], ...]}
+}
+沒有值的索引為 null，布林值為 0 / 1。
+
+序列化結果存在 TournamentSnapshot，賽事 version 改變後第一次讀取時才重新產生，
+之後每次讀取只是一個查詢取出整個 blob。
+"""
+import gzip
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Match, Player, Tournament, TournamentSnapshot
+from .standings import read_standings
+
+MATCH_FIELDS = [
+    "id", "stage", "number", "player1", "player2", "winner", "point1", "point2",
+    "source1", "source2", "source1_loser", "source2_loser", "table", "start_time", "bye1", "bye2", "eta",
+]
+
+
+def build_snapshot(tournament):
+    """產生快照內容（dict）"""
+    stages = list(tournament.stages.order_by('order', 'id').values_list('id', 'name', 'order'))
+    stage_index = {pk: i for i, (pk, _, _) in enumerate(stages)}
+
+    rows = list(Match.objects.filter(tournament=tournament).order_by('stage__order', 'stage_id', 'id').values_list(
+        'id', 'stage_id', 'match_number', 'player1_id', 'player2_id', 'winner_id', 'point1', 'point2',
+        'source_match1_id', 'source_match2_id', 'source_match1_loser', 'source_match2_loser', 'table', 'start_time',
+        'player1_bye', 'player2_bye', 'eta',
+    ))
+    match_index = {row[0]: i for i, row in enumerate(rows)}
+
+    standings = read_standings(tournament)
+    player_ids = {pk for row in rows for pk in row[3:6] if pk is not None}
+    player_ids |= {record.player_id for records in standings.values() for record in records}
+    players = list(Player.objects.filter(id__in=player_ids).order_by('id').values_list('id', 'name', 'innings'))
+    player_index = {pk: i for i, (pk, _, _) in enumerate(players)}
+
+    def ref(index, pk):
+        return None if pk is None else index.get(pk)
+
+    matches = [
+        [
+            pk, stage_index[stage_id], number,
+            ref(player_index, p1), ref(player_index, p2), ref(player_index, winner),
+            point1, point2,
+            ref(match_index, source1), ref(match_index, source2), int(source1_loser), int(source2_loser),
+            table, start_time.isoformat() if start_time else None, int(bye1), int(bye2),
+            eta.isoformat() if eta else None,
+        ]
+        for (pk, stage_id, number, p1, p2, winner, point1, point2,
+             source1, source2, source1_loser, source2_loser, table, start_time, bye1, bye2, eta) in rows
+    ]
+
+    stage_names = {name: i for i, (_, name, _) in enumerate(stages)}
+    return {
+        "id": tournament.pk,
+        "name": tournament.name,
+        "type": tournament.type,
+        "semester": tournament.semester,
+        "version": tournament.version,
+        "players": [list(player) for player in players],
+        "stages": [list(stage) for stage in stages],
+        "match_fields": MATCH_FIELDS,
+        "matches": matches,
+        "standings": {
+            stage_names[name]: [
+                [player_index[r.player_id], r.wins, r.games_for, r.games_against, r.ratio] for r in records
+            ]
+            for name, records in standings.items()
+        },
+    }
+
+
+def encode_snapshot(document, compress):
+    data = json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode()
+    return gzip.compress(data) if compress else data
+
+
+@transaction.atomic
+def regenerate_snapshot(tournament_id):
+    tournament = Tournament.objects.get(id=tournament_id)
+    compress = getattr(settings, 'SCHEDULE_SNAPSHOT_GZIP', True)
+    data = encode_snapshot(build_snapshot(tournament), compress)
+    TournamentSnapshot.objects.update_or_create(
+        tournament=tournament,
+        defaults={"version": tournament.version, "data": data, "compressed": compress},
+    )
+    return tournament.version, data, compress
+
+
+def get_snapshot(tournament_id):
+    """
+    回傳 (version, data, compressed)；快照仍是最新版本時只有一個查詢。
+    賽事不存在時丟出 Tournament.DoesNotExist。
+    """
+    current = TournamentSnapshot.objects.filter(
+        tournament_id=tournament_id, version=F('tournament__version')
+    ).values_list('version', 'data', 'compressed').first()
+    if current is not None:
+        version, data, compressed = current
+        return version, bytes(data), compressed
+    return regenerate_snapshot(tournament_id)
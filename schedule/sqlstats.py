@@ -0,0 +1,336 @@
+"""
+SQL 指紋統計與慢查詢紀錄。
+
+每個 SQL 先正規化成指紋（參數、數字、字串、IN (...) 清單、多列 VALUES、bulk_update 的
+CASE WHEN 都換成佔位符），只差在參數的查詢（例如每個階段的 stage.matches.all()、
+選手名稱的 icontains 搜尋）會歸成同一筆，統計次數、總時間、p95 與呼叫的 view / 函式。
+超過 SCHEDULE_SLOW_SQL_MS 的查詢以 logger "schedule.sql" 記錄 SQL 與呼叫堆疊。
+
+settings.SCHEDULE_SQL_STATS = True 時於啟動時安裝（apps.ScheduleConfig.ready）。
+每個執行緒累加在自己的分片；每個 process 定期（SCHEDULE_SQL_STATS_FLUSH_SECONDS）
+把累計結果寫到 SCHEDULE_SQL_STATS_DIR/<host>-<pid>.json，
+manage.py top_sql 合併所有檔案後列出最耗時的指紋。
+
+清除統計（top_sql --reset）時在目錄寫入 reset 標記（清除的時間）並刪除統計檔案；
+執行中的 process 在下次寫檔前看到比自己開始累計還新的標記，就清空記憶體中的統計，
+不會把清除前的累計再寫回去。
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("schedule.sql")
+
+MAX_SAMPLES = 500  # 每個指紋保留最近幾次的時間（計算 p95 用）
+MAX_CALLERS = 20  # 每個指紋最多記錄幾個不同的呼叫位置
+
+_COMMENT = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r'%s|\?')
+_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_VALUES = re.compile(r'(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+', re.I)
+_CASE = re.compile(r'(WHEN\s[^()]*?\sTHEN\s\?)(?:\s+WHEN\s[^()]*?\sTHEN\s\?)+', re.I)
+_SPACE = re.compile(r'\s+')
+
+_local = threading.local()
+_shards = []  # 每個執行緒的 {指紋: FingerprintStats}
+_shards_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+_counting_since = time.time()  # 這個 process 目前的統計從何時開始累計（與 reset 標記比較）
+_installed = False
+
+RESET_MARKER = "reset"
+
+
+def normalize(sql):
+    sql = _COMMENT.sub(' ', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _VALUES.sub(r'\1, ...', sql)
+    sql = _CASE.sub(r'\1 ...', sql)
+    return sql
+
+
+def fingerprint(sql):
+    """回傳 (指紋 id, 正規化後的 SQL)"""
+    normalized = normalize(sql)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class FingerprintStats:
+    __slots__ = ('sql', 'count', 'seconds', 'samples', 'callers')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.seconds = 0.0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.callers = Counter()
+
+    def observe(self, seconds, caller):
+        self.count += 1
+        self.seconds += seconds
+        self.samples.append(seconds)
+        if caller in self.callers or len(self.callers) < MAX_CALLERS:
+            self.callers[caller] += 1
+
+    def to_dict(self):
+        return {
+            "sql": self.sql,
+            "count": self.count,
+            "seconds": self.seconds,
+            "samples": list(self.samples),
+            "callers": dict(self.callers),
+        }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# === 呼叫位置 ===
+_BASE_DIR = str(Path(settings.BASE_DIR).resolve()) + os.sep
+_SITE_PACKAGES = os.sep + 'site-packages' + os.sep
+# 量測用的模組本身不算呼叫者
+_INSTRUMENTATION = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name) for name in ('metrics.py', 'profiling.py', 'sqlstats.py')
+}
+
+
+def _project_frames(frame):
+    """由內而外，專案內（BASE_DIR 底下、非第三方套件）的 frame"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_BASE_DIR) and _SITE_PACKAGES not in filename and filename not in _INSTRUMENTATION:
+            yield frame
+        frame = frame.f_back
+
+
+def _caller(frame):
+    view = getattr(_local, 'view', None) or '-'
+    for project_frame in _project_frames(frame):
+        code = project_frame.f_code
+        path = code.co_filename[len(_BASE_DIR):]
+        return f"{view} {path}:{project_frame.f_lineno} {code.co_name}"
+    return view
+
+
+# === 記錄 ===
+def _shard():
+    shard = getattr(_local, 'stats', None)
+    if shard is None:
+        shard = _local.stats = {}
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def record(sql, seconds, frame=None):
+    fp, normalized = fingerprint(sql)
+    shard = _shard()
+    stats = shard.get(fp)
+    if stats is None:
+        stats = shard[fp] = FingerprintStats(normalized)
+    frame = frame or sys._getframe(1)
+    stats.observe(seconds, _caller(frame))
+
+    threshold = getattr(settings, 'SCHEDULE_SLOW_SQL_MS', 200)
+    if threshold is not None and seconds * 1000 >= threshold:
+        frames = reversed(list(_project_frames(frame)))
+        stack = ''.join(traceback.StackSummary.extract((f, f.f_lineno) for f in frames).format())
+        logger.warning("slow SQL %.1f ms [%s] %s\n%s", seconds * 1000, fp, sql, stack)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record(sql, time.perf_counter() - started, sys._getframe(1))
+
+
+def collect():
+    """合併這個 process 所有執行緒的統計，回傳 {指紋: dict}"""
+    with _shards_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        for fp, stats in list(shard.items()):
+            merge_into(merged, fp, stats.to_dict())
+    return merged
+
+
+def merge_into(merged, fp, data):
+    current = merged.get(fp)
+    if current is None:
+        merged[fp] = {**data, "samples": list(data["samples"]), "callers": dict(data["callers"])}
+        return
+    current["count"] += data["count"]
+    current["seconds"] += data["seconds"]
+    current["samples"] = (current["samples"] + list(data["samples"]))[-MAX_SAMPLES:]
+    for caller, count in data["callers"].items():
+        current["callers"][caller] = current["callers"].get(caller, 0) + count
+
+
+def reset():
+    global _counting_since
+    with _shards_lock:
+        for shard in _shards:
+            shard.clear()
+        _counting_since = time.time()
+
+
+# === 寫檔與讀取 ===
+def stats_dir():
+    directory = getattr(settings, 'SCHEDULE_SQL_STATS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def flush(force=False):
+    """把這個 process 的累計統計寫到自己的檔案（覆寫）；未到間隔或其他執行緒正在寫時略過"""
+    global _last_flush
+    directory = stats_dir()
+    interval = getattr(settings, 'SCHEDULE_SQL_STATS_FLUSH_SECONDS', 30)
+    if directory is None or (not force and time.monotonic() - _last_flush < interval):
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = time.monotonic()
+        requested = reset_requested_at(directory)
+        if requested is not None and requested > _counting_since:
+            reset()  # 其他 process 清除了統計，丟掉清除前的累計
+            return
+        data = collect()
+        if not data:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{socket.gethostname()}-{os.getpid()}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, path)
+    finally:
+        _flush_lock.release()
+
+
+def load_all(directory=None):
+    """合併目錄中所有 process 的統計"""
+    directory = directory or stats_dir()
+    merged = {}
+    if directory is None or not directory.is_dir():
+        return merged
+    requested = reset_requested_at(directory)
+    for path in sorted(directory.glob("*.json")):
+        try:
+            if requested is not None and path.stat().st_mtime < requested:
+                continue  # 清除前寫入、還沒被刪掉的檔案
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        for fp, stats in data.items():
+            merge_into(merged, fp, stats)
+    return merged
+
+
+def remove_files(directory=None):
+    """刪除目錄中的統計檔案（只刪 *.json，不動目錄與其他檔案），回傳刪除的數量"""
+    directory = directory or stats_dir()
+    removed = 0
+    if directory is None or not directory.is_dir():
+        return removed
+    for path in directory.glob("*.json"):
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+def reset_requested_at(directory=None):
+    """最近一次清除統計的時間（time.time()），沒有標記時回傳 None"""
+    directory = directory or stats_dir()
+    if directory is None:
+        return None
+    try:
+        return float((directory / RESET_MARKER).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def request_reset(directory=None):
+    """清除所有 process 的統計：寫入 reset 標記後刪除統計檔案，回傳刪除的數量"""
+    directory = directory or stats_dir()
+    if directory is None:
+        return 0
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / RESET_MARKER).write_text(repr(time.time()), encoding='utf-8')
+    return remove_files(directory)
+
+
+# === 安裝 ===
+def _add_wrapper(connection):
+    # 放在最前面：connection.execute_wrapper() 離開時會 pop 最後一個，不能被它拿走
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _add_wrapper(connection)
+
+
+def install():
+    global _installed
+    if _installed:
+        return
+    connection_created.connect(_on_connection_created, dispatch_uid="schedule.sqlstats")
+    for connection in connections.all():
+        _add_wrapper(connection)
+    atexit.register(flush, force=True)
+    _installed = True
+
+
+def is_enabled():
+    return getattr(settings, 'SCHEDULE_SQL_STATS', False)
+
+
+class SqlStatsMiddleware:
+    """記錄目前請求的 view 名稱（作為查詢的呼叫者），並定期寫檔"""
+
+    def __init__(self, get_response):
+        if not is_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            _local.view = None
+            flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _local.view = request.resolver_match.view_name
@@ -0,0 +1,191 @@
+"""
+循環賽積分表的實體化（Standing 資料表）。
+
+比賽結果寫入時以 update_standings() 只更新受影響的選手，
+頁面以 read_standings() 一個查詢讀出；rebuild_standings() 為完整重算的備援
+（升級後以 manage.py rebuild_standings --missing 補齊）。
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .bracket import result_contribution
+from .models import Match, Player, Stage, Standing
+from .utils import get_round_robin_standings
+
+
+def match_state(match):
+    """比賽中會影響積分表的欄位：(stage_id, player1_id, player2_id, point1, point2)"""
+    return (match.stage_id, match.player1_id, match.player2_id, match.point1, match.point2)
+
+
+def node_state(graph, node):
+    """同 match_state()，但取自 BracketGraph 的節點"""
+    return (graph.stages[node.stage].pk, node.player1, node.player2, node.point1, node.point2)
+
+
+def get_ratio(games_for, games_against):
+    total = games_for + games_against
+    return round(games_for / total, 3) if total > 0 else 0
+
+
+@transaction.atomic
+def rebuild_standings(tournament):
+    """刪除並依所有比賽重算整個賽事的積分表"""
+    Standing.objects.filter(tournament=tournament).delete()
+    stage_ids = dict(tournament.stages.values_list('name', 'id'))
+    rows = []
+    for stage_name, player_list in get_round_robin_standings(tournament, per_stage=True).items():
+        for record in player_list:
+            rows.append(Standing(
+                tournament=tournament,
+                stage_id=stage_ids[stage_name],
+                player=record["player"],
+                wins=record["wins"],
+                games_for=record["games_for"],
+                games_against=record["games_against"],
+                ratio=record["ratio"],
+            ))
+    Standing.objects.bulk_create(rows)
+    return rows
+
+
+@transaction.atomic
+def update_standings(tournament, changes):
+    """
+    依比賽修改前後的狀態增量更新積分表。
+
+    changes: [(修改前狀態, 修改後狀態), ...]，狀態見 match_state()
+    只處理名稱含 Group 的階段；先扣掉修改前的貢獻，再加上修改後的貢獻。
+    """
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return
+
+    stage_ids = {state[0] for pair in changes for state in pair}
+    group_ids = set(
+        Stage.objects.filter(id__in=stage_ids, name__icontains="group").values_list('id', flat=True)
+    )
+    if not group_ids:
+        return
+
+    # 舊賽事還沒有積分表時直接完整重算
+    if not Standing.objects.filter(tournament=tournament).exists():
+        rebuild_standings(tournament)
+        return
+
+    # W 以該選手的局數計算，只在有 W 時才查詢選手局數
+    w_players = {
+        state[1 + i] for pair in changes for state in pair
+        for i in (0, 1) if str(state[3 + i]).strip().upper() == 'W'
+    }
+    w_points = dict(Player.objects.filter(id__in=w_players).values_list('id', 'innings')) if w_players else {}
+
+    deltas = defaultdict(lambda: [0, 0, 0])  # (stage, 選手) -> 勝場, 得局, 失局
+    present = set()  # 修改後出現在該組的選手
+    absent = set()  # 修改前在、修改後不在這場的選手
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            stage_id, p1, p2, point1, point2 = state
+            if stage_id not in group_ids:
+                continue
+            for player in (p1, p2):
+                if player is not None:
+                    (present if sign > 0 else absent).add((stage_id, player))
+            for player, wins, gf, ga in result_contribution(p1, p2, point1, point2, w_points) or ():
+                delta = deltas[stage_id, player]
+                delta[0] += sign * wins
+                delta[1] += sign * gf
+                delta[2] += sign * ga
+    absent -= present
+
+    # 已不在該組任何比賽中的選手要從積分表移除
+    gone = set()
+    for stage_id, player in absent:
+        still_playing = Match.objects.filter(stage_id=stage_id).filter(
+            Q(player1_id=player) | Q(player2_id=player)
+        ).exists()
+        if not still_playing:
+            gone.add((stage_id, player))
+
+    keys = (set(deltas) | present) - gone
+    existing = {
+        (row.stage_id, row.player_id): row
+        for row in Standing.objects.filter(
+            stage_id__in={k[0] for k in keys | gone},
+            player_id__in={k[1] for k in keys | gone},
+        )
+    }
+
+    to_create, to_update = [], []
+    for key in keys:
+        wins, gf, ga = deltas.get(key, (0, 0, 0))
+        row = existing.get(key)
+        if row is None:
+            row = Standing(tournament=tournament, stage_id=key[0], player_id=key[1])
+            to_create.append(row)
+        elif wins or gf or ga:
+            to_update.append(row)
+        else:
+            continue
+        row.wins += wins
+        row.games_for += gf
+        row.games_against += ga
+        row.ratio = get_ratio(row.games_for, row.games_against)
+
+    Standing.objects.bulk_create(to_create)
+    Standing.objects.bulk_update(to_update, ['wins', 'games_for', 'games_against', 'ratio'])
+    gone_ids = [existing[key].id for key in gone if key in existing]
+    if gone_ids:
+        Standing.objects.filter(id__in=gone_ids).delete()
+
+
+def read_standings(tournament):
+    """
+    以一個查詢讀出積分表，格式同 get_round_robin_standings()：
+    {"Group 1 Round Robin": [Standing, ...], ...}，各組依比序排列。
+    同一位選手出現在多個 Group 階段時（雙敗），回傳的 Standing 為所有階段的合計（不存檔）。
+
+    只讀不寫：還沒有積分表（剛升級、尚未執行 manage.py rebuild_standings --missing）的賽事
+    以 SQL 彙總即時計算，回傳未存檔的 Standing，不在 GET 請求中寫入資料庫。
+    """
+    rows = Standing.objects.filter(tournament=tournament).select_related('player', 'stage').order_by(
+        'stage__order', 'stage_id', '-wins', '-games_for', 'games_against', '-ratio', 'id'
+    )
+    if not rows and tournament.stages.filter(name__icontains="group").exists():
+        return compute_standings(tournament)
+
+    group_standings = {}
+    totals = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        group_standings.setdefault(row.stage.name, []).append(row)
+        total = totals[row.player_id]
+        total[0] += row.wins
+        total[1] += row.games_for
+        total[2] += row.games_against
+
+    # 每列存的是選手在該階段的成績，顯示時同 get_round_robin_standings() 以所有階段的合計排名
+    if len(totals) < len(rows):
+        for player_list in group_standings.values():
+            for row in player_list:
+                row.wins, row.games_for, row.games_against = totals[row.player_id]
+                row.ratio = get_ratio(row.games_for, row.games_against)
+            player_list.sort(key=lambda r: (r.wins, r.games_for, -r.games_against, r.ratio), reverse=True)
+    return group_standings
+
+
+def compute_standings(tournament):
+    """以 SQL 彙總即時計算積分表（不寫入），格式同 read_standings()"""
+    stage_ids = dict(tournament.stages.values_list('name', 'id'))
+    return {
+        stage_name: [
+            Standing(
+                tournament=tournament, stage_id=stage_ids[stage_name], player=record["player"],
+                wins=record["wins"], games_for=record["games_for"], games_against=record["games_against"],
+                ratio=record["ratio"],
+            )
+            for record in player_list
+        ]
+        for stage_name, player_list in get_round_robin_standings(tournament, backend="sql").items()
+    }
@@ -1,8 +1,46 @@
 # yourapp/templatetags/custom_filters.py
 from django import template
 
+from schedule.fragment_cache import get_fragment_cache, get_fragment_timeout, make_key, record
+
 register = template.Library()
 
 @register.filter
 def get_item(dictionary, key):
     return dictionary.get(key)
+
+
+class StageCacheNode(template.Node):
+    def __init__(self, nodelist, stage, vary_on):
+        self.nodelist = nodelist
+        self.stage = stage
+        self.vary_on = vary_on
+
+    def render(self, context):
+        # 搜尋結果只含部分比賽，不使用快取
+        if not context.get('use_fragment_cache', True):
+            return self.nodelist.render(context)
+
+        stage = self.stage.resolve(context)
+        key = make_key(stage, [var.resolve(context) for var in self.vary_on])
+        cache = get_fragment_cache()
+        html = cache.get(key)
+        record(hit=html is not None)
+        if html is None:
+            html = self.nodelist.render(context)
+            cache.set(key, html, get_fragment_timeout())
+        return html
+
+
+@register.tag
+def stage_cache(parser, token):
+    """
+    {% stage_cache stage [vary_on ...] %} ... {% endstage_cache %}
+    以 stage.id + stage.version（+ 語系與 vary_on）快取區塊內容
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'stage_cache' 至少需要一個參數（stage）")
+    nodelist = parser.parse(('endstage_cache',))
+    parser.delete_first_token()
+    return StageCacheNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]])
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import socket
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from datetime import datetime, time, timedelta
+
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import OperationalError, connection
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+
+from . import fragment_cache, live, metrics, sqlstats
+from .benchmarks import compare
+from .bracket import BracketError, BracketGraph, build_double_elimination, build_single_elimination, simulate
+from .jobs import claim_next, run_pending
+from .loadtest import LOCKED_HEADER, DatabaseLockedMiddleware, LoadTest, RoleStats
+from .models import Tournament, Player, Match, MatchChange, Job, ScheduleSetting, Standing
+from .propagation import apply_results
+from .roster import RosterError, read_roster
+from .scheduler import VenueWindow
+from .standings import rebuild_standings, read_standings
+from .utils import (
+    apply_schedule, create_double_elimination_bracket, create_mixed_bracket, create_single_elimination_bracket,
+    get_round_robin_standings,
+)
+
+
+def make_players(n):
+    return [Player.objects.create(name=f"Player {i}", innings=3) for i in range(n)]
+
+
+class BracketGraphTests(SimpleTestCase):
+
+    def build(self, players, double=False):
+        graph = BracketGraph()
+        (build_double_elimination if double else build_single_elimination)(graph, list(range(1, players + 1)))
+        graph.resolve_byes()
+        return graph
+
+    def test_dict_round_trip_keeps_results_and_routing(self):
+        for graph in (self.build(24), self.build(48, double=True)):
+            simulate(graph, random.Random(0))
+            data = json.loads(json.dumps(graph.to_dict()))
+            restored = BracketGraph.from_dict(data)
+            self.assertEqual(restored.to_dict(), data)
+            self.assertEqual(restored.routing(), graph.routing())
+            self.assertTrue(restored.validate())
+
+    def test_validate_reports_every_problem(self):
+        graph = self.build(8)
+        final = graph.matches[-2]
+        graph.matches[final.source1].targets.clear()  # 來源沒有連到決賽
+        first = graph.matches[0]
+        first.winner, first.loser = 99, first.player1  # 勝者不是參賽者
+        with self.assertRaises(BracketError) as raised:
+            graph.validate()
+        self.assertIn("沒有連到比賽", str(raised.exception))
+        self.assertIn("勝者不是參賽者", str(raised.exception))
+
+        cycle = self.build(4)
+        cycle.link(cycle.matches[-2].id, 0, 1)
+        with self.assertRaisesMessage(BracketError, "循環"):
+            cycle.validate()
+
+    def test_simulate_large_bracket(self):
+        graph = self.build(12000)
+        self.assertGreater(len(graph.matches), 10000)
+        simulate(graph, random.Random(1))
+        self.assertTrue(graph.validate())
+        for node in graph.matches:
+            if node.player1 is not None and node.player2 is not None:
+                self.assertIn(node.winner, (node.player1, node.player2))
+        final = next(node for node in graph.matches if graph.stages[node.stage].name == "Final")
+        self.assertIsNotNone(final.winner)
+
+        # 以資料庫 pk 找比賽
+        for node in graph.matches:
+            node.pk = 100000 + node.id
+        self.assertIs(graph.get_by_pk(100000 + final.id), final)
+        with self.assertRaises(BracketError):
+            graph.get_by_pk(1)
+
+
+class TournamentDetailQueryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def make_double_elim(self, player_num):
+        tournament = Tournament.objects.create(
+            name="雙敗", type="double_elim", semester="114-1", player_num=player_num
+        )
+        create_double_elimination_bracket(tournament, make_players(player_num))
+        return tournament
+
+    def test_double_elim_query_count_does_not_grow_with_bracket_size(self):
+        # tournament (get) + tournament (render) + stages + matches
+        for player_num in (16, 64):
+            tournament = self.make_double_elim(player_num)
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse("TournamentDetailView", args=[tournament.id]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_round_robin_with_standings_query_count(self):
+        for group_size in (4, 8):
+            tournament = Tournament.objects.create(
+                name="循環", type="round_robin", semester="114-1", player_num=4 * group_size,
+                num_groups=4, group_size=group_size, advance_per_group=2,
+            )
+            create_mixed_bracket(tournament, make_players(4 * group_size), 4, group_size, 2)
+            rebuild_standings(tournament)
+            # 上面 4 個查詢 + 積分表
+            with self.assertNumQueries(5):
+                response = self.client.get(reverse("TournamentDetailView", args=[tournament.id]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_search_query_count(self):
+        tournament = self.make_double_elim(64)
+        # tournament (render) + stages + matches
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("TournamentDetailView", args=[tournament.id]),
+                {"action": "search", "name": "Player 1"},
+            )
+        self.assertContains(response, "Player 12")
+        self.assertNotContains(response, "Player 20")
+
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command("audit_query_plans", players=64, stdout=out)
+        self.assertIn("所有熱門查詢都有使用索引", out.getvalue())
+        self.assertFalse(Tournament.objects.exists())  # 合成的賽事已回滾
+
+    def test_benchmark_baseline_and_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            fragment_cache.reset_stats()
+            call_command("run_benchmarks", types=["single_elim"], sizes=[8], repeat=2, no_memory=True,
+                         save=path, stdout=io.StringIO())
+            # 每次重複都從空的片段快取開始，量到的是第一次開啟的時間
+            self.assertEqual(fragment_cache.get_stats()["hits"], 0)
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+        self.assertEqual(baseline["results"]["single_elim/8/render"]["queries"], 6)
+        self.assertFalse(Tournament.objects.exists())
+
+        slower = json.loads(json.dumps(baseline))
+        slower["results"]["single_elim/8/render"]["queries"] = 9
+        self.assertEqual(compare(baseline, slower, 0.25), [("single_elim/8/render", "queries", 6, 9)])
+
+    def test_conditional_get_returns_304_until_tournament_changes(self):
+        tournament = self.make_double_elim(16)
+        url = reverse("TournamentDetailView", args=[tournament.id])
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        match = Match.objects.filter(stage__tournament=tournament).first()
+        match.point1 = "3"
+        match.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_editing_the_tournament_changes_etag(self):
+        tournament = self.make_double_elim(16)
+        url = reverse("TournamentDetailView", args=[tournament.id])
+        etag = self.client.get(url)["ETag"]
+
+        stale = Tournament.objects.get(id=tournament.id)
+        Match.objects.filter(tournament=tournament).first().save()  # 其他請求同時登錄了賽果
+        etag = self.client.get(url)["ETag"]
+        stale.save()  # 沒有改到顯示的欄位
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        stale.name = "改名"
+        stale.save()  # 例如在後台修改名稱
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "改名")
+        # 舊的實例存檔也不會讓版本倒退
+        self.assertGreater(Tournament.objects.get(id=tournament.id).version, tournament.version + 1)
+
+
+class TournamentImportTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="secret"))
+
+    def post_roster(self, content, player_num=8, **extra):
+        return self.client.post(reverse("TournamentCreateView"), {
+            "semester": "114-1", "name": "匯入", "player_num": player_num, "type": "single_elim",
+            "file": SimpleUploadedFile("roster.csv", content.encode("utf-8-sig")), **extra,
+        }, follow=True)
+
+    def test_all_row_errors_are_reported_and_nothing_is_created(self):
+        response = self.post_roster("甲,3\n乙,三\n丙\n" + "丁," + "x" * 3 + "\n" + "名" * 101 + "\n")
+        errors = [str(m) for m in response.context["messages"]]
+        self.assertEqual(len(errors), 3)
+        self.assertIn("第 2 行", errors[0])
+        self.assertFalse(Tournament.objects.exists())
+        self.assertFalse(Player.objects.exists())
+
+    def test_import_creates_players_in_order(self):
+        response = self.post_roster("甲,3\n\n丙,5\n")
+        tournament = Tournament.objects.get()
+        self.assertRedirects(response, reverse("TournamentDetailView", args=[tournament.id]))
+        first = Match.objects.get(stage__tournament=tournament, match_number=1)
+        self.assertEqual((first.player1.name, first.player1.innings), ("甲", 3))
+        # 空行與不足的名額都是輪空，不建立選手，輪空比賽直接晉級
+        self.assertEqual(Player.objects.count(), 2)
+        self.assertTrue(first.player2_bye)
+        self.assertEqual(first.winner, first.player1)
+        final = Match.objects.get(stage__tournament=tournament, stage__name="Final")
+        self.assertEqual((final.player1.name, final.player2.name), ("甲", "丙"))
+
+    def test_any_field_size_uses_byes(self):
+        roster = "".join(f"選手{i}\n" for i in range(24))
+        self.post_roster(roster, player_num=24)
+        tournament = Tournament.objects.get()
+        first_round = Match.objects.filter(stage__tournament=tournament, stage__name="Last 32")
+        self.assertEqual(first_round.count(), 16)
+        self.assertEqual(first_round.filter(player2_bye=True).count(), 8)
+        self.assertEqual(first_round.filter(status="walkover").count(), 8)
+        self.assertEqual(Player.objects.count(), 24)
+        # 輪空的勝者已進到下一輪
+        self.assertEqual(
+            Match.objects.filter(stage__tournament=tournament, stage__name="Last 16", player1__isnull=False).count(), 8
+        )
+
+    def assert_rejected(self, response, message):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, " ".join(str(m) for m in response.context["messages"]))
+        self.assertFalse(Tournament.objects.exists())
+        self.assertFalse(Player.objects.exists())
+
+    def test_roster_needs_two_players(self):
+        self.assert_rejected(self.post_roster(""), "至少需要 2 名選手")
+        self.assert_rejected(self.post_roster("甲\n"), "至少需要 2 名選手")
+        self.assert_rejected(self.post_roster("\n甲\n\n"), "至少需要 2 名選手")
+
+    def test_round_robin_needs_two_players_per_group(self):
+        response = self.post_roster(
+            "甲\n乙\n丙\n", player_num=8, type="round_robin", num_groups=2, group_size=4, advance_per_group=2,
+        )
+        self.assert_rejected(response, "每組至少需要 2 名選手")
+
+    def test_decode_error_reports_the_actual_line(self):
+        content = "".join(f"選手{i}\n" for i in range(3000)).encode("utf-8") + b"\xff\xfe\n"
+        with self.assertRaises(RosterError) as raised:
+            read_roster(SimpleUploadedFile("roster.csv", content), 4096)
+        self.assertEqual(raised.exception.errors[0][0], 3001)
+
+    def test_trailing_blank_rows_are_ignored(self):
+        self.assertEqual(read_roster(SimpleUploadedFile("roster.csv", "甲\n乙\n\n,\n\n".encode()), 2),
+                         [("甲", 999), ("乙", 999)])
+        with self.assertRaisesMessage(RosterError, "多了 1 名選手"):
+            read_roster(SimpleUploadedFile("roster.csv", "甲\n乙\n\n丙\n".encode()), 2)
+
+    def test_reuse_matches_existing_players_by_normalized_name(self):
+        existing = Player.objects.create(name="王 小明", innings=3)
+        self.post_roster("王小明,5\nＢＯＢ\n", player_num=4, reuse_players="on")
+        first = Match.objects.get(match_number=1)
+        self.assertEqual(first.player1, existing)
+        self.assertEqual(first.player1.innings, 3)
+        self.assertEqual(first.player2.normalized_name, "bob")
+
+
+class DedupePlayersTests(TestCase):
+
+    def tournament(self, names):
+        tournament = Tournament.objects.create(name="單敗", type="single_elim", semester="114-1", player_num=4)
+        create_single_elimination_bracket(tournament, [Player.objects.create(name=name, innings=3) for name in names])
+        return tournament
+
+    def dedupe(self, **options):
+        out = io.StringIO()
+        call_command("dedupe_players", stdout=out, **options)
+        return out.getvalue()
+
+    def test_duplicates_across_tournaments_are_merged(self):
+        first = self.tournament(["王小明", "甲", "乙", "丙"])
+        second = self.tournament(["王 小明", "丁", "戊", "己"])
+        keeper = Player.objects.get(name="王小明")
+
+        self.dedupe(dry_run=True)
+        self.assertEqual(Player.objects.filter(normalized_name="王小明").count(), 2)
+
+        self.assertIn("已合併 1 位", self.dedupe())
+        self.assertEqual(list(Player.objects.filter(normalized_name="王小明")), [keeper])
+        for tournament in (first, second):
+            self.assertTrue(Match.objects.filter(tournament=tournament, player1=keeper).exists())
+
+    def test_namesakes_in_the_same_tournament_are_not_merged(self):
+        tournament = self.tournament(["Bob", "甲", "ＢＯＢ", "乙"])
+        out = self.dedupe()
+        self.assertIn("略過 bob", out)
+        self.assertEqual(Player.objects.filter(normalized_name="bob").count(), 2)
+        for match in Match.objects.filter(tournament=tournament, player1__isnull=False, player2__isnull=False):
+            self.assertNotEqual(match.player1_id, match.player2_id)
+
+
+class StandingTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("referee", password="secret"))
+        self.tournament = Tournament.objects.create(
+            name="循環", type="round_robin", semester="114-1", player_num=8,
+            num_groups=2, group_size=4, advance_per_group=2,
+        )
+        create_mixed_bracket(self.tournament, make_players(8), 2, 4, 2)
+        rebuild_standings(self.tournament)
+
+    def post_result(self, match, point1, point2, winner):
+        self.client.post(reverse("MatchDetailView", args=[match.id]), {
+            "player1": match.player1.name, "player2": match.player2.name,
+            "point1": point1, "point2": point2, "winner": winner,
+            "table": "1", "start_time": "",
+        })
+
+    def assert_matches_full_recompute(self):
+        expected = {
+            name: [(r["player"].id, r["wins"], r["games_for"], r["games_against"], r["ratio"]) for r in rows]
+            for name, rows in get_round_robin_standings(self.tournament).items()
+        }
+        actual = {
+            name: [(r.player_id, r.wins, r.games_for, r.games_against, r.ratio) for r in rows]
+            for name, rows in read_standings(self.tournament).items()
+        }
+        self.assertEqual(
+            {name: sorted(rows) for name, rows in actual.items()},
+            {name: sorted(rows) for name, rows in expected.items()},
+        )
+
+    def test_incremental_update_and_correction(self):
+        matches = list(Match.objects.filter(stage__tournament=self.tournament).order_by("id"))
+        for i, match in enumerate(matches):
+            self.post_result(match, "3", str(i % 3), "player1")
+        self.assert_matches_full_recompute()
+
+        # 裁判更正比分
+        self.post_result(matches[0], "1", "3", "player2")
+        self.post_result(matches[1], "W", "FF", "player1")
+        self.assert_matches_full_recompute()
+
+    def test_invalid_single_result_is_rejected(self):
+        match = Match.objects.filter(stage__tournament=self.tournament).order_by("id").first()
+        for point1, winner in (("abc", "player1"), ("3", "player3"), ("3", "p1")):
+            self.post_result(match, point1, "1", winner)
+            match.refresh_from_db()
+            self.assertEqual((match.point1, match.winner_id, match.table), ("", None, 0))
+
+    def test_missing_standings_are_computed_without_writes(self):
+        matches = list(Match.objects.filter(stage__tournament=self.tournament).order_by("id"))
+        for match in matches[:4]:
+            self.post_result(match, "3", "1", "player1")
+        Standing.objects.all().delete()  # 例如剛升級（0020 清空了積分表）
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assert_matches_full_recompute()
+            self.assertContains(
+                self.client.get(reverse("TournamentDetailView", args=[self.tournament.id])), "standings-container"
+            )
+        self.assertFalse([q for q in queries if not q["sql"].lstrip().upper().startswith("SELECT")
+                          and "django_session" not in q["sql"]])
+        self.assertFalse(Standing.objects.exists())
+
+        call_command("rebuild_standings", missing=True, stdout=io.StringIO())
+        self.assertTrue(Standing.objects.exists())
+        self.assert_matches_full_recompute()
+
+    def test_sql_backend_matches_python_backend(self):
+        matches = list(Match.objects.filter(stage__tournament=self.tournament).order_by("id"))
+        results = [("3", "1", "player1"), ("W", "FF", "player1"), ("0", "3", "player2"), ("", "", "")]
+        for match, (point1, point2, winner) in zip(matches, results * len(matches)):
+            self.post_result(match, point1, point2, winner)
+
+        def normalize(standings):
+            return {
+                name: sorted((r["player"].id, r["wins"], r["games_for"], r["games_against"], r["ratio"]) for r in rows)
+                for name, rows in standings.items()
+            }
+
+        self.assertEqual(
+            normalize(get_round_robin_standings(self.tournament, backend="sql")),
+            normalize(get_round_robin_standings(self.tournament, backend="python")),
+        )
+
+
+class DoubleElimStandingTests(TestCase):
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(
+            name="雙敗", type="double_elim", semester="114-1", player_num=16
+        )
+        create_double_elimination_bracket(self.tournament, make_players(16))
+        rebuild_standings(self.tournament)
+
+    def test_players_are_ranked_by_totals_across_group_stages(self):
+        for _ in range(3):
+            ready = Match.objects.filter(tournament=self.tournament, status="ready").values_list('id', flat=True)
+            apply_results(self.tournament, [
+                {"match": pk, "point1": "3", "point2": str(pk % 3), "winner": "player1"} for pk in ready
+            ])
+
+        def summary(standings, player):
+            return {
+                name: [(player(r), r["wins"], r["games_for"], r["games_against"], r["ratio"]) for r in rows]
+                for name, rows in standings.items()
+            }
+
+        python = summary(get_round_robin_standings(self.tournament, backend="python"), lambda r: r["player"].id)
+        self.assertEqual(summary(get_round_robin_standings(self.tournament, backend="sql"), lambda r: r["player"].id),
+                         python)
+        read = {
+            name: [(r.player_id, r.wins, r.games_for, r.games_against, r.ratio) for r in rows]
+            for name, rows in read_standings(self.tournament).items()
+        }
+        self.assertEqual({k: sorted(v) for k, v in read.items()}, {k: sorted(v) for k, v in python.items()})
+
+        # 打過初賽與勝部資格賽的選手，在兩個階段都列出相同的合計
+        rows_by_player = {}
+        for rows in python.values():
+            for row in rows:
+                rows_by_player.setdefault(row[0], set()).add(row[1:])
+        self.assertTrue(all(len(rows) == 1 for rows in rows_by_player.values()))
+        self.assertTrue(any(row[1] == 2 for rows in python.values() for row in rows))
+
+    def test_later_stage_result_updates_earlier_stage_standings(self):
+        cache.clear()
+        url = reverse("TournamentDetailView", args=[self.tournament.id]) + "?show_standings=1"
+
+        def play_ready():
+            ready = Match.objects.filter(tournament=self.tournament, status="ready").values_list('id', flat=True)
+            apply_results(self.tournament, [
+                {"match": pk, "point1": "1", "point2": "3", "winner": "player2"} for pk in ready
+            ])
+
+        def render():
+            content = self.client.get(url).content.decode()
+            return re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', '', content)
+
+        play_ready()
+        render()  # 初賽區塊寫入片段快取
+        play_ready()  # 只有後面階段的比賽有變動
+        cached = render()
+        cache.clear()
+        self.assertEqual(cached, render())
+
+
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("referee", password="secret"))
+        self.tournament = Tournament.objects.create(
+            name="循環", type="round_robin", semester="114-1", player_num=8,
+            num_groups=2, group_size=4, advance_per_group=2,
+        )
+        create_mixed_bracket(self.tournament, make_players(8), 2, 4, 2)
+
+    def request_knockout(self):
+        return self.client.post(
+            reverse("TournamentDetailView", args=[self.tournament.id]), {"action": "generate_single_elim"}
+        )
+
+    def finish_groups(self, skip=0):
+        pks = list(Match.objects.filter(tournament=self.tournament, winner__isnull=True).values_list('id', flat=True))
+        apply_results(self.tournament, [
+            {"match": pk, "point1": "3", "point2": "1", "winner": "player1"} for pk in pks[skip:]
+        ])
+
+    def test_unfinished_groups_are_not_advanced(self):
+        self.finish_groups(skip=1)
+        self.request_knockout()
+        run_pending()
+        job = Job.objects.get()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("還有 1 場比賽尚未完成", job.result)
+        unfinished = Match.objects.get(tournament=self.tournament, winner__isnull=True)
+        self.assertIn(f"{unfinished.stage.name} 第 {unfinished.match_number} 場", job.result)
+        self.assertFalse(Match.objects.filter(stage__tournament=self.tournament, stage__name="Final").exists())
+
+        # 只登錄比分、沒有點選勝者：已計入積分表，視為完成，可以再排一次
+        apply_results(self.tournament, [{"match": unfinished.id, "point1": "3", "point2": "1"}])
+        self.assertEqual(Match.objects.get(id=unfinished.id).status, "in_progress")
+        self.request_knockout()
+        run_pending()
+        self.assertEqual(Match.objects.filter(stage__tournament=self.tournament, stage__name="Final").count(), 1)
+
+    def test_double_submit_is_deduplicated_and_worker_runs_once(self):
+        self.finish_groups()
+        self.request_knockout()
+        self.request_knockout()
+        job = Job.objects.get()
+        self.assertEqual(job.status, "queued")
+
+        self.assertEqual(run_pending(), 1)
+        status = self.client.get(reverse("JobStatusView", args=[job.id])).json()
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(Match.objects.filter(stage__tournament=self.tournament, stage__name="Final").count(), 1)
+
+        # 已經產生過：再排一次也不會產生第二份單敗籤表
+        self.request_knockout()
+        run_pending()
+        self.assertEqual(Match.objects.filter(stage__tournament=self.tournament, stage__name="Final").count(), 1)
+
+    def test_claim_rechecks_tournament_lock_in_the_update(self):
+        first = Job.objects.create(kind="advance", tournament=self.tournament)
+        second = Job.objects.create(kind="rebuild_standings", tournament=self.tournament)
+        raced = []
+
+        def other_worker(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not raced and sql.startswith("SELECT"):
+                # 另一個 worker 在查詢與搶占之間取走同賽事的另一個工作
+                raced.append(True)
+                Job.objects.filter(id=second.id).update(status="running")
+            return result
+
+        with connection.execute_wrapper(other_worker):
+            self.assertIsNone(claim_next())
+        first.refresh_from_db()
+        self.assertEqual(first.status, "queued")
+
+    @override_settings(SCHEDULE_JOBS_EAGER=True)
+    def test_eager_mode_runs_in_request(self):
+        self.finish_groups()
+        self.request_knockout()
+        self.assertEqual(Job.objects.get().status, "done")
+
+
+class PropagationTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("referee", password="secret"))
+        self.tournament = Tournament.objects.create(
+            name="單敗", type="single_elim", semester="114-1", player_num=8
+        )
+        self.players = make_players(8)
+        create_single_elimination_bracket(self.tournament, self.players)
+
+    def match(self, match_number):
+        return Match.objects.get(stage__tournament=self.tournament, match_number=match_number)
+
+    def post_winner(self, match_number, winner):
+        self.client.post(reverse("MatchDetailView", args=[self.match(match_number).id]), {
+            "point1": "3" if winner == "player1" else "1",
+            "point2": "1" if winner == "player1" else "3",
+            "winner": winner, "table": "", "start_time": "",
+        })
+
+    def test_winner_and_loser_routing(self):
+        for match_number in range(1, 7):
+            self.post_winner(match_number, "player1")
+        p = self.players
+        self.assertEqual((self.match(5).player1, self.match(5).player2), (p[0], p[2]))
+        self.assertEqual((self.match(7).player1, self.match(7).player2), (p[0], p[4]))
+        # 季殿賽由四強賽輸家對決
+        self.assertEqual((self.match(8).player1, self.match(8).player2), (p[2], p[6]))
+
+    def test_correction_clears_stale_downstream_results(self):
+        for match_number in range(1, 8):
+            self.post_winner(match_number, "player1")
+
+        # 更正第 1 場：勝者改為 player2，後面第 5、7 場的賽果都已不成立
+        self.post_winner(1, "player2")
+        semi, final, tie_breaker = self.match(5), self.match(7), self.match(8)
+        self.assertEqual(semi.player1, self.players[1])
+        self.assertIsNone(semi.winner)
+        self.assertEqual((semi.point1, semi.point2), ("", ""))
+        self.assertIsNone(final.player1)
+        self.assertIsNone(final.winner)
+        self.assertIsNone(tie_breaker.player1)
+        self.assertEqual(tie_breaker.player2, self.players[6])
+
+    def test_batch_results_json(self):
+        quarter_finals = [self.match(n) for n in range(1, 5)]
+        payload = {"results": [
+            {"match": m.id, "point1": "3", "point2": "1", "winner": "player1", "table": str(i + 1)}
+            for i, m in enumerate(quarter_finals)
+        ] + [{"match": self.match(5).id, "winner": "player3"}]}
+        response = self.client.post(
+            reverse("MatchBatchResultView", args=[self.tournament.id]),
+            json.dumps(payload), content_type="application/json",
+        )
+        statuses = response.json()["results"]
+        self.assertEqual([s["status"] for s in statuses], ["ok"] * 4 + ["error"])
+        semi = self.match(5)
+        self.assertEqual((semi.player1, semi.player2), (self.players[0], self.players[2]))
+        self.assertEqual(self.match(4).table, 4)
+
+    def test_status_and_referee_dashboard(self):
+        url = reverse("RefereeDashboardView", args=[self.tournament.id])
+        statuses = dict(Match.objects.filter(tournament=self.tournament).values_list("match_number", "status"))
+        self.assertEqual([statuses[n] for n in range(1, 9)], ["ready"] * 4 + ["pending"] * 4)
+
+        self.client.post(url, {"action": "start", "match": self.match(1).id, "table": "2"})
+        started = self.match(1)
+        self.assertEqual((started.status, started.table), ("in_progress", 2))
+        self.assertIsNotNone(started.start_time)
+
+        # 可以開打的比賽與使用中的桌子都由同一個查詢取得
+        with self.assertNumQueries(4):  # session、使用者、賽事、比賽
+            response = self.client.get(url)
+        self.assertEqual([m.match_number for m in response.context["ready_matches"]], [2, 3, 4])
+        self.assertEqual(response.context["busy_tables"], [2])
+
+        self.post_winner(1, "player1")
+        self.post_winner(2, "player1")
+        self.assertEqual((self.match(1).status, self.match(5).status), ("done", "ready"))
+
+    def test_changes_since_version(self):
+        url = reverse("TournamentChangesView", args=[self.tournament.id])
+        full = self.client.get(url).json()
+        self.assertTrue(full["full"])
+        self.assertEqual(len(full["matches"]), 8)
+
+        self.post_winner(1, "player1")
+        delta = self.client.get(url, {"since": full["version"]}).json()
+        self.assertFalse(delta["full"])
+        self.assertEqual([m["number"] for m in delta["matches"]], [1, 5])
+        self.assertEqual(delta["matches"][1]["player1"], "Player 0")
+
+        # 沒有新變動：只查一次賽事版本
+        with self.assertNumQueries(1):
+            idle = self.client.get(url, {"since": delta["version"]}).json()
+        self.assertEqual(idle, {"version": delta["version"], "full": False, "matches": []})
+
+    def test_snapshot_is_regenerated_only_when_tournament_changes(self):
+        url = reverse("TournamentSnapshotView", args=[self.tournament.id])
+        document = self.client.get(url).json()
+        players, matches = document["players"], document["matches"]
+        self.assertEqual(len(matches), 8)
+        first = matches[0]
+        self.assertEqual(players[first[3]][1], "Player 0")
+        self.assertEqual(matches[4][8], 0)  # 4 強第一場的來源 1 是第 1 場
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        self.post_winner(1, "player1")
+        semi = self.client.get(url).json()["matches"][4]
+        self.assertEqual(players[semi[3]][1], "Player 0")
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("referee", password="secret"))
+        self.tournament = Tournament.objects.create(
+            name="單敗", type="single_elim", semester="114-1", player_num=8
+        )
+        create_single_elimination_bracket(self.tournament, make_players(8))
+        self.setting = ScheduleSetting.objects.create(
+            tournament=self.tournament, table_count=2, minutes_per_inning=10, default_innings=3,
+            start_time=timezone.now() - timedelta(minutes=5),
+        )
+
+    def matches(self):
+        return {m.match_number: m for m in Match.objects.filter(stage__tournament=self.tournament)}
+
+    def test_schedule_respects_dependencies_and_tables(self):
+        apply_schedule(self.tournament, self.setting)
+        matches = self.matches()
+        duration = timedelta(minutes=30)
+        for match in matches.values():
+            self.assertIn(match.table, (1, 2))
+            for source in (match.source_match1, match.source_match2):
+                if source is not None:
+                    self.assertGreaterEqual(match.start_time, matches[source.match_number].start_time + duration)
+        self.assertEqual(matches[1].start_time, matches[2].start_time)
+        self.assertEqual(matches[3].start_time, matches[1].start_time + duration)
+
+    def test_result_reschedules_only_unstarted_matches(self):
+        apply_schedule(self.tournament, self.setting)
+        before = self.matches()
+        Match.objects.filter(id=before[2].id).update(status="in_progress")
+        self.client.post(reverse("MatchDetailView", args=[before[1].id]), {
+            "point1": "3", "point2": "1", "winner": "player1", "table": "", "start_time": "",
+        })
+        after = self.matches()
+        # 已開始的比賽不動；第 1 場提早結束，第 3 場可以馬上在空出來的桌子開打
+        self.assertEqual(after[2].start_time, before[2].start_time)
+        self.assertLess(after[3].start_time, before[3].start_time)
+        self.assertEqual(after[3].table, before[1].table)
+
+    def local(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def test_venue_window_in_local_time_with_db_datetimes(self):
+        today = timezone.localdate()
+        self.setting.table_count = 1
+        self.setting.open_time, self.setting.close_time = time(9), time(22)
+        self.setting.start_time = self.local(today, 9)
+        self.setting.save()
+        first = self.matches()[1]
+        Match.objects.filter(id=first.id).update(status="in_progress", table=1, start_time=self.local(today, 21, 20))
+        self.setting.refresh_from_db()  # 資料庫讀出的時間為 UTC
+
+        apply_schedule(self.tournament, self.setting, now=self.local(today, 21, 25))
+        duration = timedelta(minutes=30)
+        for match in self.matches().values():
+            if match.match_number == 1:
+                self.assertEqual(match.start_time, self.local(today, 21, 20))
+                continue
+            begin = timezone.localtime(match.start_time)
+            # 21:50 開始會打到 22:20，超過關門時間，移到隔天 09:00
+            self.assertGreaterEqual(begin, self.local(today + timedelta(days=1), 9))
+            self.assertGreaterEqual(begin.time(), time(9))
+            self.assertLessEqual((begin + duration).time(), time(22))
+
+    def test_overnight_venue_window(self):
+        today = timezone.localdate()
+        window = VenueWindow(time(18), time(2))
+        duration = timedelta(minutes=30)
+        self.assertEqual(window.fit(self.local(today, 23), duration), self.local(today, 23))
+        self.assertEqual(window.fit(self.local(today, 1), duration), self.local(today, 1))
+        self.assertEqual(window.fit(self.local(today, 1, 40), duration), self.local(today, 18))
+        self.assertEqual(window.fit(self.local(today, 12), duration), self.local(today, 18))
+        with self.assertRaises(ValueError):
+            VenueWindow(time(9), time(9))
+        with self.assertRaises(CommandError):
+            call_command("schedule_matches", self.tournament.id, open="09:00", close="09:00", stdout=io.StringIO())
+
+    def test_overdue_ready_match_is_rescheduled(self):
+        self.setting.auto_reschedule = False
+        self.setting.save()
+        apply_schedule(self.tournament, self.setting)
+        before = self.matches()
+        # 第 1、2 場打完但賽果晚了 40 分鐘才登錄；第 5 場原本排定的時間已過但還沒開始
+        now = before[5].start_time + timedelta(minutes=40)
+        apply_results(self.tournament, [
+            {"match": before[1].id, "winner": "player1"}, {"match": before[2].id, "winner": "player1"},
+        ])
+        apply_schedule(self.tournament, self.setting, now=now)
+        after = self.matches()
+        self.assertGreaterEqual(after[5].start_time, now)
+        for match in after.values():
+            if match.match_number != 5 and match.winner_id is None and match.table == after[5].table:
+                # 同一桌的其他比賽不會和第 5 場重疊
+                self.assertFalse(after[5].start_time <= match.start_time < after[5].start_time + timedelta(minutes=30))
+
+    def test_eta_follows_dependencies_and_updates_downstream(self):
+        self.setting.auto_reschedule = False
+        self.setting.save()
+        apply_schedule(self.tournament, self.setting)
+        matches = self.matches()
+        average = timedelta(seconds=self.tournament.avg_match_seconds)
+        # 第 3 場已排在第 1 場之後；4 強第一場要等第 1、2 場結束
+        self.assertGreaterEqual(matches[5].eta, max(matches[1].start_time, matches[2].start_time) + average)
+        self.assertGreaterEqual(matches[7].eta, matches[6].eta + average)
+
+        self.client.post(reverse("MatchDetailView", args=[matches[1].id]), {
+            "point1": "3", "point2": "1", "winner": "player1", "table": "", "start_time": "",
+        })
+        after = self.matches()
+        self.assertIsNotNone(after[1].finished_at)
+        # 另一個半區不受影響
+        self.assertEqual(after[6].eta, matches[6].eta)
+        self.assertContains(self.client.get(reverse("TournamentDetailView", args=[self.tournament.id])), 'class="eta"')
+
+    def test_eta_without_start_times_uses_free_tables(self):
+        average = timedelta(minutes=30)
+
+        def etas(tournament):
+            return {m.match_number: m.eta for m in Match.objects.filter(tournament=tournament)}
+
+        # 沒有排程設定：桌子足夠，第一輪都從現在開始，之後每輪往後一場的時間
+        unscheduled = Tournament.objects.create(name="單敗", type="single_elim", semester="114-1", player_num=8)
+        create_single_elimination_bracket(unscheduled, make_players(8))
+        eta = etas(unscheduled)
+        self.assertTrue(all(value is not None for value in eta.values()))
+        self.assertEqual({eta[n] for n in (1, 2, 3, 4)}, {eta[1]})
+        self.assertEqual(eta[5], eta[1] + average)
+        self.assertEqual(eta[7], eta[1] + 2 * average)
+
+        # 2 桌：第一輪分兩批；第 1 場開打後佔用一桌，其餘比賽排在剩下的桌子與它結束之後
+        tournament = Tournament.objects.create(name="單敗", type="single_elim", semester="114-1", player_num=8)
+        ScheduleSetting.objects.create(
+            tournament=tournament, table_count=2, start_time=timezone.now(), auto_reschedule=False,
+        )
+        create_single_elimination_bracket(tournament, make_players(8))
+        eta = etas(tournament)
+        self.assertEqual((eta[2], eta[3], eta[4]), (eta[1], eta[1] + average, eta[1] + average))
+        self.assertEqual(eta[7], eta[1] + 3 * average)
+
+        first = Match.objects.get(tournament=tournament, match_number=1)
+        apply_results(tournament, [{"match": first.id, "started": True, "start_time": first.eta - timedelta(minutes=20)}])
+        after = etas(tournament)
+        self.assertGreaterEqual(after[2], eta[1])  # 空桌從現在開始
+        self.assertEqual(after[3], first.eta + timedelta(minutes=10))  # 第 1 場預估結束時空出來的桌子
+        self.assertEqual(after[4], after[2] + average)
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.reset_stats()
+        self.client.force_login(User.objects.create_user("referee", password="secret"))
+        self.tournament = Tournament.objects.create(
+            name="單敗", type="single_elim", semester="114-1", player_num=8
+        )
+        create_single_elimination_bracket(self.tournament, make_players(8))
+        self.url = reverse("TournamentDetailView", args=[self.tournament.id])
+
+    def test_match_save_invalidates_only_its_stage_and_downstream(self):
+        self.client.get(self.url)
+        self.assertEqual(fragment_cache.get_stats()["misses"], 4)  # 8 強、4 強、決賽、季殿賽
+
+        self.client.get(self.url)
+        self.assertEqual(fragment_cache.get_stats()["hits"], 4)
+
+        match = Match.objects.get(stage__tournament=self.tournament, match_number=1)
+        self.client.post(reverse("MatchDetailView", args=[match.id]), {
+            "point1": "3", "point2": "1", "winner": "player1", "table": "", "start_time": "",
+        })
+        fragment_cache.reset_stats()
+        response = self.client.get(self.url)
+        # 第 1 場所在的 8 強 + 被推進的 4 強重新產生，其餘命中
+        self.assertEqual(fragment_cache.get_stats(), {"hits": 2, "misses": 2, "hit_ratio": 0.5})
+        self.assertContains(response, "Player 0", count=2)
+
+
+@override_settings(SCHEDULE_METRICS=True)
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.tournament = Tournament.objects.create(
+            name="單敗", type="single_elim", semester="114-1", player_num=8
+        )
+        create_single_elimination_bracket(self.tournament, make_players(8))
+
+    def test_per_view_metrics_for_staff_only(self):
+        client = Client()  # 新的 handler 才會載入 MetricsMiddleware
+        client.get(reverse("TournamentDetailView", args=[self.tournament.id]))
+        client.get(reverse("TournamentDetailView", args=[self.tournament.id]))
+
+        stats = metrics.collect()["TournamentDetailView"]
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.queries, 2)
+        self.assertGreater(stats.render_seconds, 0)
+        self.assertGreater(stats.response_bytes, 0)
+
+        self.assertEqual(client.get(reverse("MetricsView")).status_code, 302)
+        client.force_login(User.objects.create_user("admin", password="secret", is_staff=True))
+        body = client.get(reverse("MetricsView")).content.decode()
+        self.assertIn('schedule_request_duration_seconds_count{view="TournamentDetailView"} 2', body)
+        self.assertIn('schedule_request_duration_seconds_bucket{view="TournamentDetailView",le="+Inf"} 2', body)
+
+
+class ProfilerTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.tournament = Tournament.objects.create(
+            name="單敗", type="single_elim", semester="114-1", player_num=8
+        )
+        create_single_elimination_bracket(self.tournament, make_players(8))
+        self.url = reverse("TournamentDetailView", args=[self.tournament.id])
+
+    def test_staff_can_profile_a_request_and_download_it(self):
+        with self.settings(SCHEDULE_PROFILE_DIR=self.tmp.name):
+            client = Client()
+            client.force_login(User.objects.create_user("referee", password="secret"))
+            self.assertNotIn("X-Profile", client.get(self.url, {"profile": "1"}))
+
+            client.force_login(User.objects.create_user("admin", password="secret", is_staff=True))
+            name = client.get(self.url, {"profile": "1"})["X-Profile"]
+            self.assertTrue(name.endswith("-TournamentDetailView"))
+            self.assertEqual(len(os.listdir(self.tmp.name)), 3)
+
+            listing = client.get(reverse("ProfileListView"))
+            self.assertEqual([p["name"] for p in listing.context["profiles"]], [name])
+            response = client.get(reverse("ProfileDownloadView", args=[name, "sql"]))
+            document = json.loads(b"".join(response.streaming_content))
+            self.assertEqual(document["query_count"], len(document["queries"]))
+            self.assertGreater(document["query_count"], 0)
+            self.assertEqual(client.get(reverse("ProfileDownloadView", args=["..", "sql"])).status_code, 404)
+
+
+class SqlStatsTests(TestCase):
+
+    def setUp(self):
+        sqlstats.reset()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_queries_differing_only_in_parameters_share_a_fingerprint(self):
+        tournament = Tournament.objects.create(name="單敗", type="single_elim", semester="114-1", player_num=8)
+        create_single_elimination_bracket(tournament, make_players(8))
+        stages = list(tournament.stages.all())
+        with CaptureQueriesContext(connection) as queries:
+            for stage in stages:
+                list(stage.matches.all())
+            list(Match.objects.filter(id__in=[1, 2]))
+            list(Match.objects.filter(id__in=[3, 4, 5]))
+        fingerprints = [sqlstats.fingerprint(q["sql"])[0] for q in queries]
+        self.assertEqual(len(set(fingerprints[:len(stages)])), 1)
+        self.assertEqual(fingerprints[-1], fingerprints[-2])
+
+        with self.settings(SCHEDULE_SQL_STATS_DIR=self.tmp.name, SCHEDULE_SLOW_SQL_MS=100):
+            with self.assertLogs("schedule.sql", "WARNING") as logs:
+                for q in queries:
+                    sqlstats.record(q["sql"], 0.15)
+            self.assertEqual(len(logs.records), len(queries))
+            sqlstats.flush(force=True)
+            out = io.StringIO()
+            call_command("top_sql", sort="count", limit=1, stdout=out)
+        self.assertIn(f"count={len(stages)} ", out.getvalue())
+        self.assertIn("test_queries_differing_only_in_parameters_share_a_fingerprint", out.getvalue())
+
+    def test_reset_clears_stats_files_and_live_counters(self):
+        other = os.path.join(self.tmp.name, "notes.txt")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write("keep")
+        with self.settings(SCHEDULE_SQL_STATS_DIR=self.tmp.name):
+            sqlstats.record("SELECT 1", 0.01)
+            sqlstats.flush(force=True)
+            out = io.StringIO()
+            call_command("top_sql", reset=True, stdout=out)
+            self.assertEqual(sqlstats.load_all(), {})
+
+            # 執行中的 process 下次寫檔時丟掉清除前的累計，之後的查詢照常統計
+            sqlstats.flush(force=True)
+            self.assertEqual(sqlstats.load_all(), {})
+            sqlstats.record("SELECT 2", 0.01)
+            sqlstats.flush(force=True)
+            self.assertEqual([s["count"] for s in sqlstats.load_all().values()], [1])
+        self.assertIn("已清除 1 個統計檔案", out.getvalue())
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            sorted(["notes.txt", sqlstats.RESET_MARKER, f"{socket.gethostname()}-{os.getpid()}.json"]),
+        )
+
+
+class LoadTestTests(TransactionTestCase):
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def test_spectators_and_referees_run_and_clean_up(self):
+        result = LoadTest(spectators=2, referees=1, duration=0.5, players=8).run()
+        self.assertGreater(result["spectators"]["requests"], 0)
+        self.assertGreater(result["referees"]["requests"], 0)
+        # 測試資料庫為 SQLite 時可能有鎖定，但除此之外不應有錯誤
+        for role in ("spectators", "referees"):
+            self.assertEqual(result[role]["error_rate"], result[role]["locked_rate"])
+        self.assertEqual(result["total"]["requests"],
+                         result["spectators"]["requests"] + result["referees"]["requests"])
+        self.assertFalse(Tournament.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_locks_are_reported_by_header_not_by_error_page(self):
+        def view(error):
+            def get_response(request):
+                raise error
+            return DatabaseLockedMiddleware(convert_exception_to_response(get_response))
+
+        request = RequestFactory().get("/")
+        with self.assertLogs("django.request", "ERROR"):
+            locked = view(OperationalError("database is locked"))(request)
+            other = view(OperationalError("no such table: x"))(RequestFactory().get("/"))
+        self.assertEqual((locked.status_code, locked[LOCKED_HEADER]), (500, "1"))
+        self.assertEqual(other.status_code, 500)
+        self.assertFalse(other.has_header(LOCKED_HEADER))
+
+        stats = RoleStats()
+        stats.add(0.1, 500, locked=True)
+        stats.add(0.1, 500)
+        stats.add(0.1, 404)
+        stats.add(0.1, 200)
+        summary = stats.summary(1)
+        self.assertEqual((summary["error_rate"], summary["server_error_rate"], summary["locked_rate"]),
+                         (0.75, 0.5, 0.25))
+
+
+class LiveBrokerTests(TestCase):
+
+    def setUp(self):
+        self.tournament = Tournament.objects.create(name="單敗", type="single_elim", semester="114-1", player_num=8)
+        create_single_elimination_bracket(self.tournament, make_players(8))
+        self.matches = {m.match_number: m for m in Match.objects.filter(tournament=self.tournament)}
+
+    def play(self, number):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_results(self.tournament, [
+                {"match": self.matches[number].id, "point1": "3", "point2": "1", "winner": "player1"}
+            ])
+
+    def test_event_ids_are_the_match_change_versions(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return live.broker.subscribe(self.tournament.id)
+
+        queue = loop.run_until_complete(subscribe())
+        self.addCleanup(live.broker.unsubscribe, self.tournament.id, queue)
+        ids = []
+        for number in (1, 2):
+            self.play(number)
+            event_id, event, data = loop.run_until_complete(queue.get())
+            self.assertEqual(event, "match")
+            changed = set(MatchChange.objects.filter(version=event_id).values_list('match_id', flat=True))
+            self.assertEqual({m["match"] for m in data["matches"]}, changed)
+            ids.append(event_id)
+        self.assertLess(ids[0], ids[1])
+
+    def test_reconnect_replays_missed_changes_from_match_changes(self):
+        start = Tournament.objects.get(id=self.tournament.id).version
+        self.play(1)
+        first = Tournament.objects.get(id=self.tournament.id).version
+        # 修改賽事欄位：版本跳號但沒有比賽變動
+        self.tournament.refresh_from_db()
+        self.tournament.name = "改名"
+        self.tournament.save()
+        self.play(2)
+        latest = Tournament.objects.get(id=self.tournament.id).version
+        second = MatchChange.objects.filter(tournament=self.tournament).latest('version').version
+        self.assertGreater(second, first + 1)
+
+        [(event_id, event, data)] = live.missed_events(self.tournament.id, start)
+        self.assertEqual((event_id, event), (second, "match"))
+        replayed = {m["match"] for m in data["matches"]}
+        self.assertTrue({self.matches[1].id, self.matches[2].id, self.matches[5].id} <= replayed)
+
+        [(event_id, _, data)] = live.missed_events(self.tournament.id, first)
+        self.assertNotIn(self.matches[1].id, {m["match"] for m in data["matches"]})
+        self.assertEqual(live.missed_events(self.tournament.id, latest), [])
+        self.assertEqual(live.missed_events(self.tournament.id, latest + 5), [(latest, "reset", {})])
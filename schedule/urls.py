@@ -21,14 +21,24 @@ urlpatterns = [
     path('Login', views.LoginView.as_view(), name='Login'),
     path('Logout', views.LogoutView.as_view(), name='Logout'),
     path('MatchDetailView/<int:pk>', views.MatchDetailView.as_view(), name='MatchDetailView'),
+    path('MatchBatchResultView/<int:pk>', views.MatchBatchResultView.as_view(), name='MatchBatchResultView'),
+    path('RefereeDashboardView/<int:pk>', views.RefereeDashboardView.as_view(), name='RefereeDashboardView'),
     path('AnnouncementCreateView', views.AnnouncementCreateView.as_view(), name='AnnouncementCreateView'),
     path('AnnouncementUpdateView/<int:pk>', views.AnnouncementUpdateView.as_view(), name='AnnouncementUpdateView'),
     path("AnnouncementsDeleteView/<int:pk>", views.AnnouncementDeleteView.as_view(), name="AnnouncementDeleteView"),
     path('AnnouncementListView', views.AnnouncementListView.as_view(), name='AnnouncementListView'),
     path('AnnouncementDetailView/<int:pk>', views.AnnouncementDetailView.as_view(), name='AnnouncementDetailView'),
     path('TournamentDetailView/<int:pk>', views.TournamentDetailView.as_view(), name='TournamentDetailView'),
+    path('TournamentChangesView/<int:pk>', views.TournamentChangesView.as_view(), name='TournamentChangesView'),
+    path('TournamentSnapshotView/<int:pk>', views.TournamentSnapshotView.as_view(), name='TournamentSnapshotView'),
+    path('TournamentEventsView/<int:pk>', views.TournamentEventsView.as_view(), name='TournamentEventsView'),
     path('TournamentCreateView', views.TournamentCreateView.as_view(), name='TournamentCreateView'),
     path('TournamentListView', views.TournamentListView.as_view(), name='TournamentListView'),
-    path('TournamentDeleteView/<int:pk>', views.TournamentDeleteView.as_view(), name='TournamentDeleteView')
+    path('TournamentDeleteView/<int:pk>', views.TournamentDeleteView.as_view(), name='TournamentDeleteView'),
+    path('JobStatusView/<int:pk>', views.JobStatusView.as_view(), name='JobStatusView'),
+    path('FragmentCacheStatsView', views.FragmentCacheStatsView.as_view(), name='FragmentCacheStatsView'),
+    path('metrics', views.MetricsView.as_view(), name='MetricsView'),
+    path('ProfileListView', views.ProfileListView.as_view(), name='ProfileListView'),
+    path('ProfileDownloadView/<str:name>/<str:kind>', views.ProfileDownloadView.as_view(), name='ProfileDownloadView'),
     
 ]
@@ -1,88 +1,219 @@
 import math
 import random
 from collections import defaultdict
-from .models import Tournament, Stage, Match, Player
-from django.db import transaction
+from datetime import timedelta
+from itertools import zip_longest
+from .models import Tournament, Stage, Match, MatchChange, Player
+from .scheduler import VenueWindow, list_schedule
+from .eta import project_etas
+from .bracket import (
+    BracketGraph, IN_PROGRESS, WINNER, LOSER, build_single_elimination, build_double_elimination,
+    build_round_robin, combine_stages, round_robin_standings, standing_order,
+)
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Trim, Upper
+from django.utils import timezone
+
+
+def bulk_create_with_ids(model, objs, batch_size=None):
+    """
+    bulk_create 並確保每個物件都取得主鍵。
+
+    Django 3.2 在 SQLite 上的 bulk_create 不會回傳主鍵，因此在同一個交易中
+    依 id 倒序取回剛寫入的 N 筆。第一批 INSERT 之後寫入鎖會一直持有到交易結束，
+    所以取回的一定是這次寫入的資料，順序也與 objs 相同。
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return objs
+
+    if not connection.in_atomic_block:
+        raise RuntimeError("bulk_create_with_ids 必須在 transaction.atomic 中呼叫")
+
+    ids = list(model.objects.order_by('-id').values_list('id', flat=True)[:len(objs)])
+    ids.reverse()
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+    return objs
+
+
+def touch_tournaments(tournaments):
+    """賽事的比賽、階段或選手有變動時呼叫：版本 +1 並更新 updated_at（tournaments 為 QuerySet）"""
+    tournaments.update(version=F('version') + 1, updated_at=timezone.now())
+
 
+def touch_tournament(tournament_id):
+    touch_tournaments(Tournament.objects.filter(id=tournament_id))
 
+
+def touch_stages(stages):
+    """階段內比賽的顯示內容有變動時呼叫：版本 +1，讓該階段的頁面片段快取失效（stages 為 QuerySet）"""
+    stages.update(version=F('version') + 1)
+
+
+def record_match_changes(tournament_id, match_ids):
+    """
+    比賽內容變動並 touch 賽事之後（同一個交易中）呼叫：以賽事目前的版本寫入變動紀錄，回傳該版本。
+    touch 時已鎖住賽事這一列，並行的交易各自拿到不同的版本。
+    """
+    if not match_ids:
+        return None
+    version = Tournament.objects.filter(id=tournament_id).values_list('version', flat=True).get()
+    MatchChange.objects.bulk_create([
+        MatchChange(tournament_id=tournament_id, match_id=match_id, version=version) for match_id in match_ids
+    ])
+    return version
+
+
+def serialize_matches(matches):
+    """比賽的精簡 JSON 表示（即時推播與增量同步 API 共用），matches 為 QuerySet"""
+    rows = matches.order_by('id').values_list(
+        'id', 'stage_id', 'match_number', 'player1__name', 'player2__name', 'point1', 'point2',
+        'winner__name', 'table', 'start_time', 'eta',
+    )
+    return [
+        {
+            "match": pk, "stage": stage_id, "number": number, "player1": p1, "player2": p2,
+            "point1": point1, "point2": point2, "winner": winner,
+            "table": table, "start_time": start_time.isoformat() if start_time else None,
+            "eta": eta.isoformat() if eta else None,
+        }
+        for pk, stage_id, number, p1, p2, point1, point2, winner, table, start_time, eta in rows
+    ]
+
+
+def load_bracket_graph(tournament):
+    """以兩個查詢把整個賽事讀成 BracketGraph（node.pk / stage.pk 對應資料庫 id）"""
+    graph = BracketGraph()
+    stage_index = {}
+    for pk, name, order in tournament.stages.order_by('order', 'id').values_list('id', 'name', 'order'):
+        stage_index[pk] = graph.add_stage(name, order, pk=pk)
+
+    rows = Match.objects.filter(tournament=tournament).order_by('id').values_list(
+        'id', 'stage_id', 'match_number', 'player1_id', 'player2_id', 'winner_id', 'loser_id',
+        'point1', 'point2', 'source_match1_id', 'source_match2_id', 'source_match1_loser', 'source_match2_loser',
+        'round_number', 'is_losers_bracket', 'player1_bye', 'player2_bye', 'status',
+    )
+    match_index = {}
+    links = []
+    for (pk, stage_id, match_number, p1, p2, winner, loser, point1, point2,
+         source1, source2, source1_loser, source2_loser, round_number, is_losers_bracket, bye1, bye2, status) in rows:
+        match_id = graph.add_match(stage_index[stage_id], match_number, p1, p2,
+                                   round_number=round_number, is_losers_bracket=is_losers_bracket, pk=pk)
+        node = graph.matches[match_id]
+        node.winner, node.loser = winner, loser
+        node.bye1, node.bye2 = bye1, bye2
+        node.status = status
+        node.point1, node.point2 = point1, point2
+        match_index[pk] = match_id
+        links.append((source1, match_id, 1, LOSER if source1_loser else WINNER))
+        links.append((source2, match_id, 2, LOSER if source2_loser else WINNER))
+
+    for source, match_id, slot, outcome in links:
+        if source in match_index:
+            graph.link(match_index[source], match_id, slot, outcome)
+    return graph
+
+
+def _match_from_node(tournament, graph, node):
+    source1 = graph.matches[node.source1].pk if node.source1 is not None else None
+    source2 = graph.matches[node.source2].pk if node.source2 is not None else None
+    return Match(
+        stage_id=graph.stages[node.stage].pk,
+        tournament_id=tournament.pk,
+        match_number=node.match_number,
+        player1_id=node.player1,
+        player2_id=node.player2,
+        winner_id=node.winner,
+        loser_id=node.loser,
+        point1=node.point1,
+        point2=node.point2,
+        source_match1_id=source1,
+        source_match2_id=source2,
+        source_match1_loser=node.source1 is not None and node.outcome1 == LOSER,
+        source_match2_loser=node.source2 is not None and node.outcome2 == LOSER,
+        round_number=node.round_number,
+        is_losers_bracket=node.is_losers_bracket,
+        player1_bye=node.bye1,
+        player2_bye=node.bye2,
+        status=node.update_status(),
+    )
+
+
+@transaction.atomic
+def save_bracket_graph(tournament, graph):
+    """
+    把圖中還沒有 pk 的階段與比賽寫入資料庫。
+    比賽依層數逐層 bulk_create：上一層寫入後就有 id，下一層可以直接帶入 source_match。
+    """
+    new_stages = [stage for stage in graph.stages if stage.pk is None]
+    stage_objs = bulk_create_with_ids(Stage, [
+        Stage(tournament=tournament, name=stage.name, order=stage.order) for stage in new_stages
+    ])
+    for stage, obj in zip(new_stages, stage_objs):
+        stage.pk = obj.pk
+
+    layers = defaultdict(list)
+    for match_id, depth in enumerate(graph.depths()):
+        if graph.matches[match_id].pk is None:
+            layers[depth].append(graph.matches[match_id])
+
+    for depth in sorted(layers):
+        objs = bulk_create_with_ids(Match, [_match_from_node(tournament, graph, node) for node in layers[depth]])
+        for node, obj in zip(layers[depth], objs):
+            node.pk = obj.pk
+
+    new_matches = [node for depth in sorted(layers) for node in layers[depth]]
+    project_etas(tournament, graph, [node.id for node in new_matches])
+    touch_tournament(tournament.pk)
+    record_match_changes(tournament.pk, [node.pk for node in new_matches])
+    return graph
+
+
+def update_bracket_matches(graph, match_ids):
+    """把圖中指定比賽的選手、賽果與狀態以一次 bulk_update 寫回"""
+    objs = []
+    for match_id in match_ids:
+        node = graph.matches[match_id]
+        objs.append(Match(
+            pk=node.pk,
+            player1_id=node.player1,
+            player2_id=node.player2,
+            winner_id=node.winner,
+            loser_id=node.loser,
+            point1=node.point1,
+            point2=node.point2,
+            status=node.update_status(),
+        ))
+    if objs:
+        Match.objects.bulk_update(objs, ['player1', 'player2', 'winner', 'loser', 'point1', 'point2', 'status'])
+    return objs
+
+
+def _player_keys(players):
+    return [p.pk if p is not None else None for p in players]
+
+
+@transaction.atomic
 def create_single_elimination_bracket(tournament: Tournament, players: list[Player], start_match_number=1):
-    
-    next_power_of_two = 2 ** math.ceil(math.log2(len(players)))
-
-    stages = []
-    total_rounds = int(math.log2(next_power_of_two))
-
-    # 🏷 命名每個階段
-    for i in range(total_rounds):
-        remaining_players = next_power_of_two // (2 ** i)
-        if remaining_players == 2:
-            name = "Final"
-        elif remaining_players == 4:
-            name = "Semi-final"
-        elif remaining_players == 8:
-            name = 'Quarter-final'
-        else:
-            name = f"Last {remaining_players}"
-        stage = Stage.objects.create(tournament=tournament, name=name, order=i + 1)
-        stages.append(stage)
-
-    match_counter = start_match_number
-    players_queue = players
-    matches_current_round = []
-
-    # 🎯 第一輪
-    for i in range(0, len(players_queue), 2):
-        p1 = players_queue[i]
-        p2 = players_queue[i + 1]
-        match = Match.objects.create(
-            stage=stages[0],
-            player1=p1,
-            player2=p2,
-            match_number=match_counter
-        )
-        match.save()
-        match_counter += 1
-        matches_current_round.append(match)
-    
-    # 🔁 後續回合
-    semifinal_matches = []  # 存下四強賽以建立季殿賽
-    for round_index in range(1, total_rounds):
-        matches_next_round = []
-        num_matches = len(matches_current_round) // 2
-
-        for i in range(num_matches):
-            match = Match.objects.create(
-                stage=stages[round_index],
-                match_number=match_counter
-            )
-            match.source_match1 = matches_current_round[2 * i]
-            match.source_match2 = matches_current_round[2 * i + 1]
-            match.save()
-            matches_next_round.append(match)
-            match_counter += 1
-
-        # 🔹 記錄四強賽 (Semi-final) 的比賽
-        if stages[round_index].name == "Final" and len(matches_current_round) == 2:
-            semifinal_matches = matches_current_round
-
-        matches_current_round = matches_next_round
-
-    # 🥉 建立季殿賽（由四強賽輸家對決）
-    if semifinal_matches:
-        tie_breaker_stage = Stage.objects.create(
-            tournament=tournament,
-            name="Tie Breaker",
-            order=total_rounds + 1
-        )
-        tie_breaker = Match.objects.create(
-            stage=tie_breaker_stage,
-            match_number=match_counter,
-            source_match1=semifinal_matches[0],
-            source_match2=semifinal_matches[1],
-        )
+    """
+    建立單敗籤表。
 
+    整個籤表先在記憶體中以 BracketGraph 規劃，再以每輪一次 bulk_create 寫入。
+    全部包在同一個交易中，失敗時不會留下只建一半的籤表。
+    """
+    graph = BracketGraph()
+    build_single_elimination(graph, _player_keys(players), start_match_number)
+    graph.resolve_byes()
+    save_bracket_graph(tournament, graph)
     return tournament
 
+@transaction.atomic
 def create_double_elimination_bracket(tournament: Tournament, players: list[Player]):
     """
     建立四組，每組包含：
@@ -92,110 +223,10 @@ def create_double_elimination_bracket(tournament: Tournament, players: list[Play
     - 敗部第二輪 (Losers Round 2)
     每組會產生兩位晉級者（勝部冠軍 + 敗部冠軍）
     """
-
-    group_size = math.ceil(len(players) / 4)
-    groups = [players[i:i + group_size] for i in range(0, len(players), group_size)]
-    group_names = ["A", "B", "C", "D"]
-    match_counter = 1
-
-    # advancing_players_win = []
-    # advancing_players_lose = []
-    for g_idx, group_players in enumerate(groups):
-        group_label = group_names[g_idx] if g_idx < len(group_names) else f"Group {g_idx+1}"
-
-        # === 建立 Stages ===
-        stages = {
-            "initial": Stage.objects.create(
-                tournament=tournament,
-                name=f"Group {group_label} Initial Round",
-                order=g_idx * 10 + 1
-            ),
-            "losers_r1": Stage.objects.create(
-                tournament=tournament,
-                name=f"Group {group_label} Losers Round 1",
-                order=g_idx * 10 + 2
-            ),
-            "winners_qualification": Stage.objects.create(
-                tournament=tournament,
-                name=f"Group {group_label} Winners' Qualification",
-                order=g_idx * 10 + 3
-            ),
-            "losers_qualification": Stage.objects.create(
-                tournament=tournament,
-                name=f"Group {group_label} Losers' Qualification",
-                order=g_idx * 10 + 4
-            ),
-        }
-
-        # === 第一輪 (Initial Round) ===
-        initial_matches = []
-        for i in range(0, len(group_players), 2):
-            p1 = group_players[i]
-            p2 = group_players[i + 1] if i + 1 < len(group_players) else None
-            match = Match.objects.create(
-                stage=stages["initial"],
-                player1=p1,
-                player2=p2,
-                match_number=match_counter
-            )
-            match_counter += 1
-            initial_matches.append(match)
-
-        # === 敗部第一輪 (Losers Round 1) ===
-        losers_r1_matches = []
-        for i in range(0, len(initial_matches), 2):
-            match = Match.objects.create(
-                stage=stages["losers_r1"],
-                source_match1=initial_matches[i],
-                source_match2=initial_matches[i + 1] if i + 1 < len(initial_matches) else None,
-                is_losers_bracket=True,
-                match_number=match_counter
-            )
-            match_counter += 1
-            losers_r1_matches.append(match)
-
-        # === 勝部晉級賽 (Winners' Qulification) ===
-        winners_qualification_matches = []
-        for i in range(0, len(initial_matches), 2):
-            match = Match.objects.create(
-                stage=stages["winners_qualification"],
-                source_match1=initial_matches[i],
-                source_match2=initial_matches[i + 1] if i + 1 < len(initial_matches) else None,
-                match_number=match_counter
-            )
-            match_counter += 1
-            winners_qualification_matches.append(match)
-
-        # === 敗部晉級賽 (Losers' Qulification) ===
-        losers_qualification_matches = []
-        # 將勝部晉級賽逆序排列（交叉配對）
-        reversed_winners = list(reversed(winners_qualification_matches))
-
-        for i in range(len(losers_r1_matches)):
-            match = Match.objects.create(
-                stage=stages["losers_qualification"],
-                source_match1=losers_r1_matches[i],                       # 敗部第一輪的勝者
-                source_match2=reversed_winners[i] if i < len(reversed_winners) else None,  # 勝部晉級賽的輸者
-                is_losers_bracket=True,
-                match_number=match_counter
-            )
-            match_counter += 1
-            losers_qualification_matches.append(match)
-
-        # advancing_players_win += [m.winner for m in winners_qualification_matches]  # 對應勝部第一輪勝者
-        # advancing_players_lose += [m.winner for m in losers_qualification_matches]   # 對應敗部第二輪勝者
-
-    # random.shuffle(advancing_players_win)
-    # random.shuffle(advancing_players_lose)
-
-    # advancing_players = []
-    # for w_p, l_p in zip(advancing_players_win, advancing_players_lose):
-    #     advancing_players.append(w_p)
-    #     advancing_players.append(l_p)
-
-    # if advancing_players:
-    #     create_single_elimination_bracket(tournament, advancing_players, start_match_number=match_counter)
-
+    graph = BracketGraph()
+    build_double_elimination(graph, _player_keys(players))
+    graph.resolve_byes()
+    save_bracket_graph(tournament, graph)
     return tournament
 
 def advance_from_double_elim_and_create_single_elim(tournament):
@@ -215,9 +246,9 @@ def advance_from_double_elim_and_create_single_elim(tournament):
     random.shuffle(advance_losers)
 
     advance_players = []
-    for w, l in zip(advance_winners, advance_losers):
-        advance_players.append(w)
-        advance_players.append(l)
+    for w, l in zip_longest(advance_winners, advance_losers):
+        # 整組輪空時該組沒有晉級者
+        advance_players += [p for p in (w, l) if p is not None]
 
     create_single_elimination_bracket(tournament=tournament, players=advance_players)
     return tournament
@@ -248,41 +279,17 @@ def create_mixed_bracket(
         5. 暫存晉級名單（目前先不生成單敗部分）
     """
 
-    total_needed = num_groups * group_size
-    if len(players) < total_needed:
-        raise ValueError(f"需要至少 {total_needed} 名玩家（目前只有 {len(players)}）")
+    # 人數不足 num_groups * group_size 時各組平均分配，不建立空籤選手
+    player_count = sum(p is not None for p in players)
+    if player_count < num_groups * 2:
+        raise ValueError(f"每組至少需要 2 名玩家（目前只有 {player_count} 名，分 {num_groups} 組）")
 
     if advance_per_group > group_size:
         raise ValueError("每組晉級人數不能大於該組人數")
 
-    groups = []
-    for i in range(num_groups):
-        start = i * group_size
-        end = start + group_size
-        groups.append(players[start:end])
-
-    advanced_players = []
-
-    match_counter = 1
-
-    # 為每組建立循環賽
-    for group_index, group_players in enumerate(groups, start=1):
-        stage = Stage.objects.create(
-            tournament=tournament,
-            name=f"Group {group_index} Round Robin",
-            order=group_index,
-        )
-
-        # 建立所有對戰（循環）
-        for i in range(len(group_players)):
-            for j in range(i + 1, len(group_players)):
-                Match.objects.create(
-                    stage=stage,
-                    player1=group_players[i],
-                    player2=group_players[j],
-                    match_number = match_counter
-                )
-                match_counter += 1
+    graph = BracketGraph()
+    build_round_robin(graph, _player_keys(players), num_groups, group_size)
+    save_bracket_graph(tournament, graph)
 
     return tournament
 
@@ -378,9 +385,95 @@ def advance_from_round_robin_and_create_single_elim(tournament):
     create_single_elimination_bracket(tournament, advanced_players)
     return tournament
 
-def get_round_robin_standings(tournament):
+SQL_STANDINGS_MIN_GROUP_SIZE = 16  # 每組超過此人數時改用 SQL 彙總
+
+
+def _standing_side_queryset(tournament, me, other):
+    """
+    以 me (1/2) 位置選手的角度彙總每組每位選手的勝場、得局、失局。
+    W = 該選手局數、FF = 0，比分不完整的比賽貢獻 0 但仍列出選手。
+    """
+    complete = (
+        Q(player1__isnull=False, player2__isnull=False)
+        & ~Q(point1='') & ~Q(point2='')
+    )
+
+    def point_expr(n):
+        return Case(
+            When(complete & Q(**{f"code{n}": 'W'}), then=F(f"player{n}__innings")),
+            When(complete & Q(**{f"code{n}": 'FF'}), then=Value(0)),
+            When(complete, then=Cast(f"point{n}", IntegerField())),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    return (
+        Match.objects
+        .filter(tournament=tournament, stage__name__icontains="group", **{f"player{me}__isnull": False})
+        .annotate(code1=Upper(Trim('point1')), code2=Upper(Trim('point2')))
+        .annotate(mine=point_expr(me), theirs=point_expr(other))
+        .values(
+            group_order=F('stage__order'),
+            group_id=F('stage_id'),
+            group=F('stage__name'),
+            player_id=F(f"player{me}"),
+            player_name=F(f"player{me}__name"),
+            player_innings=F(f"player{me}__innings"),
+            player_user=F(f"player{me}__user"),
+        )
+        .annotate(
+            wins=Sum(Case(When(mine__gt=F('theirs'), then=Value(1)), default=Value(0), output_field=IntegerField())),
+            games_for=Sum('mine'),
+            games_against=Sum('theirs'),
+        )
+    )
+
+
+def get_round_robin_standings_sql(tournament, per_stage=False):
+    """
+    以單一彙總查詢計算循環賽積分表（兩個位置各自 GROUP BY 後 UNION ALL），
+    比序在 Python 中對小結果集排序。回傳格式同 get_round_robin_standings()。
+    """
+    rows = _standing_side_queryset(tournament, 1, 2).union(
+        _standing_side_queryset(tournament, 2, 1), all=True
+    )
+
+    records = {}
+    for row in rows:
+        key = (row["group_order"], row["group_id"], row["player_id"])
+        record = records.get(key)
+        if record is None:
+            record = records[key] = {
+                "group": row["group"],
+                "player": Player(id=row["player_id"], name=row["player_name"],
+                                 innings=row["player_innings"], user_id=row["player_user"]),
+                "wins": 0,
+                "games_for": 0,
+                "games_against": 0,
+            }
+        record["wins"] += row["wins"]
+        record["games_for"] += row["games_for"]
+        record["games_against"] += row["games_against"]
+
+    group_standings = {}
+    for key in sorted(records, key=lambda k: k[:2]):
+        record = records[key]
+        gf, ga = record["games_for"], record["games_against"]
+        group_standings.setdefault(record.pop("group"), []).append(dict(record, ratio=round(gf / (gf + ga), 3) if (gf + ga) > 0 else 0))
+
+    if not per_stage:
+        return combine_stages(group_standings, lambda player: player.pk)
+    for player_list in group_standings.values():
+        player_list.sort(key=standing_order, reverse=True)
+    return group_standings
+
+
+def get_round_robin_standings(tournament, backend=None, per_stage=False):
     """
     即時計算循環賽各組積分表。
+    backend: "python"（在 BracketGraph 上計算）或 "sql"（單一彙總查詢），
+             未指定時每組超過 SQL_STANDINGS_MIN_GROUP_SIZE 人改用 sql。
+    per_stage: 見 bracket.round_robin_standings()；預設每位選手為所有 Group 階段的合計。
     回傳格式：
     {
         "Group A": [
@@ -390,72 +483,112 @@ def get_round_robin_standings(tournament):
         ...
     }
     """
-    group_stages = tournament.stages.filter(name__icontains="Group").order_by("order")
-    records = defaultdict(lambda: {"wins": 0, "games_for": 0, "games_against": 0})
-    group_standings = defaultdict(list)
+    if backend is None:
+        backend = "sql" if (tournament.group_size or 0) > SQL_STANDINGS_MIN_GROUP_SIZE else "python"
+    if backend == "sql":
+        return get_round_robin_standings_sql(tournament, per_stage)
+
+    graph = load_bracket_graph(tournament)
+    group_stages = [stage for stage in graph.stages if "group" in stage.name.lower()]
+    group_ids = {stage.id for stage in group_stages}
+
+    player_ids = {
+        p for node in graph.matches if node.stage in group_ids
+        for p in (node.player1, node.player2) if p is not None
+    }
+    players = Player.objects.in_bulk(player_ids)
+    w_points = {pk: player.innings for pk, player in players.items()}
+    standings = round_robin_standings(graph, [stage.id for stage in group_stages], w_points, per_stage)
 
-    # === 統計數據 ===
-    for stage in group_stages:
-        matches = stage.matches.all()
-        for match in matches:
-            p1, p2 = match.player1, match.player2
-            if not p1 or not p2:
-                continue
-
-            point1, point2 = match.point1, match.point2
-            if point1 == '' or point2 == '':
-                continue
-            if point1 != 'W' and point1 != 'FF':
-                point1 = int(point1)
-            if point2 != 'W' and point2 != 'FF':
-                point2 = int(point2)
-
-            def convert_point(point, player):
-                if isinstance(point, (int, float)):
-                    return point
-                if isinstance(point, str):
-                    if point.upper() == "W":
-                        return getattr(player, "inning", 1)
-                    elif point.upper() == "FF":
-                        return 0
-                return 0
-
-            p1_point = convert_point(point1, p1)
-            p2_point = convert_point(point2, p2)
-
-            records[p1]["games_for"] += p1_point
-            records[p1]["games_against"] += p2_point
-            records[p2]["games_for"] += p2_point
-            records[p2]["games_against"] += p1_point
-
-            if p1_point > p2_point:
-                records[p1]["wins"] += 1
-            elif p2_point > p1_point:
-                records[p2]["wins"] += 1
-
-    # === 各組排名 ===
+    group_standings = {}
     for stage in group_stages:
-        group_players = set()
-        for match in stage.matches.all():
-            if match.player1:
-                group_players.add(match.player1)
-            if match.player2:
-                group_players.add(match.player2)
-
-        player_list = []
-        for p in group_players:
-            rec = records[p]
-            gf, ga = rec["games_for"], rec["games_against"]
-            ratio = gf / (gf + ga) if (gf + ga) > 0 else 0
-            player_list.append({
-                "player": p,
-                "wins": rec["wins"],
-                "games_for": gf,
-                "games_against": ga,
-                "ratio": round(ratio, 3),
-            })
-
-        player_list.sort(key=lambda x: (x["wins"], x["games_for"], -x["games_against"], x["ratio"]), reverse=True)
-        group_standings[stage.name] = player_list
-
-    return group_standings
\ No newline at end of file
+        for row in standings[stage.id]:
+            row["player"] = players[row["player"]]
+        group_standings[stage.name] = standings[stage.id]
+
+    return group_standings
+
+
+# === 自動排程 ===
+MAX_SCHEDULE_INNINGS = 15  # 估算時間時局數的上限（舊資料的空籤選手局數為 999）
+
+
+def match_durations(graph, setting):
+    """依兩位選手中較多的局數估算每場比賽的時間；輪空比賽為 0"""
+    player_ids = {p for node in graph.matches for p in (node.player1, node.player2) if p is not None}
+    innings = dict(Player.objects.filter(id__in=player_ids).values_list('id', 'innings'))
+    durations = {}
+    for node in graph.matches:
+        if node.is_bye():
+            durations[node.id] = timedelta(0)
+            continue
+        known = [innings[p] for p in (node.player1, node.player2) if p in innings]
+        count = min(max(known + [setting.default_innings]), MAX_SCHEDULE_INNINGS)
+        durations[node.id] = timedelta(minutes=setting.minutes_per_inning * count)
+    return durations
+
+
+def schedule_tournament(tournament, setting, now=None, graph=None):
+    """
+    依 ScheduleSetting 排定尚未開始的比賽的桌次與開賽時間，回傳有變動的比賽 pk。
+
+    已結束與進行中（Match.status 為 in_progress）的比賽保持不變，其餘比賽從 now
+    （或設定的開始時間，取較晚者）開始重新排，只寫回桌次或時間有變動的比賽。
+    賽果提早或延後時以目前時間再呼叫一次即可。
+    """
+    graph = graph or load_bracket_graph(tournament)
+    now = now or timezone.now()
+    start = max(now, setting.start_time)
+    durations = match_durations(graph, setting)
+    current = dict(
+        (pk, (table, start_time))
+        for pk, table, start_time in Match.objects.filter(tournament=tournament).values_list('id', 'table', 'start_time')
+    )
+
+    # 資料庫讀出的時間為 UTC，營業時間以當地時間比較，進入排程前全部換成當地時間
+    tz = timezone.get_current_timezone()
+    now = timezone.localtime(now, tz)
+    fixed = {}
+    for node in graph.matches:
+        table, start_time = current[node.pk]
+        start_time = start_time and timezone.localtime(start_time, tz)
+        if node.winner is not None:
+            fixed[node.id] = (table, start_time or now, now)
+        elif node.status == IN_PROGRESS:
+            # 進行中（裁判已按下開始）：超過預估時間仍未結束時視為現在才結束；
+            # 其他尚未開始的比賽即使原本排定的時間已過，也一律重新排
+            start_time = start_time or now
+            fixed[node.id] = (table, start_time, max(start_time + durations[node.id], now))
+
+    players = {
+        node.id: tuple(p for p in (node.player1, node.player2) if p is not None) for node in graph.matches
+    }
+    window = VenueWindow(setting.open_time, setting.close_time, tz)
+    planned = list_schedule(graph, setting.table_count, durations, timezone.localtime(start, tz), window, fixed, players)
+
+    objs = []
+    for match_id, (table, begin) in planned.items():
+        node = graph.matches[match_id]
+        if node.is_bye():
+            continue
+        if current[node.pk] != (table, begin):
+            objs.append(Match(pk=node.pk, table=table, start_time=begin))
+    Match.objects.bulk_update(objs, ['table', 'start_time'], batch_size=500)
+    return [obj.pk for obj in objs]
+
+
+@transaction.atomic
+def apply_schedule(tournament, setting, now=None):
+    """
+    schedule_tournament() 並更新預估開賽時間與變動標記
+    （單獨呼叫時使用，登錄賽果時由 apply_results 處理）
+    """
+    graph = load_bracket_graph(tournament)
+    changed = schedule_tournament(tournament, setting, now, graph=graph)
+    seeds = {node.id for node in graph.matches if node.pk in set(changed)}
+    changed = sorted(set(changed) | set(project_etas(tournament, graph, seeds, now)))
+    if changed:
+        touch_tournament(tournament.pk)
+        record_match_changes(tournament.pk, changed)
+        touch_stages(Stage.objects.filter(matches__id__in=changed).distinct())
+    return changed
@@ -1,16 +1,32 @@
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.views import View
 from django.views.generic import CreateView, UpdateView, DeleteView
 from django.contrib import auth, messages
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
 from django.urls import reverse_lazy
-from django.contrib.auth.mixins import LoginRequiredMixin
-
-import csv, io, random, math
-from .models import Tournament, Player, Announcement, Match
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils import timezone
+from django.utils.translation import get_language
+
+import gzip, json, random, math
+from collections import defaultdict
+from . import metrics
+from .models import Tournament, Player, Announcement, Match, Job
 from .forms import PlayerImportForm, AnnouncementForm
-from .utils import create_single_elimination_bracket, create_double_elimination_bracket, create_mixed_bracket, advance_from_round_robin_and_create_single_elim, advance_from_double_elim_and_create_single_elim, get_round_robin_standings
+from .utils import serialize_matches, create_single_elimination_bracket, create_double_elimination_bracket, create_mixed_bracket, advance_from_round_robin_and_create_single_elim, advance_from_double_elim_and_create_single_elim
+from .standings import rebuild_standings, read_standings
+from .propagation import apply_results, clean_result
+from .fragment_cache import get_stats as get_fragment_cache_stats
+from .snapshot import get_snapshot
+from .roster import RosterError, check_player_count, create_players, read_roster
+from .jobs import enqueue
+from .profiling import list_profiles, profile_file
 
 # Create your views here.
 class Home(View):
@@ -48,47 +64,167 @@ class MatchDetailView(LoginRequiredMixin, View):
         return render(request, 'MatchDetail.html', {'match': match})
     
     def post(self, request, pk):
-        match = Match.objects.get(id=pk)
-        
-        match.player1.name = request.POST.get('player1')
-        match.player2.name = request.POST.get('player2')
-
-        match.player1.save()
-        match.player2.save()
-
-        start_time = request.POST.get('start_time')
-        if start_time != '':
-            match.start_time = start_time
-        match.table = request.POST.get('table')
-        match.point1 = request.POST.get('point1')
-        match.point2 = request.POST.get('point2')
-
-        winner_field = request.POST.get("winner")
-        if winner_field == "player1":
-            match.winner = match.player1
-            match.loser = match.player2
-        elif winner_field == "player2":
-            match.winner = match.player2
-            match.loser = match.player1
-        match.save()
-
-        next_matches = Match.objects.filter(Q(source_match1=match) | Q(source_match2=match))
-
-        for next_match in next_matches:
-            if next_match.source_match1 == match:
-                if 'Tie' in next_match.stage.name or 'Losers Round' in next_match.stage.name:
-                    next_match.player1 = match.loser
-                else:
-                    next_match.player1 = match.winner
-            else:
-                if 'Tie' in next_match.stage.name or 'Losers' in next_match.stage.name:
-                    next_match.player2 = match.loser
-                else:
-                    next_match.player2 = match.winner
-            next_match.save()
-
-        return redirect(f"{reverse('TournamentDetailView', args=[match.stage.tournament.id])}?show_standings=1")
+        match = get_object_or_404(Match.objects.select_related('stage__tournament', 'player1', 'player2'), id=pk)
+        tournament = match.stage.tournament
+
+        # ✅ 與批次登錄相同的檢查（比分、勝者、桌次、開賽時間、輪空）
+        try:
+            result = clean_result(request.POST, match)
+        except ValueError as e:
+            messages.error(request, f"輸入格式錯誤：{e}")
+            return redirect('MatchDetailView', pk=pk)
+
+        with transaction.atomic():
+            for player, field in ((match.player1, 'player1'), (match.player2, 'player2')):
+                name = request.POST.get(field)
+                if player is not None and name is not None and name != player.name:
+                    player.name = name
+                    player.save(update_fields=['name'])
+
+            # 寫入賽果並推進下游比賽（含更正時清除失效的下游賽果）
+            apply_results(tournament, [result])
+
+        return redirect(f"{reverse('TournamentDetailView', args=[tournament.id])}?show_standings=1")
     
+class MatchBatchResultView(LoginRequiredMixin, View):
+    """
+    一次登錄多場比賽的賽果（表單或 JSON），在同一個交易中一次推進。
+    JSON 格式：{"results": [{"match": 12, "point1": "3", "point2": "1", "winner": "player1",
+                             "table": "2", "start_time": "2025-10-01T19:30"}, ...]}
+    回傳每場的狀態：{"results": [{"match": 12, "status": "ok"}, ...], "changed": [...]}
+    """
+    template_name = 'BatchResult.html'
+    fields = ("point1", "point2", "winner", "table", "start_time")
+
+    def get_matches(self, tournament):
+        # 兩位選手都已確定、尚未分出勝負的比賽
+        return (
+            Match.objects.filter(tournament=tournament, status__in=("ready", "in_progress"))
+            .select_related('stage', 'player1', 'player2')
+            .order_by('match_number', 'id')
+        )
+
+    def get(self, request, pk):
+        tournament = get_object_or_404(Tournament, id=pk)
+        return render(request, self.template_name, {
+            'tournament': tournament,
+            'matches': self.get_matches(tournament),
+        })
+
+    def post(self, request, pk):
+        tournament = get_object_or_404(Tournament, id=pk)
+        is_json = request.content_type == 'application/json'
+
+        if is_json:
+            try:
+                entries = json.loads(request.body)["results"]
+                if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+                    raise TypeError
+            except (ValueError, KeyError, TypeError):
+                return JsonResponse({"error": "格式應為 {\"results\": [...]}"}, status=400)
+        else:
+            entries = []
+            for match_id in request.POST.getlist('match'):
+                entry = {field: request.POST.get(f"{field}-{match_id}", '') for field in self.fields}
+                if any(entry.values()):
+                    entries.append(dict(entry, match=match_id))
+
+        statuses, results = self.clean_entries(tournament, entries)
+        changed = apply_results(tournament, results) if results else []
+
+        if is_json:
+            return JsonResponse({"results": statuses, "changed": changed})
+
+        ok = sum(1 for status in statuses if status["status"] == "ok")
+        messages.success(request, f"已登錄 {ok} 場，失敗 {len(statuses) - ok} 場")
+        return render(request, self.template_name, {
+            'tournament': tournament,
+            'matches': self.get_matches(tournament),
+            'statuses': statuses,
+        })
+
+    def clean_entries(self, tournament, entries):
+        ids = []
+        for entry in entries:
+            try:
+                ids.append(int(entry.get("match")))
+            except (TypeError, ValueError):
+                pass
+        matches = Match.objects.filter(tournament=tournament).only('id', 'player1', 'player2', 'player1_bye', 'player2_bye').in_bulk(ids)
+
+        statuses, results, seen = [], [], set()
+        for entry in entries:
+            match_id = entry.get("match")
+            try:
+                match_id = int(match_id)
+                if match_id not in matches:
+                    raise ValueError("比賽不屬於此賽事")
+                if match_id in seen:
+                    raise ValueError("同一場比賽重複輸入")
+                results.append(clean_result(entry, matches[match_id]))
+                seen.add(match_id)
+                statuses.append({"match": match_id, "status": "ok"})
+            except (TypeError, ValueError) as e:
+                statuses.append({"match": match_id, "status": "error", "error": str(e)})
+        return statuses, results
+
+
+class RefereeDashboardView(LoginRequiredMixin, View):
+    """
+    裁判用：可以開打的比賽與空桌。
+    比賽以 (tournament, status) 索引一次查出；進行中的比賽佔用的桌子以外都是空桌。
+    """
+    template_name = 'RefereeDashboard.html'
+
+    def get(self, request, pk):
+        tournament = get_object_or_404(Tournament.objects.select_related('schedule_setting'), id=pk)
+        matches = (
+            Match.objects.filter(tournament=tournament, status__in=("ready", "in_progress"))
+            .select_related('stage', 'player1', 'player2')
+            .order_by(F('eta').asc(nulls_last=True), 'match_number', 'id')
+        )
+        ready, in_progress = [], []
+        for match in matches:
+            (in_progress if match.status == "in_progress" else ready).append(match)
+
+        busy_tables = {match.table for match in in_progress if match.table}
+        setting = getattr(tournament, 'schedule_setting', None)
+        free_tables = None
+        if setting is not None:
+            free_tables = [table for table in range(1, setting.table_count + 1) if table not in busy_tables]
+
+        return render(request, self.template_name, {
+            'tournament': tournament,
+            'ready_matches': ready,
+            'in_progress_matches': in_progress,
+            'free_tables': free_tables,
+            'busy_tables': sorted(busy_tables),
+        })
+
+    def post(self, request, pk):
+        tournament = get_object_or_404(Tournament, id=pk)
+
+        # ✅ 開始比賽：標記為進行中，記錄桌次與實際開賽時間
+        if request.POST.get("action") == "start":
+            match = Match.objects.filter(tournament=tournament, id=request.POST.get("match") or 0).first()
+            if match is None or match.status != "ready":
+                messages.error(request, "這場比賽目前無法開始")
+                return redirect("RefereeDashboardView", pk=pk)
+
+            result = {"match": match.pk, "started": True, "start_time": timezone.now()}
+            table = request.POST.get("table", '').strip()
+            if table:
+                if not table.isdigit():
+                    messages.error(request, "桌次必須是數字")
+                    return redirect("RefereeDashboardView", pk=pk)
+                result["table"] = int(table)
+
+            apply_results(tournament, [result])
+            messages.success(request, f"Match #{match.match_number} 開始")
+
+        return redirect("RefereeDashboardView", pk=pk)
+
+
 class AnnouncementDeleteView(LoginRequiredMixin, DeleteView):
     model = Announcement
     template_name = "AnnouncementConfirmDelete.html"
@@ -143,6 +279,7 @@ class TournamentDeleteView(LoginRequiredMixin, DeleteView):
 
 class TournamentCreateView(LoginRequiredMixin, View):
     template_name = "CreateTournament.html"
+    max_reported_errors = 50
 
     def get(self, request):
         form = PlayerImportForm()
@@ -160,67 +297,50 @@ class TournamentCreateView(LoginRequiredMixin, View):
                     "error": "請上傳 CSV 檔案"
                 })
 
-            # ✅ 2. 讀取 CSV 檔案內容
-            decoded_file = csv_file.read().decode("utf-8-sig")  # 防止有 BOM
-            io_string = io.StringIO(decoded_file)
-            reader = csv.reader(io_string)
-
-            # ✅ 3. 取得要讀取的玩家數量
+            # ✅ 2. 取得要讀取的玩家數量
             expected_count = form.cleaned_data["player_num"]
 
-            # 檢查是否為 2 的次方
-            if expected_count <= 0 or (expected_count & (expected_count - 1)) != 0:
-                messages.error(request, "人數必須是 2 的次方，例如 4、8、16、32 ...")
+            # 人數不是 2 的次方時以輪空補滿，不需要空籤選手
+            if expected_count < 2:
+                messages.error(request, "人數至少需要 2 人")
                 return render(request, self.template_name, {"form": form})
 
-            # ✅ 4. 逐行讀取並限制最多讀取 expected_count 行
-            player_names = []
-            innings_list = []
-            for i, row in enumerate(reader):
-                if i >= expected_count:
-                    break  # 超過輸入人數就停止
-
-                if not row or not row[0].strip():
-                    # 空行 → 空籤
-                    name = f"-"
-                    innings = 999
-                else:
-                    name = row[0].strip()
-                    if len(row) > 1 and row[1].strip().isdigit():
-                        innings = int(row[1].strip())
-                    else:
-                        innings = 999
-
-                player_names.append(name)
-                innings_list.append(innings)
-            
-            player_names = player_names + [''] * (expected_count - len(player_names))
-            innings_list = innings_list + [999] * (expected_count - len(innings_list))
-            # ✅ 7. 建立比賽
+            # ✅ 3. 逐行讀取並檢查名單，建立比賽、玩家（保留順序）與 bracket，全部在同一個交易中
             t = form.cleaned_data["type"]
-            tournament = Tournament.objects.create(
-                type=t,
-                name=form.cleaned_data["name"],
-                semester=form.cleaned_data["semester"],
-                player_num=expected_count,
-                num_groups = form.cleaned_data["num_groups"],
-                group_size = form.cleaned_data["group_size"],
-                advance_per_group = form.cleaned_data["advance_per_group"],
-            )
-
-            # ✅ 8. 建立玩家（保留順序）
-            players = [
-                Player.objects.create(name=player_names[i], innings=innings_list[i])
-                for i in range(expected_count)
-            ]
-
-            # ✅ 9. 依據賽制建立 bracket
-            if t == 'single_elim':
-                create_single_elimination_bracket(tournament, players)
-            elif t == 'double_elim':
-                create_double_elimination_bracket(tournament, players)
-            elif t == 'round_robin':
-                create_mixed_bracket(tournament, players, tournament.num_groups, tournament.group_size, tournament.advance_per_group)
+            try:
+                entries = read_roster(csv_file, expected_count)
+                check_player_count(entries, form.cleaned_data["num_groups"] if t == 'round_robin' else None)
+                with transaction.atomic():
+                    tournament = Tournament.objects.create(
+                        type=t,
+                        name=form.cleaned_data["name"],
+                        semester=form.cleaned_data["semester"],
+                        player_num=expected_count,
+                        num_groups = form.cleaned_data["num_groups"],
+                        group_size = form.cleaned_data["group_size"],
+                        advance_per_group = form.cleaned_data["advance_per_group"],
+                    )
+                    players = create_players(entries, reuse=form.cleaned_data["reuse_players"])
+
+                    if t == 'single_elim':
+                        create_single_elimination_bracket(tournament, players)
+                    elif t == 'double_elim':
+                        create_double_elimination_bracket(tournament, players)
+                        rebuild_standings(tournament)
+                    elif t == 'round_robin':
+                        create_mixed_bracket(tournament, players, tournament.num_groups, tournament.group_size, tournament.advance_per_group)
+                        rebuild_standings(tournament)
+            except RosterError as e:
+                # 名單有錯誤時一次全部列出
+                for line, message in e.errors[:self.max_reported_errors]:
+                    messages.error(request, f"第 {line} 行：{message}" if line else message)
+                if len(e.errors) > self.max_reported_errors:
+                    messages.error(request, f"……另有 {len(e.errors) - self.max_reported_errors} 筆錯誤")
+                return render(request, self.template_name, {"form": form})
+            except ValueError as e:
+                # 籤表參數不合理（交易已回滾，不會留下賽事或選手）
+                messages.error(request, str(e))
+                return render(request, self.template_name, {"form": form})
 
             return redirect("TournamentDetailView", pk=tournament.id)
 
@@ -229,9 +349,29 @@ class TournamentCreateView(LoginRequiredMixin, View):
     
 class TournamentDetailView(View):
     def get(self, request, pk):
-        tournament = Tournament.objects.get(id=pk)
-        show_standings = request.GET.get("show_standings") or tournament.type == 'round_robin'
-        return self.render_tournament(request, pk, show_standings)
+        # 只用主鍵查變動標記；沒有變動時直接回 304，不碰比賽資料
+        marker = Tournament.objects.filter(id=pk).values_list('version', 'updated_at', 'type').first()
+        if marker is None:
+            raise Http404
+        version, updated_at, tournament_type = marker
+        show_standings = bool(request.GET.get("show_standings")) or tournament_type == 'round_robin'
+
+        # 頁面內容也會隨登入狀態、語系、是否顯示積分表而不同
+        etag = '"{}-{}-{}-{}-{}"'.format(
+            pk, version, int(request.user.is_authenticated), get_language(), int(show_standings)
+        )
+        last_modified = int(updated_at.timestamp())
+
+        response = None
+        if not len(messages.get_messages(request)):
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.render_tournament(request, pk, show_standings)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
 
     def post(self, request, pk):
         # 判斷 POST 目的
@@ -241,7 +381,7 @@ class TournamentDetailView(View):
         if action == "search":
             return self.render_tournament(request, pk, is_post=True)
 
-        # ✅ 如果是生成單敗籤表（只允許循環賽）
+        # ✅ 如果是生成單敗籤表（只允許循環賽），排入背景工作後直接回傳
         elif action == "generate_single_elim":
             tournament = get_object_or_404(Tournament, id=pk)
 
@@ -249,14 +389,13 @@ class TournamentDetailView(View):
                 messages.error(request, "只有循環賽才能生成單敗籤表！")
                 return redirect("TournamentDetailView", pk=pk)
 
-            try:
-                if tournament.type == 'round_robin':
-                    advance_from_round_robin_and_create_single_elim(tournament)
-                elif tournament.type == 'double_elim':
-                    advance_from_double_elim_and_create_single_elim(tournament)
-                messages.success(request, "單敗籤表已成功生成！")
-            except Exception as e:
-                messages.error(request, f"生成籤表時發生錯誤：{e}")
+            job = enqueue("advance", tournament, request.user)
+            if job.status == "done":
+                messages.success(request, job.result)
+            elif job.status == "failed":
+                messages.error(request, f"生成籤表時發生錯誤：{job.result.splitlines()[0]}")
+            else:
+                messages.info(request, f"單敗籤表生成中（工作 #{job.id}），完成後重新整理頁面即可看到")
 
             return redirect("TournamentDetailView", pk=pk)
 
@@ -279,17 +418,26 @@ class TournamentDetailView(View):
         # 取得所有 stage，依 order 排序
         stages = tournament.stages.all().order_by('order')
 
+        # 一次查詢取回整個賽事的比賽（含選手與來源比賽編號），避免每個 stage / 每場比賽各自查詢
+        matches = (
+            Match.objects.filter(tournament=tournament)
+            .select_related('stage', 'player1', 'player2', 'winner', 'source_match1', 'source_match2')
+            .order_by('id')
+        )
+        if name_query:
+            matches = matches.filter(name_query)
+
+        matches_by_stage = defaultdict(list)
+        for match in matches:
+            matches_by_stage[match.stage_id].append(match)
+
         # 分成兩組（Stage 1 / Final）
         group_stages = []  # 第一階段（雙敗或小組）
         final_stages = []  # 第二階段（單敗或晉級賽）
 
         # 根據 stage 名稱分類（可依照命名規則調整）
         for stage in stages:
-            matches = stage.matches.all().order_by('id')
-            if name_query:
-                matches = matches.filter(name_query)
-
-            data = {'stage': stage, 'matches': matches}
+            data = {'stage': stage, 'matches': matches_by_stage[stage.id]}
             if 'Round' in stage.name or 'Qualification' in stage.name:
                 group_stages.append(data)
             else:
@@ -300,8 +448,8 @@ class TournamentDetailView(View):
 
         standings = None
         if show_standings:
-            standings = get_round_robin_standings(tournament)
-            
+            standings = read_standings(tournament)
+
         context = {
             'tournament': tournament,
             'group_stage_matches': group_stages,
@@ -309,11 +457,137 @@ class TournamentDetailView(View):
             'has_two_stages': has_two_stages,
             'show_generate_button': has_two_stages and not has_final_matches,
             'standings': standings,
+            'show_standings': bool(standings),
+            'use_fragment_cache': not name_query,
+            'live_updates': getattr(settings, 'SCHEDULE_LIVE_UPDATES', False),
         }
         # print(context['standings'])
         return render(request, 'ListStageAndMatch.html', context)
 
     
+class JobStatusView(LoginRequiredMixin, View):
+    """背景工作的狀態，供前端輪詢"""
+
+    def get(self, request, pk):
+        job = get_object_or_404(Job, pk=pk)
+        return JsonResponse({
+            "id": job.id,
+            "kind": job.kind,
+            "tournament": job.tournament_id,
+            "status": job.status,
+            "result": job.result.splitlines()[0] if job.result else '',
+            "created_at": job.created_at.isoformat(),
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        })
+
+
+class TournamentChangesView(View):
+    """
+    增量同步：GET ?since=<version> 只回傳該版本之後有變動的比賽與新的版本號。
+    沒有變動時只用主鍵查一次賽事版本；since 省略或為 0 時回傳全部比賽。
+    """
+
+    def get(self, request, pk):
+        version = Tournament.objects.filter(id=pk).values_list('version', flat=True).first()
+        if version is None:
+            raise Http404
+        try:
+            since = int(request.GET.get("since") or 0)
+        except ValueError:
+            return JsonResponse({"error": "since 必須是整數"}, status=400)
+
+        full = since <= 0 or since > version
+        if full:
+            matches = serialize_matches(Match.objects.filter(tournament_id=pk))
+        elif since == version:
+            matches = []
+        else:
+            matches = serialize_matches(Match.objects.filter(
+                changes__tournament_id=pk, changes__version__gt=since
+            ).distinct())
+        return JsonResponse({"version": version, "full": full, "matches": matches})
+
+
+class TournamentSnapshotView(View):
+    """整個賽事的 JSON 快照（格式見 schedule/snapshot.py），內容未變時只讀一次預先序列化的 blob"""
+
+    def get(self, request, pk):
+        try:
+            version, data, compressed = get_snapshot(pk)
+        except Tournament.DoesNotExist:
+            raise Http404
+
+        etag = f'"snapshot-{pk}-{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            accepts_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+            if compressed and not accepts_gzip:
+                data, compressed = gzip.decompress(data), False
+            response = HttpResponse(data, content_type='application/json')
+            if compressed:
+                response['Content-Encoding'] = 'gzip'
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class TournamentEventsView(View):
+    """
+    即時比分的 SSE 串流只在 ASGI 下提供（由 billiard/asgi.py 直接處理，見 schedule/live.py）；
+    以 WSGI 部署時走到這裡，回應 503 讓前端停止重連。
+    """
+
+    def get(self, request, pk):
+        get_object_or_404(Tournament, pk=pk)
+        return HttpResponse("Live updates require an ASGI server.", status=503, content_type="text/plain")
+
+
+class FragmentCacheStatsView(UserPassesTestMixin, View):
+    """賽程表階段片段快取的命中統計（僅限管理員）"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(get_fragment_cache_stats())
+
+
+class MetricsView(UserPassesTestMixin, View):
+    """每個 view 的延遲與查詢統計，Prometheus 文字格式（僅限管理員，需開啟 SCHEDULE_METRICS）"""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        if not metrics.is_enabled():
+            raise Http404
+        return HttpResponse(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ProfileListView(UserPassesTestMixin, View):
+    """最近的效能分析紀錄（任何網址加上 ?profile=1 產生，僅限管理員）"""
+    template_name = 'ListProfile.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return render(request, self.template_name, {'profiles': list_profiles()})
+
+
+class ProfileDownloadView(UserPassesTestMixin, View):
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, name, kind):
+        path = profile_file(name, kind)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
 class TournamentListView(View):
     def get(self, request):
         tournaments = Tournament.objects.all()